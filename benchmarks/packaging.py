@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+"""
+Benchmarks the packaging overhead of tox-wheel for the various build modes.
+
+Synthetic projects (few or many modules, pure Python or with a C extension, with or without large data files) are
+generated in a temporary directory and packaged with ``tox --sdistonly`` (no test envs are installed) for each mode:
+once cold (no tox envs, no build directory) and then ``--repeat`` times warm, with and without ``--wheel-dirty``. The
+projects have static metadata, thus the ``native`` mode writes the pure Python ones itself (the ones with data files
+or a C extension fall back to the build backend).
+
+Example::
+
+    python benchmarks/packaging.py --projects small-pure,large-pure --modes legacy,hooks --json results.json
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+#: Name mapped to (modules, C extension, data files in MB).
+PROJECTS = {
+    "small-pure": (5, False, 0),
+    "large-pure": (500, False, 0),
+    "small-pure-data": (5, False, 20),
+    "large-pure-data": (500, False, 20),
+    "small-ext": (5, True, 0),
+    "large-ext": (500, True, 0),
+}
+#: Mode name mapped to the tox.ini settings for it.
+MODES = {
+    "legacy": "",
+    "pip": "wheel_pep517 = true",
+    "build": "wheel_pep517 = build",
+    "hooks": "wheel_pep517 = hooks",
+    "pip-warm": "wheel_pep517 = true\nwheel_warm_build_env = true",
+    "native": "wheel_pep517 = native",
+}
+
+SETUP_PY = """
+from setuptools import setup
+
+setup()
+"""
+SETUP_PY_EXTENSION = """
+from setuptools import Extension
+from setuptools import setup
+
+setup(ext_modules=[Extension("benchpkg._speedups", ["benchpkg/_speedups.c"])])
+"""
+PYPROJECT_TOML = """
+[build-system]
+requires = ["setuptools>=61", "wheel"]
+build-backend = "setuptools.build_meta"
+
+[project]
+name = "benchpkg"
+version = "1.0"
+
+[tool.setuptools]
+packages = ["benchpkg"]
+{package_data}"""
+PACKAGE_DATA = """
+[tool.setuptools.package-data]
+benchpkg = ["data/*"]
+"""
+TOX_INI = """
+[tox]
+envlist = py
+toxworkdir = {{toxinidir}}/.tox-{mode}
+
+[testenv]
+wheel = true
+{settings}
+"""
+EXTENSION_C = """
+#include <Python.h>
+
+static struct PyModuleDef module = {PyModuleDef_HEAD_INIT, "_speedups", NULL, -1, NULL};
+
+PyMODINIT_FUNC PyInit__speedups(void) {
+    return PyModule_Create(&module);
+}
+"""
+
+
+def generate_project(path, modules, extension, data_mb):
+    package = os.path.join(path, "benchpkg")
+    os.makedirs(package)
+    with open(os.path.join(package, "__init__.py"), "w") as fh:
+        fh.write("")
+    for i in range(modules):
+        with open(os.path.join(package, "module{}.py".format(i)), "w") as fh:
+            fh.write("".join("def function{}(arg):\n    return arg * {}\n\n\n".format(j, j) for j in range(50)))
+    rng = random.Random(0)
+    if data_mb:
+        os.makedirs(os.path.join(package, "data"))
+    for i in range(data_mb):
+        with open(os.path.join(package, "data", "blob{}.bin".format(i)), "wb") as fh:
+            fh.write(rng.getrandbits(8 << 20).to_bytes(1 << 20, "little"))
+    if extension:
+        with open(os.path.join(package, "_speedups.c"), "w") as fh:
+            fh.write(EXTENSION_C)
+    with open(os.path.join(path, "setup.py"), "w") as fh:
+        fh.write(SETUP_PY_EXTENSION if extension else SETUP_PY)
+    with open(os.path.join(path, "pyproject.toml"), "w") as fh:
+        fh.write(PYPROJECT_TOML.format(package_data=PACKAGE_DATA if data_mb else ""))
+    for mode, settings in MODES.items():
+        with open(os.path.join(path, "tox-{}.ini".format(mode)), "w") as fh:
+            fh.write(TOX_INI.format(mode=mode, settings=settings))
+
+
+def run_tox(path, mode, dirty):
+    report = os.path.join(path, "timings-{}.json".format(mode))
+    args = [
+        sys.executable, "-m", "tox",
+        "-c", os.path.join(path, "tox-{}.ini".format(mode)),
+        "--sdistonly",
+        "--wheel-timings", report,
+    ]
+    if dirty:
+        args.append("--wheel-dirty")
+    start = time.perf_counter()
+    subprocess.check_call(args, cwd=path, stdout=subprocess.DEVNULL)
+    duration = time.perf_counter() - start
+    with open(report) as fh:
+        builds = json.load(fh)["builds"]
+    return {"duration": round(duration, 4), "phases": builds[0]["phases"] if builds else {}}
+
+
+def benchmark(path, project, mode, dirty, repeat):
+    shutil.rmtree(os.path.join(path, ".tox-{}".format(mode)), ignore_errors=True)
+    shutil.rmtree(os.path.join(path, "build"), ignore_errors=True)
+    cold = run_tox(path, mode, dirty)
+    warm = [run_tox(path, mode, dirty) for _ in range(repeat)]
+    warm.sort(key=lambda result: result["duration"])
+    return {
+        "project": project,
+        "mode": mode,
+        "dirty": dirty,
+        "cold": cold,
+        "warm": warm[len(warm) // 2],
+    }
+
+
+def format_row(columns):
+    return "{:<18} {:<10} {:<6} {:>9} {:>9} {:>16}".format(*columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--projects", default=",".join(PROJECTS), help="Comma separated list of: %(default)s")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma separated list of: %(default)s")
+    parser.add_argument("--dirty", choices=["yes", "no", "both"], default="both", help="Use --wheel-dirty")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of warm runs (the median is reported)")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results (with phase timings) to PATH")
+    args = parser.parse_args()
+
+    dirty_choices = {"yes": [True], "no": [False], "both": [False, True]}[args.dirty]
+    results = []
+    print(format_row(["project", "mode", "dirty", "cold (s)", "warm (s)", "warm build (s)"]))
+    workdir = tempfile.mkdtemp(prefix="tox-wheel-bench-")
+    try:
+        for project in args.projects.split(","):
+            path = os.path.join(workdir, project)
+            generate_project(path, *PROJECTS[project])
+            for mode, dirty in itertools.product(args.modes.split(","), dirty_choices):
+                result = benchmark(path, project, mode, dirty, args.repeat)
+                results.append(result)
+                print(format_row([
+                    project,
+                    mode,
+                    "yes" if dirty else "no",
+                    "{:.2f}".format(result["cold"]["duration"]),
+                    "{:.2f}".format(result["warm"]["duration"]),
+                    "{:.2f}".format(result["warm"]["phases"].get("wheel-make", 0)),
+                ]))
+                sys.stdout.flush()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({"python": sys.version, "results": results}, fh, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -71,6 +71,8 @@ setup(
     ],
     python_requires='>=3.6',
     install_requires=[
+        'filelock>=3.0.0',
+        'packaging>=20.0',
         'tox>=3.9.0',
         'wheel>=0.33.1',
     ],
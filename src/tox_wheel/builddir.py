@@ -0,0 +1,125 @@
+import filecmp
+import hashlib
+import json
+import os
+
+from tox.util.path import ensure_empty_dir
+
+from .cache import iter_source_files
+
+#: Bump this when the manifest layout changes so old manifests are never trusted.
+MANIFEST_VERSION = 1
+MANIFEST_NAME = ".tox-wheel-outputs.json"
+
+#: Files that configure the build, outputs that can't be traced to a source are stale when any of these change.
+CONFIG_FILES = ("setup.py", "setup.cfg", "pyproject.toml", "MANIFEST.in")
+OBJECT_FILE_EXTENSIONS = {".o", ".obj"}
+
+
+def iter_output_files(build_dir):
+    """
+    Yields ``(relative path, absolute path)`` for every build output (the manifest excluded).
+    """
+    build_dir = str(build_dir)
+    for dirpath, dirnames, filenames in os.walk(build_dir):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            relpath = os.path.relpath(path, build_dir).replace(os.sep, "/")
+            if relpath != MANIFEST_NAME:
+                yield relpath, path
+
+
+def get_config_digest(setupdir):
+    digest = hashlib.sha256()
+    for name in CONFIG_FILES:
+        path = setupdir.join(name)
+        if path.check(file=1):
+            digest.update(name.encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(path.read_binary())
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def find_sources(relpath, path, sources):
+    """
+    Returns the sources (relative to the project root) that ``relpath`` (relative to the build dir) was made from.
+
+    Setuptools lays outputs as ``<build subdir>/<path>``, where ``<path>`` is the module path for copied files (``build/lib/foo/bar.py``
+    from ``src/foo/bar.py``) and the source path for object files (``build/temp.*/src/foo/_ext.o`` from
+    ``src/foo/_ext.c``). Returns ``None`` for outputs that can't be traced this way (e.g.: linked extension modules).
+    """
+    _, _, inner = relpath.partition("/")
+    if not inner:
+        return None
+    stem, ext = os.path.splitext(inner)
+    if ext in OBJECT_FILE_EXTENSIONS:
+        matches = [source for source in sources if os.path.splitext(source)[0] == stem]
+    else:
+        matches = [source for source in sources if source == inner or source.endswith("/" + inner)]
+        if len(matches) > 1:
+            matches = [source for source in matches if filecmp.cmp(sources[source], path, shallow=False)] or matches
+    return matches or None
+
+
+def record_build_dir(setupdir, build_dir, excluded=()):
+    """
+    Writes a manifest in ``build_dir`` that maps every build output to the sources it was made from.
+    """
+    sources = {
+        os.path.relpath(path, str(setupdir)).replace(os.sep, "/"): path
+        for path in iter_source_files(setupdir, list(excluded) + [build_dir])
+    }
+    outputs = {}
+    compiled = set()
+    for relpath, path in iter_output_files(build_dir):
+        matches = outputs[relpath] = find_sources(relpath, path, sources)
+        if matches and os.path.splitext(relpath)[1] in OBJECT_FILE_EXTENSIONS:
+            compiled.update(matches)
+    build_dir.join(MANIFEST_NAME).write(json.dumps({
+        "version": MANIFEST_VERSION,
+        "config": get_config_digest(setupdir),
+        "compiled": sorted(compiled),
+        "outputs": outputs,
+    }, indent=2, sort_keys=True))
+
+
+def clean_build_dir(setupdir, build_dir):
+    """
+    Removes the outputs in ``build_dir`` that are stale according to the manifest written by the previous build.
+
+    An output is stale if any of its sources were removed (or renamed). Outputs that couldn't be traced to a source
+    are stale if any compiled source was removed. If the build configuration changed only the object files of
+    existing sources are kept: ``bdist_wheel`` packs everything in ``build/lib``, thus the copies of a package that is
+    no longer configured would still end up in the wheel. Outputs that aren't in the manifest and leftovers of the
+    ``bdist`` commands are always removed. Without a manifest the whole ``build_dir`` is emptied.
+
+    Returns the list of removed outputs (``None`` if ``build_dir`` was emptied).
+    """
+    manifest = build_dir.join(MANIFEST_NAME)
+    try:
+        data = json.loads(manifest.read())
+    except (IOError, OSError, ValueError):
+        data = None
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        ensure_empty_dir(build_dir)
+        return None
+
+    outputs = data["outputs"]
+    config_changed = data["config"] != get_config_digest(setupdir)
+    compiled_removed = not all(setupdir.join(source).check() for source in data["compiled"])
+    removed = []
+    for relpath, path in iter_output_files(build_dir):
+        if relpath.startswith("bdist.") or relpath not in outputs:
+            stale = True
+        elif config_changed and os.path.splitext(relpath)[1] not in OBJECT_FILE_EXTENSIONS:
+            stale = True
+        elif outputs[relpath] is None:
+            stale = config_changed or compiled_removed
+        else:
+            stale = not all(setupdir.join(source).check() for source in outputs[relpath])
+        if stale:
+            os.unlink(path)
+            removed.append(relpath)
+    return removed
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+import py
+from filelock import FileLock
+from filelock import Timeout
+from packaging.utils import canonicalize_name
+from tox.reporter import verbosity0
+from tox.util.lock import hold_lock
+
+from .cache import get_interpreter_id
+from .prebuilt import parse_wheel_filename
+
+
+def get_warm_env_key(envconfig, requires):
+    """
+    Computes the key of the warm build env that has ``requires`` installed for the interpreter of ``envconfig``.
+    """
+    return hashlib.sha256(json.dumps({
+        "interpreter": get_interpreter_id(envconfig),
+        "requires": sorted(set(requires)),
+    }, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+#: Warm envs recreated by this process (``--recreate`` recreates them once, not for every build that uses them).
+recreated_envs = set()
+#: Warm envs are removed if they weren't used for this many seconds (e.g.: the build requirements changed).
+MAX_AGE = 7 * 24 * 3600
+
+
+class WarmBuildEnv(object):
+    """
+    A virtualenv used to run builds without isolation, kept around for as long as its build requirements don't change.
+    """
+
+    def __init__(self, path, basepython):
+        self.path = py.path.local(path)
+        self.basepython = basepython
+        self.marker = self.path.join(".wheel-build-requires")
+
+    @property
+    def python(self):
+        if sys.platform == "win32":
+            return self.path.join("Scripts", "python.exe")
+        else:
+            return self.path.join("bin", "python")
+
+    @property
+    def installed(self):
+        if self.marker.check():
+            return json.loads(self.marker.read())
+        else:
+            return []
+
+    def lock(self):
+        """
+        Holds an inter-process lock for creating or updating this env (concurrent builds can use the same one).
+        """
+        return hold_lock(self.path.new(basename="{}.lock".format(self.path.basename)), verbosity0)
+
+    def environ(self, env):
+        """
+        Returns a copy of ``env`` adjusted to run commands inside this env.
+        """
+        env = dict(env)
+        env["VIRTUAL_ENV"] = str(self.path)
+        env["PATH"] = os.pathsep.join([self.python.dirname, env.get("PATH", os.environ["PATH"])])
+        return env
+
+    def ensure(self, action, requires, recreate=False, wheelhouse=None, envconfig=None):
+        if recreate and str(self.path) not in recreated_envs or not self.marker.check():
+            recreated_envs.add(str(self.path))
+            action.setactivity("wheel-make", "creating warm build env {} ...".format(self.path))
+            if self.path.check():
+                self.path.remove(ignore_errors=True)
+            action.popen([sys.executable, "-m", "virtualenv", "--python", self.basepython, self.path])
+            self.marker.write(json.dumps([]))
+            prune_warm_envs(self.path.dirpath(), keep=[self.path])
+        self.install(action, requires, wheelhouse=wheelhouse, envconfig=envconfig)
+        self.marker.setmtime()  # last used
+
+    def install(self, action, requires, wheelhouse=None, envconfig=None):
+        installed = self.installed
+        missing = sorted(set(requires).difference(installed))
+        if missing:
+            if wheelhouse:
+                wheelhouse.fill(action, self.python, envconfig, missing)
+                options = wheelhouse.get_install_options(envconfig)
+            else:
+                options = []
+            action.setactivity("wheel-make", "installing build requirements ...")
+            action.popen([self.python, "-m", "pip", "install"] + options + missing)
+            self.marker.write(json.dumps(sorted(set(installed).union(missing))))
+
+
+def prune_warm_envs(path, keep=(), now=None):
+    """
+    Removes the warm envs in ``path`` that weren't used for ``MAX_AGE``. The envs in ``keep`` and the envs locked by
+    other processes are never removed.
+
+    Returns the removed envs.
+    """
+    if not path.check(dir=1):
+        return []
+    now = time.time() if now is None else now
+    removed = []
+    for env in path.listdir(lambda env: env.check(dir=1) and env not in keep):
+        lock = FileLock(str(env.new(basename="{}.lock".format(env.basename))))
+        try:
+            lock.acquire(0)
+        except Timeout:
+            continue
+        try:
+            try:
+                age = now - WarmBuildEnv(env, None).marker.mtime()
+            except py.error.Error:
+                age = MAX_AGE  # never finished
+            if age < MAX_AGE:
+                continue
+            shutil.rmtree(str(env), ignore_errors=True)
+            removed.append(env)
+            try:
+                os.unlink(lock.lock_file)
+            except OSError:  # still open on windows
+                pass
+        finally:
+            lock.release()
+    return removed
+
+
+class Wheelhouse(object):
+    """
+    A local directory of wheels for the build requirements, filled once and then used instead of the package index.
+
+    Requirements are tracked per interpreter as the fetched wheels can be interpreter specific. The versions resolved
+    when a requirement is fetched are pinned (with a constraints file), thus later builds install the same versions
+    even if newer ones are fetched into the wheelhouse for other requirements.
+
+    Concurrent builds (threads or tox processes) change the state files while holding the wheelhouse lock and replace
+    them atomically, thus readers never see partial files.
+    """
+
+    def __init__(self, path):
+        self.path = py.path.local(path)
+        self.marker = self.path.join(".wheelhouse.json")
+
+    def lock(self):
+        return hold_lock(self.path.join(".wheelhouse.lock"), verbosity0)
+
+    def write(self, path, content):
+        tmp = path.new(basename=".tmp-{}-{}".format(uuid.uuid4().hex, path.basename))
+        try:
+            tmp.write(content)
+            os.replace(str(tmp), str(path))
+        except BaseException:
+            tmp.remove(ignore_errors=True)
+            raise
+
+    def load(self):
+        data = json.loads(self.marker.read()) if self.marker.check() else {}
+        if "fetched" not in data:  # made by an older version, everything is fetched again
+            data = {"fetched": {}, "pins": {}, "dynamic": {}}
+        return data
+
+    def get_interpreter(self, envconfig):
+        return hashlib.sha256(json.dumps(get_interpreter_id(envconfig)).encode("utf-8")).hexdigest()[:16]
+
+    def get_constraints(self, envconfig):
+        return self.path.join(".constraints-{}.txt".format(self.get_interpreter(envconfig)))
+
+    def get_install_options(self, envconfig):
+        options = ["--no-index", "--find-links", str(self.path)]
+        constraints = self.get_constraints(envconfig)
+        if constraints.check():
+            options.extend(["--constraint", str(constraints)])
+        return options
+
+    def get_environ(self, envconfig):
+        """
+        Environment variables that make pip (including pip running inside isolated build environments) use only the
+        wheelhouse and the pinned versions.
+        """
+        environ = {"PIP_NO_INDEX": "1", "PIP_FIND_LINKS": str(self.path)}
+        constraints = self.get_constraints(envconfig)
+        if constraints.check():
+            environ["PIP_CONSTRAINT"] = str(constraints)
+        return environ
+
+    def get_dynamic_requires(self, key):
+        """
+        Returns the requirements the build backend asked for in the build identified by ``key`` (``None`` if unknown).
+        """
+        return self.load()["dynamic"].get(key)
+
+    def set_dynamic_requires(self, key, requires):
+        with self.lock():
+            data = self.load()
+            data["dynamic"][key] = sorted(set(requires))
+            self.write(self.marker, json.dumps(data, indent=2, sort_keys=True))
+
+    def fill(self, action, python, envconfig, requires):
+        interpreter = self.get_interpreter(envconfig)
+        # builds that need the same requirements wait for the first one to fetch them
+        with self.lock():
+            data = self.load()
+            missing = sorted(set(requires).difference(data["fetched"].get(interpreter, [])))
+            if not missing:
+                return
+            action.setactivity("wheelhouse", "fetching build requirements into {} ...".format(self.path))
+            # pip puts all the wheels it resolved in the wheel dir, thus an empty one tells the versions to pin
+            resolved = py.path.local(tempfile.mkdtemp(prefix=".fetch-", dir=str(self.path)))
+            try:
+                action.popen([python, "-m", "pip", "wheel", "--wheel-dir", resolved, "--find-links", self.path] + missing)
+                pins = data["pins"].setdefault(interpreter, {})
+                for wheel in resolved.listdir("*.whl"):
+                    name, version, _ = parse_wheel_filename(wheel.basename)
+                    pins[canonicalize_name(name)] = version
+                    os.replace(str(wheel), str(self.path.join(wheel.basename)))
+            finally:
+                resolved.remove(ignore_errors=True)
+            self.write(self.get_constraints(envconfig), "".join(
+                "{}=={}\n".format(name, version) for name, version in sorted(pins.items())
+            ))
+            data["fetched"][interpreter] = sorted(set(data["fetched"].get(interpreter, [])).union(missing))
+            self.write(self.marker, json.dumps(data, indent=2, sort_keys=True))
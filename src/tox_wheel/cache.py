@@ -0,0 +1,442 @@
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+
+import py
+from filelock import FileLock
+from filelock import Timeout
+from tox.exception import InterpreterNotFound
+from tox.reporter import verbosity0
+from tox.util.lock import hold_lock
+
+from .reproducible import get_source_date_epoch
+
+#: Bump this when the key layout changes so old entries are never matched.
+CACHE_VERSION = 2
+
+#: Variables tox adds to the ``setenv`` of every env (the hash seed is random), they don't change what gets built.
+#: ``TOX_PACKAGE`` is set once the package is known (for background builds while the wheel is being built).
+TOX_SETENV = {"PYTHONHASHSEED", "TOX_ENV_DIR", "TOX_ENV_NAME", "TOX_PACKAGE"}
+
+#: Directory names that never contribute to the wheel contents.
+SKIP_DIRS = {
+    ".eggs",
+    ".git",
+    ".hg",
+    ".mypy_cache",
+    ".nox",
+    ".pytest_cache",
+    ".svn",
+    ".tox",
+    "__pycache__",
+}
+SKIP_FILE_EXTENSIONS = {".pyc", ".pyo"}
+
+#: Commands printing the files tracked by version control under the current directory (relative paths, NUL separated).
+VCS_FILES_COMMANDS = [
+    ["git", "ls-files", "-z", "--", "."],
+    ["hg", "files", "--print0", "."],
+]
+
+SIZE_UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+AGE_UNITS = {"": 1, "s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60, "w": 7 * 24 * 60 * 60}
+
+#: Temporary files left by interrupted inserts (and the lock files of keys without an entry) are removed by pruning
+#: after this many seconds.
+STALE_TMP_AGE = 24 * 60 * 60
+
+
+def normalize_paths(paths):
+    return {os.path.normcase(os.path.abspath(str(path))) for path in paths}
+
+
+def is_source_dir(path, excluded):
+    """
+    Returns whether the directory ``path`` can have source files (``excluded`` as returned by ``normalize_paths``).
+    """
+    name = os.path.basename(path)
+    return not (
+        name in SKIP_DIRS
+        or name.endswith(".egg-info")
+        or os.path.normcase(path) in excluded
+        or os.path.exists(os.path.join(path, "pyvenv.cfg"))
+    )
+
+
+def iter_source_dirs(root, excluded=()):
+    """
+    Yields ``root`` and every directory under it that can have source files (see ``iter_source_files``).
+    """
+    excluded = normalize_paths(excluded)
+    for dirpath, dirnames, _ in os.walk(str(root)):
+        dirnames[:] = sorted(name for name in dirnames if is_source_dir(os.path.join(dirpath, name), excluded))
+        yield dirpath
+
+
+def iter_source_files(root, excluded=()):
+    """
+    Yields the path of every file under ``root`` (in a stable order).
+
+    Version control metadata, caches, virtualenvs, egg-info and the ``excluded`` paths are skipped.
+    """
+    root = str(root)
+    excluded = normalize_paths(excluded)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if is_source_dir(os.path.join(dirpath, name), excluded))
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1] in SKIP_FILE_EXTENSIONS:
+                continue
+            path = os.path.join(dirpath, name)
+            if os.path.isfile(path):
+                yield path
+
+
+def list_vcs_files(root):
+    """
+    Returns the relative paths of the files under ``root`` tracked by git or mercurial (``None`` if ``root`` is not in
+    a checkout or nothing is tracked yet).
+    """
+    for command in VCS_FILES_COMMANDS:
+        try:
+            output = subprocess.check_output(command, cwd=str(root), stderr=subprocess.DEVNULL)
+        except (OSError, subprocess.CalledProcessError):
+            continue
+        paths = [os.path.normpath(path) for path in os.fsdecode(output).split("\0") if path]
+        if paths:
+            return sorted(paths)
+    return None
+
+
+def iter_tracked_files(root, excluded=()):
+    """
+    Yields the path of every file under ``root`` tracked by version control, skipping the same paths as
+    ``iter_source_files`` (which is used instead if there's no checkout). Untracked and ignored files (e.g.: coverage
+    data) are not sources.
+    """
+    root = os.path.abspath(str(root))
+    tracked = list_vcs_files(root)
+    if tracked is None:
+        for path in iter_source_files(root, excluded):
+            yield path
+        return
+    excluded = normalize_paths(excluded)
+    source_dirs = {root: True}
+    for relpath in tracked:
+        path = os.path.join(root, relpath)
+        if os.path.splitext(path)[1] in SKIP_FILE_EXTENSIONS or not os.path.isfile(path):
+            continue  # deleted but not committed yet
+        parents = []
+        dirpath = os.path.dirname(path)
+        while dirpath not in source_dirs:
+            parents.append(dirpath)
+            dirpath = os.path.dirname(dirpath)
+        is_source = source_dirs[dirpath]
+        for dirpath in reversed(parents):
+            is_source = is_source and is_source_dir(dirpath, excluded)
+            source_dirs[dirpath] = is_source
+        if is_source:
+            yield path
+
+
+def hash_source_tree(root, digest, excluded=(), ignored=()):
+    """
+    Feeds the relative path and the contents of every tracked source file under ``root`` (see ``iter_tracked_files``)
+    into ``digest``. Files matching the ``ignored`` glob patterns (relative to ``root``, e.g.: ``tests/*``) are skipped.
+    """
+    for path in iter_tracked_files(root, excluded):
+        relpath = os.path.relpath(path, str(root)).replace(os.sep, "/")
+        if any(fnmatch.fnmatch(relpath, pattern) for pattern in ignored):
+            continue
+        digest.update(relpath.encode("utf-8"))
+        digest.update(b"\0")
+        with open(path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+    return digest
+
+
+def parse_limit(value, units):
+    match = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([a-z]?)b?\s*$", value, re.IGNORECASE)
+    if not match or match.group(2).lower() not in units:
+        raise ValueError("invalid value {!r}".format(value))
+    return int(float(match.group(1)) * units[match.group(2).lower()])
+
+
+def parse_size(value):
+    """
+    Parses a size like ``500M`` or ``2G`` (binary units, the unit is optional) into bytes.
+    """
+    return parse_limit(value, SIZE_UNITS)
+
+
+def parse_age(value):
+    """
+    Parses an age like ``12h``, ``30d`` or ``2w`` (seconds if there's no unit) into seconds.
+    """
+    return parse_limit(value, AGE_UNITS)
+
+
+def format_size(size):
+    for unit in "BKMG":
+        if size < 1024:
+            break
+        size /= 1024.0
+    else:
+        unit = "T"
+    return "{:.0f}{}".format(size, unit) if unit == "B" else "{:.1f}{}".format(size, unit)
+
+
+def get_interpreter_id(envconfig):
+    """
+    Returns a json-serializable identification of the interpreter (and ABI) used by ``envconfig``.
+    """
+    info = envconfig.python_info
+    if not info.version_info:
+        raise InterpreterNotFound(envconfig.basepython)
+    return [
+        info.implementation,
+        list(info.version_info),
+        info.extra_version_info and list(info.extra_version_info),
+        info.sysplatform,
+        info.is_64,
+        str(info.executable),
+    ]
+
+
+def get_build_setenv(envconfig):
+    """
+    Returns the ``setenv`` variables of a build env (except the ones tox sets for every env) as sorted pairs.
+
+    The names are copied first, tox can set ``TOX_PACKAGE`` from the main thread while background builds compute this.
+    """
+    names = list(envconfig.setenv.keys())
+    return sorted((name, envconfig.setenv[name]) for name in names if name not in TOX_SETENV)
+
+
+def get_build_settings(config, envconfig):
+    """
+    Returns the settings of a build env that change the wheels it builds, except the interpreter: the build mode (wheel
+    compression and the ``SOURCE_DATE_EPOCH`` of reproducible builds too), the deps and ``setenv`` (e.g.: ``CFLAGS``).
+    """
+    settings = {
+        "isolated_build": bool(config.isolated_build),
+        "pep517": envconfig.wheel_pep517,
+        "deps": [str(dep) for dep in envconfig.deps],
+        "setenv": get_build_setenv(envconfig),
+    }
+    if envconfig.wheel_compression != "default":
+        settings["compression"] = envconfig.wheel_compression
+    if envconfig.wheel_reproducible:
+        try:
+            settings["reproducible"] = get_source_date_epoch(config.setupdir)
+        except ValueError:  # the build reports it
+            settings["reproducible"] = os.environ["SOURCE_DATE_EPOCH"]
+    return settings
+
+
+def get_cache_key(config, venv):
+    """
+    Computes the cache key for building a wheel of the project in ``venv``.
+
+    The key covers the source tree (except the ``wheel_cache_ignore`` files), the build settings (see
+    ``get_build_settings``) and the interpreter of the build env.
+    """
+    envconfig = venv.envconfig
+    digest = hashlib.sha256()
+    settings = get_build_settings(config, envconfig)
+    settings.update(version=CACHE_VERSION, interpreter=get_interpreter_id(envconfig))
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    hash_source_tree(
+        config.setupdir, digest, excluded=get_excluded_paths(config, envconfig), ignored=envconfig.wheel_cache_ignore
+    )
+    return digest.hexdigest()
+
+
+def get_excluded_paths(config, envconfig):
+    """
+    Returns the paths in the project that are not sources (tox's directories and the build outputs).
+    """
+    return [
+        config.toxworkdir,
+        config.distdir,
+        config.distshare,
+        envconfig.wheel_cache_dir,
+        config.setupdir.join("build"),
+        config.setupdir.join("dist"),
+    ]
+
+
+class WheelCache(object):
+    """
+    A directory of built wheels, stored as ``<path>/<key>/<wheel filename>``.
+
+    The modification time of an entry's directory is its last use, when ``max_size`` (bytes) or ``max_age`` (seconds)
+    are given the least recently used entries are evicted after every insert.
+    """
+
+    def __init__(self, path, max_size=None, max_age=None):
+        self.path = py.path.local(path)
+        self.max_size = max_size
+        self.max_age = max_age
+
+    def lock(self, key):
+        """
+        Holds an inter-process lock for ``key``.
+
+        Concurrent tox processes that would build the same wheel wait on this and then reuse the first process' build.
+        """
+        return hold_lock(self.path.join("{}.lock".format(key)), verbosity0)
+
+    def get(self, key):
+        entry = self.path.join(key)
+        if entry.check(dir=1):
+            wheels = entry.listdir("*.whl")
+            if wheels:
+                os.utime(str(entry))
+                return wheels[0]
+        return None
+
+    def put(self, key, wheel):
+        """
+        Copies ``wheel`` into the cache and returns the cached path.
+
+        The copy is written to a temporary file first and renamed into place, thus readers never see partial wheels.
+        """
+        entry = self.path.join(key)
+        entry.ensure(dir=1)
+        target = entry.join(wheel.basename)
+        fd, tmp = tempfile.mkstemp(dir=str(entry), prefix=".tmp-", suffix=".whl")
+        os.close(fd)
+        try:
+            wheel.copy(py.path.local(tmp))
+            os.replace(tmp, str(target))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        os.utime(str(entry))
+        return target
+
+    def entries(self):
+        """
+        Returns ``(key, wheel, size, last used)`` for every entry, least recently used first.
+        """
+        entries = []
+        if not self.path.check(dir=1):
+            return entries
+        for entry in self.path.listdir(lambda path: path.check(dir=1) and not path.basename.startswith(".")):
+            try:
+                files = entry.listdir()
+                last_used = entry.mtime()
+            except py.error.ENOENT:
+                continue
+            wheels = [path for path in files if path.ext == ".whl"]
+            size = sum(path.size() for path in files if path.check(file=1))
+            entries.append((entry.basename, wheels[0] if wheels else None, size, last_used))
+        entries.sort(key=lambda entry: entry[3])
+        return entries
+
+    def prune(self, keep=(), now=None):
+        """
+        Removes the entries not used in ``max_age`` and then the least recently used ones until the cache fits in
+        ``max_size``. The entries in ``keep`` and the entries in use by other processes are never removed.
+
+        Returns the list of removed ``(key, wheel, size, last used)`` entries (``None`` if another process is
+        pruning the cache).
+        """
+        if not self.path.check(dir=1):  # nothing was cached yet
+            return []
+        prune_lock = FileLock(str(self.path.join(".prune.lock")))
+        try:
+            prune_lock.acquire(0)
+        except Timeout:
+            return None
+        try:
+            now = time.time() if now is None else now
+            self.remove_stale_tmp(now)
+            self.remove_stale_locks(now)
+            entries = self.entries()
+            total = sum(entry[2] for entry in entries)
+            removed = []
+            for entry in entries:
+                key, _, size, last_used = entry
+                expired = self.max_age is not None and now - last_used > self.max_age
+                oversized = self.max_size is not None and total > self.max_size
+                if key in keep or not (expired or oversized):
+                    continue
+                if self.remove(key):
+                    removed.append(entry)
+                    total -= size
+            return removed
+        finally:
+            prune_lock.release()
+
+    def remove(self, key):
+        """
+        Removes the entry for ``key``, unless another process holds its lock. Returns ``True`` if it was removed.
+        """
+        lock = FileLock(str(self.path.join("{}.lock".format(key))))
+        try:
+            lock.acquire(0)
+        except Timeout:
+            return False
+        try:
+            self.discard(key)
+            self.remove_lock(key)
+            return True
+        finally:
+            lock.release()
+
+    def discard(self, key):
+        """
+        Removes the entry for ``key`` (the caller needs to hold its lock).
+        """
+        shutil.rmtree(str(self.path.join(key)), ignore_errors=True)
+
+    def remove_stale_tmp(self, now):
+        for tmp in self.path.visit(".tmp-*.whl"):
+            try:
+                if now - tmp.mtime() > STALE_TMP_AGE:
+                    tmp.remove()
+            except py.error.ENOENT:
+                pass
+
+    def remove_lock(self, key):
+        """
+        Removes the lock file of ``key`` (the caller needs to hold the lock). A process that already opened it might
+        still get the lock of the removed file, at worst it builds the same wheel again.
+        """
+        try:
+            os.unlink(str(self.path.join("{}.lock".format(key))))
+        except OSError:  # gone already, or still open on windows
+            pass
+
+    def remove_stale_locks(self, now):
+        """
+        Removes the lock files of keys that have no entry (the build failed or was interrupted) and weren't used
+        recently.
+        """
+        for path in self.path.listdir(lambda path: path.ext == ".lock" and not path.basename.startswith(".")):
+            key = path.purebasename
+            try:
+                if self.path.join(key).check() or now - path.mtime() <= STALE_TMP_AGE:
+                    continue
+            except py.error.ENOENT:
+                continue
+            lock = FileLock(str(path))
+            try:
+                lock.acquire(0)
+            except Timeout:
+                continue
+            try:
+                if not self.path.join(key).check():
+                    self.remove_lock(key)
+            finally:
+                lock.release()
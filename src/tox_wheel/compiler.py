@@ -0,0 +1,77 @@
+import json
+import os
+import subprocess
+
+import py
+from packaging.version import InvalidVersion
+from packaging.version import Version
+
+#: Compiler caches looked up (in this order) for ``wheel_compiler_cache = auto``.
+COMPILER_CACHES = ("ccache", "sccache")
+
+COMPILERS_SCRIPT = "import sysconfig; print(sysconfig.get_config_var('CC') or 'cc'); print(sysconfig.get_config_var('CXX') or 'c++')"
+SETUPTOOLS_VERSION_SCRIPT = "import setuptools; print(setuptools.__version__)"
+
+#: The first setuptools version that reads ``DIST_EXTRA_CONFIG``.
+DIST_EXTRA_CONFIG_SETUPTOOLS = Version("65.4")
+
+#: Interpreter executable mapped to the compilers it was built with.
+compilers = {}
+
+
+def find_compiler_cache(name):
+    """
+    Returns the path of the compiler cache ``name`` (``auto`` to use the first available) or ``None`` if not found.
+    """
+    for candidate in COMPILER_CACHES if name == "auto" else (name,):
+        if os.path.isabs(candidate) and os.path.isfile(candidate):
+            return py.path.local(candidate)
+        path = py.path.local.sysfind(candidate)
+        if path:
+            return path
+    return None
+
+
+def get_compilers(python):
+    """
+    Returns the C and C++ compiler commands (as ``{"CC": ..., "CXX": ...}``) used by distutils for the ``python``
+    interpreter.
+    """
+    python = str(python)
+    if python not in compilers:
+        output = subprocess.check_output([python, "-c", COMPILERS_SCRIPT], universal_newlines=True)
+        compilers[python] = dict(zip(("CC", "CXX"), output.splitlines()))
+    return compilers[python]
+
+
+def get_setuptools_version(python):
+    """
+    Returns the version of setuptools installed for the ``python`` interpreter (``None`` if it can't be determined).
+    """
+    try:
+        output = subprocess.check_output(
+            [str(python), "-c", SETUPTOOLS_VERSION_SCRIPT], universal_newlines=True, stderr=subprocess.DEVNULL
+        )
+        return Version(output.strip())
+    except (OSError, subprocess.CalledProcessError, InvalidVersion):
+        return None
+
+
+def get_cache_stats(cache):
+    """
+    Returns the ``(hits, misses)`` counters of the compiler ``cache`` (``None`` if they can't be read).
+    """
+    try:
+        if cache.purebasename == "sccache":
+            output = subprocess.check_output(
+                [str(cache), "--show-stats", "--stats-format=json"], universal_newlines=True, stderr=subprocess.DEVNULL
+            )
+            stats = json.loads(output)["stats"]
+            return sum(stats["cache_hits"]["counts"].values()), sum(stats["cache_misses"]["counts"].values())
+        else:
+            output = subprocess.check_output([str(cache), "--print-stats"], universal_newlines=True, stderr=subprocess.DEVNULL)
+            stats = dict(line.split("\t", 1) for line in output.splitlines() if "\t" in line)
+            hits = int(stats.get("direct_cache_hit", 0)) + int(stats.get("preprocessed_cache_hit", 0))
+            return hits, int(stats.get("cache_miss", 0))
+    except (OSError, subprocess.CalledProcessError, ValueError, KeyError):
+        return None
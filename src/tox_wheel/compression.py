@@ -0,0 +1,154 @@
+import csv
+import io
+import os
+import shutil
+import stat
+import sys
+import time
+import zipfile
+
+#: ``wheel_compression`` value mapped to the zip ``(compression, compresslevel)`` (``None`` leaves wheels as built).
+COMPRESSIONS = {
+    "default": None,
+    "fast": (zipfile.ZIP_DEFLATED, 1),
+    "stored": (zipfile.ZIP_STORED, None),
+}
+
+#: Zip files can't store timestamps before 1980.
+ZIP_EPOCH = 315532800
+UNIX = 3
+
+
+def get_compression(value):
+    """
+    Returns the zip ``(compression, compresslevel)`` for a ``wheel_compression`` value (``None`` for the default).
+    """
+    value = value.strip() or "default"
+    if value not in COMPRESSIONS:
+        raise ValueError("invalid value {!r} (expected one of: {})".format(value, ", ".join(COMPRESSIONS)))
+    return COMPRESSIONS[value]
+
+
+def write_member(archive, info, data, level):
+    """
+    Writes ``data`` as the zip member ``info`` of ``archive`` with the given compression ``level`` (``None`` for the
+    default level, Python 3.6 can't set it).
+    """
+    if level is None or sys.version_info < (3, 7):
+        archive.writestr(info, data)
+    else:
+        archive.writestr(info, data, compresslevel=level)
+
+
+def get_date_time(epoch):
+    """
+    Returns the zip timestamp for a ``SOURCE_DATE_EPOCH`` (in UTC, as the wheel package does).
+    """
+    date_time = time.gmtime(max(epoch, ZIP_EPOCH))[:6]
+    return date_time[:5] + (date_time[5] // 2 * 2,)  # zip only has a 2 seconds resolution
+
+
+def get_normalized_attr(member):
+    if member.is_dir():
+        return (stat.S_IFDIR | 0o755) << 16 | 0x10  # MS-DOS directory flag
+    return (stat.S_IFREG | (0o755 if member.external_attr >> 16 & 0o111 else 0o644)) << 16
+
+
+def get_normalized_order(members):
+    """
+    Returns the ``members`` sorted by name, with the ``.dist-info`` directory last and its ``RECORD`` at the very end.
+    """
+    def key(member):
+        top, _, rest = member.filename.partition("/")
+        dist_info = top.endswith(".dist-info")
+        return dist_info, dist_info and rest == "RECORD", member.filename
+
+    return sorted(members, key=key)
+
+
+def find_record(members):
+    for member in members:
+        top, _, rest = member.filename.partition("/")
+        if top.endswith(".dist-info") and rest == "RECORD":
+            return member
+    return None
+
+
+def sort_record(content, order):
+    """
+    Returns the ``RECORD`` ``content`` with the rows in the given ``order`` of paths (unknown paths last, sorted).
+    """
+    rows = [row for row in csv.reader(io.StringIO(content)) if row]
+    position = {path: index for index, path in enumerate(order)}
+    rows.sort(key=lambda row: (position.get(row[0], len(position)), row[0]))
+    record = io.StringIO()
+    csv.writer(record, lineterminator="\n").writerows(rows)
+    return record.getvalue()
+
+
+def is_normalized(archive, members, date_time):
+    if members != get_normalized_order(members):
+        return False
+    for member in members:
+        if member.date_time != date_time or member.create_system != UNIX or member.external_attr != get_normalized_attr(member):
+            return False
+    record = find_record(members)
+    if record is not None:
+        content = archive.read(record).decode("utf-8")
+        if content != sort_record(content, [member.filename for member in members]):
+            return False
+    return True
+
+
+def repack_wheel(wheel, compression=None, date_time=None):
+    """
+    Rewrites ``wheel`` with the given zip ``(compression, compresslevel)`` (``None`` keeps the compression of each
+    member), members are streamed and keep their contents (thus ``RECORD`` stays valid).
+
+    If a ``date_time`` is given the wheel is normalized too: the members are sorted (``.dist-info`` last), all get that
+    timestamp and ``0644``/``0755`` permissions, and the ``RECORD`` rows follow the member order. Otherwise the members
+    keep their order, timestamps and permissions.
+
+    Returns ``False`` if the wheel didn't need repacking.
+    """
+    method, level = compression or (None, None)
+    tmp = wheel.new(basename=".repack-{}".format(wheel.basename))
+    with zipfile.ZipFile(str(wheel)) as source:
+        members = source.infolist()
+        # the compression level isn't stored in the archive, deflated wheels are left as they are for "fast" (inflating
+        # and deflating everything again costs more than installing a wheel with a higher compression level)
+        recompress = method is not None and any(member.compress_type != method for member in members)
+        if not recompress and (date_time is None or is_normalized(source, members, date_time)):
+            return False
+        if date_time is not None:
+            members = get_normalized_order(members)
+        record = find_record(members) if date_time is not None else None
+        order = [member.filename for member in members]
+        try:
+            with zipfile.ZipFile(str(tmp), "w") as target:
+                for member in members:
+                    info = zipfile.ZipInfo(member.filename, date_time=date_time or member.date_time)
+                    if date_time is None:
+                        info.external_attr = member.external_attr
+                        info.create_system = member.create_system
+                    else:
+                        info.external_attr = get_normalized_attr(member)
+                        info.create_system = UNIX
+                    info.compress_type = member.compress_type if method is None else method
+                    if member is record:
+                        content = sort_record(source.read(member).decode("utf-8"), order)
+                        write_member(target, info, content.encode("utf-8"), level)
+                        continue
+                    if level is not None:
+                        # streamed members can't get a compression level (only writestr takes one)
+                        write_member(target, info, source.read(member), level)
+                        continue
+                    info.file_size = member.file_size
+                    with source.open(member) as src, \
+                            target.open(info, "w", force_zip64=member.file_size > zipfile.ZIP64_LIMIT) as dst:
+                        shutil.copyfileobj(src, dst, 1 << 20)
+        except BaseException:
+            tmp.remove(ignore_errors=True)
+            raise
+    os.replace(str(tmp), str(wheel))
+    return True
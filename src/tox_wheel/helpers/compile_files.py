@@ -0,0 +1,47 @@
+"""
+Byte-compiles Python files (in parallel for larger lists) and prints the written ``.pyc`` files as a JSON list.
+
+Usage: python compile_files.py < files.json
+
+The files are read from stdin as a JSON list. Files that fail to compile are reported on stderr and skipped (like pip
+does, a module with syntax errors doesn't fail the install).
+"""
+import json
+import os
+import py_compile
+import sys
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    ProcessPoolExecutor = None
+
+#: Files per worker process, starting a worker costs about as much as compiling this many modules.
+FILES_PER_WORKER = 50
+
+
+def compile_file(path):
+    try:
+        return py_compile.compile(path, doraise=True)
+    except (py_compile.PyCompileError, OSError, ValueError) as exc:
+        sys.stderr.write("could not compile {}: {}\n".format(path, exc))
+        return None
+
+
+def main():
+    files = json.load(sys.stdin)
+    workers = min(os.cpu_count() or 1, len(files) // FILES_PER_WORKER)
+    compiled = None
+    if workers > 1 and ProcessPoolExecutor is not None:
+        try:
+            with ProcessPoolExecutor(workers) as executor:
+                compiled = list(executor.map(compile_file, files, chunksize=max(1, len(files) // (workers * 4))))
+        except (NotImplementedError, OSError):  # no working multiprocessing (e.g.: no sem_open)
+            compiled = None
+    if compiled is None:
+        compiled = [compile_file(path) for path in files]
+    print(json.dumps([path for path in compiled if path]))
+
+
+if __name__ == "__main__":
+    main()
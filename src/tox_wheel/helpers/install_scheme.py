@@ -0,0 +1,55 @@
+"""
+Prints where wheels are installed for the running interpreter (and what it needs to evaluate markers) as JSON.
+
+Usage: python install_scheme.py
+
+The output has the ``purelib``, ``platlib``, ``scripts``, ``data`` and ``headers`` paths, the ``prefix``, the
+interpreter's ``executable`` and ``cache_tag`` and the marker ``environment`` (as in PEP 508).
+"""
+import json
+import os
+import platform
+import sys
+import sysconfig
+
+
+def format_full_version(info):
+    version = "{0.major}.{0.minor}.{0.micro}".format(info)
+    if info.releaselevel != "final":
+        version += info.releaselevel[0] + str(info.serial)
+    return version
+
+
+def main():
+    if hasattr(sysconfig, "get_preferred_scheme"):
+        paths = sysconfig.get_paths(sysconfig.get_preferred_scheme("prefix"))
+    else:
+        paths = sysconfig.get_paths()
+    print(json.dumps({
+        "purelib": paths["purelib"],
+        "platlib": paths["platlib"],
+        "scripts": paths["scripts"],
+        "data": paths["data"],
+        # same location as pip uses in virtualenvs
+        "headers": os.path.join(sys.prefix, "include", "site", "python{0.major}.{0.minor}".format(sys.version_info)),
+        "prefix": sys.prefix,
+        "executable": sys.executable,
+        "cache_tag": sys.implementation.cache_tag,
+        "environment": {
+            "implementation_name": sys.implementation.name,
+            "implementation_version": format_full_version(sys.implementation.version),
+            "os_name": os.name,
+            "platform_machine": platform.machine(),
+            "platform_release": platform.release(),
+            "platform_system": platform.system(),
+            "platform_version": platform.version(),
+            "python_full_version": platform.python_version(),
+            "platform_python_implementation": platform.python_implementation(),
+            "python_version": ".".join(platform.python_version_tuple()[:2]),
+            "sys_platform": sys.platform,
+        },
+    }))
+
+
+if __name__ == "__main__":
+    main()
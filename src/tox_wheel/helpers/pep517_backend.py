@@ -0,0 +1,68 @@
+"""
+Long-lived PEP 517 build backend driver, runs inside the build env.
+
+Usage: python pep517_backend.py <build-backend> [<backend-path>]
+
+Requests are read from stdin as JSON lines (``{"hook": name, "kwargs": {...}}``) and for each one a JSON line is
+written on the original stdout: ``{"result": ...}`` or ``{"error": ..., "traceback": ...}``. Anything the backend
+prints (including output from compilers it spawns) goes to stderr. If the request has a ``"profile"`` path the hook
+runs under cProfile and the profile data is written there.
+"""
+import cProfile
+import importlib
+import json
+import os
+import sys
+import traceback
+
+#: Hook name mapped to the fallback used when the backend doesn't implement the optional hook.
+OPTIONAL_HOOKS = {
+    "get_requires_for_build_wheel": lambda **kwargs: [],
+    "get_requires_for_build_editable": lambda **kwargs: [],
+    "prepare_metadata_for_build_wheel": lambda **kwargs: None,
+}
+
+
+def load_backend(spec, backend_path):
+    if backend_path:
+        sys.path[:0] = backend_path
+    module_name, _, obj_path = spec.partition(":")
+    backend = importlib.import_module(module_name.strip())
+    for attr in filter(None, obj_path.strip().split(".")):
+        backend = getattr(backend, attr)
+    return backend
+
+
+def main(argv):
+    reply = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    backend_path = argv[2].split(os.pathsep) if len(argv) > 2 and argv[2] else []
+    backend = load_backend(argv[1], backend_path)
+    for line in sys.stdin:
+        request = json.loads(line)
+        importlib.invalidate_caches()
+        try:
+            hook = getattr(backend, request["hook"], None)
+            if hook is None:
+                if request["hook"] not in OPTIONAL_HOOKS:
+                    raise AttributeError("{!r} does not implement {}".format(argv[1], request["hook"]))
+                hook = OPTIONAL_HOOKS[request["hook"]]
+            if request.get("profile"):
+                profiler = cProfile.Profile()
+                try:
+                    response = {"result": profiler.runcall(hook, **request["kwargs"])}
+                finally:
+                    profiler.dump_stats(request["profile"])
+            else:
+                response = {"result": hook(**request["kwargs"])}
+        except BaseException as exc:
+            response = {"error": "{}: {}".format(type(exc).__name__, exc), "traceback": traceback.format_exc()}
+        sys.stderr.flush()
+        reply.write(json.dumps(response) + "\n")
+        reply.flush()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,27 @@
+"""
+Prints the wheel tags supported by the running interpreter (most preferred first) as a JSON list of strings.
+
+Usage: python supported_tags.py
+
+Uses the packaging copy vendored in pip (or packaging itself if installed), prints ``null`` if neither is available.
+"""
+import json
+
+try:
+    from pip._vendor.packaging import tags
+except ImportError:
+    try:
+        from packaging import tags
+    except ImportError:
+        tags = None
+
+
+def main():
+    if tags is None:
+        print(json.dumps(None))
+    else:
+        print(json.dumps([str(tag) for tag in tags.sys_tags()]))
+
+
+if __name__ == "__main__":
+    main()
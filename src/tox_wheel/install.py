@@ -0,0 +1,292 @@
+import base64
+import csv
+import hashlib
+import io
+import json
+import os
+import posixpath
+import shutil
+import subprocess
+import zipfile
+from configparser import ConfigParser
+from email.parser import Parser
+
+from packaging.requirements import InvalidRequirement
+from packaging.requirements import Requirement
+from packaging.utils import canonicalize_name
+
+from .prebuilt import parse_wheel_filename
+
+SCHEME_SCRIPT = os.path.join(os.path.dirname(__file__), "helpers", "install_scheme.py")
+COMPILE_SCRIPT = os.path.join(os.path.dirname(__file__), "helpers", "compile_files.py")
+INSTALLER = "tox-wheel"
+SCHEME_KEYS = ("purelib", "platlib", "scripts", "data", "headers")
+
+#: Longest shebang line the kernel is guaranteed to handle, longer ones go through ``/bin/sh``.
+MAX_SHEBANG_LENGTH = 127
+
+SCRIPT_TEMPLATE = """{shebang}
+# -*- coding: utf-8 -*-
+import re
+import sys
+from {module} import {name}
+if __name__ == "__main__":
+    sys.argv[0] = re.sub(r"(-script\\.pyw|\\.exe)?$", "", sys.argv[0])
+    sys.exit({function}())
+"""
+
+#: Interpreter executable mapped to its install scheme (as printed by ``helpers/install_scheme.py``).
+install_schemes = {}
+
+
+class WheelInstallError(Exception):
+    pass
+
+
+def run_helper(python, script, input=None):
+    """
+    Runs one of the ``helpers`` scripts with the ``python`` interpreter and returns its (json) output.
+
+    A failing script raises ``WheelInstallError`` with what the interpreter printed.
+    """
+    try:
+        process = subprocess.run(
+            [str(python), script], input=input, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True, check=True,
+        )
+    except subprocess.CalledProcessError as exc:
+        raise WheelInstallError("{} {} failed with exit code {}:\n{}".format(
+            python, os.path.basename(script), exc.returncode, (exc.stdout + exc.stderr).strip()
+        ))
+    return json.loads(process.stdout)
+
+
+def get_install_scheme(python):
+    """
+    Returns the install paths, ``prefix``, ``executable``, ``cache_tag`` and marker ``environment`` of the ``python``
+    interpreter.
+    """
+    python = str(python)
+    if python not in install_schemes:
+        install_schemes[python] = run_helper(python, SCHEME_SCRIPT)
+    return install_schemes[python]
+
+
+def read_metadata(archive, dist_info, basename):
+    try:
+        content = archive.read("{}/{}".format(dist_info, basename)).decode("utf-8")
+    except KeyError:
+        raise WheelInstallError("{}/{} is missing".format(dist_info, basename))
+    return Parser().parsestr(content, headersonly=True)
+
+
+def find_dist_info(archive, name):
+    dist_infos = {
+        member.split("/")[0]
+        for member in archive.namelist()
+        if member.split("/")[0].endswith(".dist-info") and canonicalize_name(member.split("-")[0]) == canonicalize_name(name)
+    }
+    if len(dist_infos) != 1:
+        raise WheelInstallError("expected one {} .dist-info directory, found {}".format(name, len(dist_infos)))
+    return dist_infos.pop()
+
+
+def get_requirements(wheel, extras, environment):
+    """
+    Returns the requirements of ``wheel`` (with the given ``extras``) that apply to the marker ``environment``.
+    """
+    name, _, _ = parse_wheel_filename(wheel.basename)
+    with zipfile.ZipFile(str(wheel)) as archive:
+        metadata = read_metadata(archive, find_dist_info(archive, name), "METADATA")
+    requirements = []
+    for extra in [""] + sorted(canonicalize_name(extra) for extra in extras):
+        for value in metadata.get_all("Requires-Dist") or ():
+            try:
+                requirement = Requirement(value)
+            except InvalidRequirement as exc:
+                raise WheelInstallError("invalid Requires-Dist {!r}: {}".format(value, exc))
+            if requirement.marker is not None:
+                if not requirement.marker.evaluate(dict(environment, extra=extra)):
+                    continue
+                requirement.marker = None
+            if str(requirement) not in requirements:
+                requirements.append(str(requirement))
+    return requirements
+
+
+def get_shebang(python):
+    if " " not in python and len(python) + 2 <= MAX_SHEBANG_LENGTH:
+        return "#!{}".format(python)
+    else:
+        return "#!/bin/sh\n'''exec' \"{}\" \"$0\" \"$@\"\n' '''".format(python)
+
+
+def get_target(scheme, root, path):
+    """
+    Returns where the archive member ``path`` is installed (``root`` is the directory the wheel's root goes to).
+    """
+    parts = path.split("/")
+    if path.startswith("/") or ".." in parts or ":" in parts[0]:
+        raise WheelInstallError("{} is outside the wheel".format(path))
+    if parts[0].endswith(".data") and len(parts) > 2:
+        if parts[1] not in SCHEME_KEYS:
+            raise WheelInstallError("{} is in an unknown scheme directory".format(path))
+        if parts[1] == "headers":
+            base = os.path.join(scheme["headers"], parts[0][:-5].split("-")[0])
+        else:
+            base = scheme[parts[1]]
+        return parts[1], os.path.join(base, *parts[2:])
+    return None, os.path.join(root, *parts)
+
+
+def uninstall_dist(scheme, name):
+    """
+    Removes the files of the installed distribution ``name`` (as listed in its ``RECORD``) and returns how many there
+    were.
+    """
+    removed = 0
+    directories = set()
+    for lib in sorted({scheme["purelib"], scheme["platlib"]}):
+        if not os.path.isdir(lib):
+            continue
+        for entry in os.listdir(lib):
+            if not entry.endswith(".dist-info") or canonicalize_name(entry.split("-")[0]) != canonicalize_name(name):
+                continue
+            dist_info = os.path.join(lib, entry)
+            try:
+                with open(os.path.join(dist_info, "RECORD"), newline="") as fh:
+                    paths = [row[0] for row in csv.reader(fh) if row]
+            except FileNotFoundError:
+                paths = []
+            for path in paths:
+                path = os.path.normpath(os.path.join(lib, path))
+                if path.endswith(".py"):
+                    pycache = os.path.join(os.path.dirname(path), "__pycache__")
+                    prefix = os.path.basename(path)[:-3] + "."
+                    if os.path.isdir(pycache):
+                        for pyc in os.listdir(pycache):
+                            if pyc.startswith(prefix) and pyc.endswith(".pyc"):
+                                os.unlink(os.path.join(pycache, pyc))
+                        directories.add(pycache)
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                directories.add(os.path.dirname(path))
+            shutil.rmtree(dist_info, ignore_errors=True)
+    roots = {os.path.normpath(scheme[key]) for key in SCHEME_KEYS}
+    # deepest first so parents emptied by their children are removed too
+    for directory in sorted(directories, key=lambda path: path.count(os.sep), reverse=True):
+        while directory not in roots and os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+    return removed
+
+
+def install_wheel(wheel, scheme, executable=None):
+    """
+    Installs ``wheel`` by unpacking it into the paths of the ``scheme`` (see ``get_install_scheme``), replacing any
+    installed version of the distribution. Scripts get their shebang rewritten (to ``executable``, the scheme's
+    interpreter by default), console scripts are generated, modules are byte-compiled and ``RECORD`` is written.
+
+    Returns the installed files (absolute paths, ``RECORD`` is the last one).
+    """
+    name, _, _ = parse_wheel_filename(wheel.basename)
+    uninstall_dist(scheme, name)
+    python = scheme["executable"]
+    executable = executable or python
+    installed = []
+    sources = []
+    with zipfile.ZipFile(str(wheel)) as archive:
+        dist_info = find_dist_info(archive, name)
+        purelib = read_metadata(archive, dist_info, "WHEEL").get("Root-Is-Purelib", "true").strip().lower() == "true"
+        root = scheme["purelib" if purelib else "platlib"]
+        skipped = {"{}/{}".format(dist_info, basename) for basename in ("RECORD", "RECORD.jws", "RECORD.p7s", "INSTALLER")}
+        for member in archive.infolist():
+            if member.is_dir() or member.filename in skipped:
+                continue
+            kind, target = get_target(scheme, root, member.filename)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with archive.open(member) as src, open(target, "wb") as dst:
+                if kind == "scripts":
+                    first = src.readline()
+                    if first.startswith(b"#!python"):
+                        first = get_shebang(executable).encode("utf-8") + b"\n"
+                    dst.write(first)
+                shutil.copyfileobj(src, dst, 1 << 20)
+            if kind == "scripts" or member.external_attr >> 16 & 0o111:
+                os.chmod(target, 0o755)
+            installed.append(target)
+            if target.endswith(".py") and kind in (None, "purelib", "platlib"):
+                sources.append(target)
+        entry_points = "{}/entry_points.txt".format(dist_info)
+        if entry_points in archive.namelist():
+            installed.extend(write_scripts(archive.read(entry_points).decode("utf-8"), scheme, executable))
+    dist_info = os.path.join(root, dist_info)
+    with open(os.path.join(dist_info, "INSTALLER"), "w") as fh:
+        fh.write(INSTALLER + "\n")
+    installed.append(os.path.join(dist_info, "INSTALLER"))
+    if sources:
+        installed.extend(compile_files(python, sources))
+    write_record(dist_info, installed)
+    return installed + [os.path.join(dist_info, "RECORD")]
+
+
+def write_scripts(entry_points, scheme, executable=None):
+    """
+    Writes the ``console_scripts`` and ``gui_scripts`` in ``entry_points`` (the ``entry_points.txt`` contents) and
+    returns their paths.
+    """
+    parser = ConfigParser(delimiters=("=",), interpolation=None)
+    parser.optionxform = str
+    parser.read_string(entry_points)
+    shebang = get_shebang(executable or scheme["executable"])
+    scripts = []
+    for section in ("console_scripts", "gui_scripts"):
+        if not parser.has_section(section):
+            continue
+        for script, value in parser.items(section):
+            module, _, attrs = value.split("[")[0].strip().partition(":")
+            if not module.strip() or not attrs.strip():
+                raise WheelInstallError("invalid {} entry point {} = {}".format(section, script, value))
+            attrs = attrs.strip()
+            target = os.path.join(scheme["scripts"], script)
+            os.makedirs(scheme["scripts"], exist_ok=True)
+            with open(target, "w") as fh:
+                fh.write(SCRIPT_TEMPLATE.format(shebang=shebang, module=module.strip(), name=attrs.split(".")[0], function=attrs))
+            os.chmod(target, 0o755)
+            scripts.append(target)
+    return scripts
+
+
+def compile_files(python, files):
+    """
+    Byte-compiles ``files`` with the ``python`` interpreter (using a process pool for larger packages) and returns the
+    written ``.pyc`` files.
+    """
+    return run_helper(python, COMPILE_SCRIPT, input=json.dumps(files))
+
+
+def get_record_hash(path):
+    """
+    Returns the ``RECORD`` hash and size of the file at ``path``.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return "sha256={}".format(base64.urlsafe_b64encode(digest.digest()).rstrip(b"=").decode("ascii")), size
+
+
+def write_record(dist_info, installed):
+    lib = os.path.dirname(dist_info)
+    record = io.StringIO()
+    writer = csv.writer(record, lineterminator="\n")
+    for path in installed:
+        writer.writerow([posixpath.join(*os.path.relpath(path, lib).split(os.sep))] + list(get_record_hash(path)))
+    writer.writerow([posixpath.join(os.path.basename(dist_info), "RECORD"), "", ""])
+    with open(os.path.join(dist_info, "RECORD"), "w", newline="") as fh:
+        fh.write(record.getvalue())
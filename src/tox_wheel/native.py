@@ -0,0 +1,591 @@
+import ast
+import base64
+import csv
+import hashlib
+import io
+import os
+import re
+import stat
+import sys
+import time
+import zipfile
+from configparser import ConfigParser
+from fnmatch import fnmatchcase
+from glob import escape
+from glob import glob
+
+from packaging.requirements import InvalidRequirement
+from packaging.requirements import Requirement
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion
+from packaging.version import Version
+from tox.config import get_py_project_toml
+
+from . import __version__
+from .compression import get_date_time
+from .compression import write_member
+
+#: Build backends that the native writer can stand in for (``None`` is the PEP 517 default).
+SETUPTOOLS_BACKENDS = {None, "setuptools.build_meta", "setuptools.build_meta:__legacy__"}
+#: Build requirements that the native writer can stand in for (anything else, e.g.: a setuptools plugin like
+#: setuptools_scm, can add files or metadata).
+SETUPTOOLS_REQUIRES = {"setuptools", "wheel"}
+
+#: Nodes of the constant expressions (e.g.: docstrings) that ``setup.py`` can have besides the ``setup()`` call.
+if sys.version_info >= (3, 8):
+    CONSTANT_NODES = (ast.Constant,)
+else:
+    CONSTANT_NODES = (ast.Str, ast.Num, ast.Bytes, ast.NameConstant, ast.Ellipsis)
+
+#: The ``[project]`` and ``[tool.setuptools]`` keys that the native writer knows how to handle.
+PROJECT_KEYS = {
+    "name", "version", "description", "readme", "requires-python", "license", "authors", "maintainers", "keywords",
+    "classifiers", "urls", "dependencies", "optional-dependencies", "scripts", "gui-scripts", "entry-points",
+}
+SETUPTOOLS_KEYS = {"packages", "package-dir", "py-modules", "zip-safe", "platforms", "include-package-data"}
+
+#: The ``setup.cfg`` options that the native writer knows how to handle.
+SETUP_CFG_METADATA = {
+    "name", "version", "description", "summary", "long_description", "long_description_content_type", "author",
+    "author_email", "maintainer", "maintainer_email", "license", "url", "home_page", "project_urls", "classifiers",
+    "classifier", "keywords", "platforms", "platform", "license_files", "license_file",
+}
+SETUP_CFG_OPTIONS = {
+    "packages", "package_dir", "py_modules", "install_requires", "python_requires", "zip_safe", "include_package_data",
+}
+SETUP_CFG_SECTIONS = {"metadata", "options", "options.packages.find", "options.extras_require", "options.entry_points"}
+
+#: What setuptools' auto-discovery ignores in flat layouts.
+FLAT_LAYOUT_EXCLUDED_PACKAGES = (
+    "ci", "bin", "debian", "doc", "docs", "documentation", "manpages", "news", "newsfragments", "changelog", "test",
+    "tests", "unit_test", "unit_tests", "example", "examples", "scripts", "tools", "util", "utils", "python", "build",
+    "dist", "venv", "env", "requirements", "tasks", "fabfile", "site_scons", "benchmark", "benchmarks", "exercise",
+    "exercises", "htmlcov", "[._]*",
+)
+FLAT_LAYOUT_EXCLUDED_MODULES = (
+    "setup", "conftest", "test", "tests", "example", "examples", "build", "toxfile", "noxfile", "pavement", "dodo",
+    "tasks", "fabfile", "[Ss][Cc]onstruct", "conanfile", "manage", "benchmark", "benchmarks", "exercise", "exercises",
+    "[._]*",
+)
+README_CONTENT_TYPES = {".md": "text/markdown", ".rst": "text/x-rst", ".txt": "text/plain"}
+#: The license files setuptools includes if ``license_files`` is not set.
+LICENSE_FILE_PATTERNS = ("LICEN[CS]E*", "COPYING*", "NOTICE*", "AUTHORS*")
+
+
+class UnsupportedProject(Exception):
+    """
+    The project needs something the native writer doesn't do (the message says what), the real backend is needed.
+    """
+
+
+def is_trivial_setup(path):
+    """
+    Checks if the ``setup.py`` at ``path`` does nothing but call ``setup()`` without arguments.
+    """
+    try:
+        tree = ast.parse(path.read_binary())
+    except SyntaxError:
+        return False
+    body = tree.body
+    if body and isinstance(body[-1], ast.If):
+        body = body[:-1] + body[-1].body
+    calls = []
+    for node in body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            continue
+        if isinstance(node, ast.Expr) and isinstance(node.value, CONSTANT_NODES):
+            continue
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+            calls.append(node.value)
+            continue
+        return False
+    return (
+        len(calls) == 1
+        and not calls[0].args
+        and not calls[0].keywords
+        and getattr(calls[0].func, "id", getattr(calls[0].func, "attr", None)) == "setup"
+    )
+
+
+def split_list(value):
+    return [item.strip() for item in re.split(r"[\n,;]", value) if item.strip()] if value else []
+
+
+def read_text(setupdir, path):
+    path = setupdir.join(path)
+    if not path.check(file=1):
+        raise UnsupportedProject("{} does not exist".format(path))
+    return path.read_text("utf-8")
+
+
+def get_content_type(path):
+    return README_CONTENT_TYPES.get(os.path.splitext(str(path))[1].lower(), "text/plain")
+
+
+def add_extra(requirement, extra):
+    requirement = Requirement(requirement)
+    marker = requirement.marker
+    requirement.marker = None
+    if marker:
+        return '{}; ({}) and extra == "{}"'.format(requirement, marker, extra)
+    else:
+        return '{}; extra == "{}"'.format(requirement, extra)
+
+
+def check_requirements(requirements):
+    for requirement in requirements:
+        try:
+            Requirement(requirement)
+        except InvalidRequirement as exc:
+            raise UnsupportedProject("invalid requirement {!r}: {}".format(requirement, exc))
+    return requirements
+
+
+def format_people(people):
+    names = []
+    emails = []
+    for person in people:
+        if "email" in person:
+            emails.append("{} <{}>".format(person["name"], person["email"]) if "name" in person else person["email"])
+        elif "name" in person:
+            names.append(person["name"])
+    return ", ".join(names), ", ".join(emails)
+
+
+def get_pyproject_project(setupdir, pyproject):
+    """
+    Returns the project described by the ``[project]`` table of ``pyproject.toml``.
+    """
+    project = pyproject["project"]
+    tool = pyproject.get("tool", {}).get("setuptools", {})
+    unsupported = sorted(set(project).difference(PROJECT_KEYS)) + sorted(set(tool).difference(SETUPTOOLS_KEYS))
+    if project.get("dynamic"):
+        raise UnsupportedProject("dynamic metadata ({})".format(", ".join(project["dynamic"])))
+    if unsupported:
+        raise UnsupportedProject("unsupported settings ({})".format(", ".join(unsupported)))
+    if "name" not in project or "version" not in project:
+        raise UnsupportedProject("name or version missing from [project]")
+
+    metadata = [("Name", project["name"]), ("Version", project["version"])]
+    if "description" in project:
+        metadata.append(("Summary", project["description"]))
+    for header, key in [("Author", "authors"), ("Maintainer", "maintainers")]:
+        names, emails = format_people(project.get(key, []))
+        if names:
+            metadata.append((header, names))
+        if emails:
+            metadata.append(("{}-email".format(header), emails))
+    license = project.get("license")
+    if isinstance(license, dict):
+        license = license.get("text") or read_text(setupdir, license["file"])
+    if license:
+        metadata.append(("License", license))
+    if project.get("keywords"):
+        metadata.append(("Keywords", ",".join(project["keywords"])))
+    metadata.extend(("Classifier", classifier) for classifier in project.get("classifiers", []))
+    metadata.extend(("Project-URL", "{}, {}".format(label, url)) for label, url in project.get("urls", {}).items())
+    if "requires-python" in project:
+        metadata.append(("Requires-Python", project["requires-python"]))
+    metadata.extend(("Requires-Dist", requirement) for requirement in check_requirements(project.get("dependencies", [])))
+    for extra, requirements in project.get("optional-dependencies", {}).items():
+        metadata.append(("Provides-Extra", extra))
+        metadata.extend(("Requires-Dist", add_extra(requirement, extra)) for requirement in check_requirements(requirements))
+
+    readme = project.get("readme")
+    description = None
+    if isinstance(readme, str):
+        description = read_text(setupdir, readme), get_content_type(readme)
+    elif isinstance(readme, dict):
+        text = readme["text"] if "text" in readme else read_text(setupdir, readme["file"])
+        description = text, readme.get("content-type") or get_content_type(readme.get("file", ""))
+
+    entry_points = {group: dict(entries) for group, entries in project.get("entry-points", {}).items()}
+    for group, key in [("console_scripts", "scripts"), ("gui_scripts", "gui-scripts")]:
+        if project.get(key):
+            entry_points.setdefault(group, {}).update(project[key])
+
+    package_dir = tool.get("package-dir", {})
+    packages = tool.get("packages")
+    if isinstance(packages, dict):
+        find = packages.get("find", {})
+        packages = []
+        for where in find.get("where", ["."]):
+            packages.extend(find_packages(
+                setupdir.join(where), find.get("include", ["*"]), find.get("exclude", []), find.get("namespaces", True)
+            ))
+            if where != ".":
+                package_dir = dict(package_dir, **{"": where})
+    return {
+        "metadata": metadata,
+        "description": description,
+        "entry_points": entry_points,
+        "packages": packages,
+        "package_dir": package_dir,
+        "py_modules": tool.get("py-modules"),
+        "license_files": None,
+    }
+
+
+def get_setup_cfg_project(setupdir, setup_cfg):
+    """
+    Returns the project described by the ``[metadata]`` and ``[options]`` sections of ``setup.cfg``.
+    """
+    parser = ConfigParser(interpolation=None)
+    parser.read(str(setup_cfg), encoding="utf-8")
+    sections = [section for section in parser.sections() if section.startswith("options") or section == "metadata"]
+    unsupported = sorted(set(sections).difference(SETUP_CFG_SECTIONS))
+    for section, known in [("metadata", SETUP_CFG_METADATA), ("options", SETUP_CFG_OPTIONS)]:
+        if parser.has_section(section):
+            unsupported.extend("{}.{}".format(section, key) for key in parser.options(section) if key not in known)
+    if parser.has_section("bdist_wheel"):
+        unsupported.extend("bdist_wheel.{}".format(key) for key in parser.options("bdist_wheel") if key != "universal")
+    if parser.has_section("egg_info"):
+        unsupported.extend("egg_info.{}".format(key) for key in parser.options("egg_info") if key.startswith("tag_"))
+    if unsupported:
+        raise UnsupportedProject("unsupported settings ({})".format(", ".join(unsupported)))
+
+    def get(section, key, fallback=""):
+        value = parser.get(section, key, fallback=fallback)
+        if value is None:
+            return None
+        value = value.strip()
+        if value.startswith("attr:"):
+            raise UnsupportedProject("dynamic {}.{}".format(section, key))
+        if value.startswith("file:"):
+            value = "\n".join(read_text(setupdir, path).strip() for path in split_list(value[5:]))
+        return value
+
+    name = get("metadata", "name")
+    version = get("metadata", "version")
+    if not name or not version:
+        raise UnsupportedProject("name or version missing from [metadata]")
+    metadata = [("Name", name), ("Version", version)]
+    for header, keys in [
+        ("Summary", ["description", "summary"]),
+        ("Home-page", ["url", "home_page"]),
+        ("Author", ["author"]),
+        ("Author-email", ["author_email"]),
+        ("Maintainer", ["maintainer"]),
+        ("Maintainer-email", ["maintainer_email"]),
+        ("License", ["license"]),
+    ]:
+        value = next((get("metadata", key) for key in keys if get("metadata", key)), "")
+        if value:
+            metadata.append((header, value))
+    keywords = split_list(get("metadata", "keywords"))
+    if keywords:
+        metadata.append(("Keywords", ",".join(keywords)))
+    for platform in split_list(get("metadata", "platforms") or get("metadata", "platform")):
+        metadata.append(("Platform", platform))
+    for classifier in (get("metadata", "classifiers") or get("metadata", "classifier")).splitlines():
+        if classifier.strip():
+            metadata.append(("Classifier", classifier.strip()))
+    for line in get("metadata", "project_urls").splitlines():
+        label, _, url = line.partition("=")
+        if url.strip():
+            metadata.append(("Project-URL", "{}, {}".format(label.strip(), url.strip())))
+    python_requires = get("options", "python_requires")
+    if python_requires:
+        metadata.append(("Requires-Python", python_requires))
+    requirements = [line.strip() for line in get("options", "install_requires").splitlines() if line.strip()]
+    metadata.extend(("Requires-Dist", requirement) for requirement in check_requirements(requirements))
+    if parser.has_section("options.extras_require"):
+        for extra in parser.options("options.extras_require"):
+            metadata.append(("Provides-Extra", extra))
+            requirements = [line.strip() for line in get("options.extras_require", extra).splitlines() if line.strip()]
+            metadata.extend(("Requires-Dist", add_extra(requirement, extra)) for requirement in check_requirements(requirements))
+
+    long_description = get("metadata", "long_description")
+    description = None
+    if long_description:
+        content_type = get("metadata", "long_description_content_type") or "text/plain"
+        description = long_description, content_type
+
+    entry_points = {}
+    if parser.has_section("options.entry_points"):
+        for group in parser.options("options.entry_points"):
+            for line in get("options.entry_points", group).splitlines():
+                key, _, value = line.partition("=")
+                if value.strip():
+                    entry_points.setdefault(group, {})[key.strip()] = value.strip()
+
+    package_dir = {}
+    for line in split_list(get("options", "package_dir").replace("\n", ",")):
+        key, _, value = line.rpartition("=")
+        package_dir[key.strip()] = value.strip()
+    packages = get("options", "packages", fallback=None)
+    if packages is None:
+        packages = None
+    elif packages == "find:":
+        where = get("options.packages.find", "where") or "."
+        if where != ".":
+            package_dir.setdefault("", where)
+        packages = find_packages(
+            setupdir.join(where),
+            split_list(get("options.packages.find", "include")) or ["*"],
+            split_list(get("options.packages.find", "exclude")),
+        )
+    elif packages.startswith("find"):
+        raise UnsupportedProject("options.packages = {}".format(packages))
+    else:
+        packages = split_list(packages)
+    py_modules = get("options", "py_modules", fallback=None)
+    license_files = get("metadata", "license_files", fallback=None)
+    license_file = get("metadata", "license_file", fallback=None)
+    if license_files is not None or license_file is not None:
+        license_files = split_list(license_files) + ([license_file] if license_file else [])
+    universal = get("bdist_wheel", "universal", fallback="0").lower() in ("1", "true", "yes", "on")
+    return {
+        "metadata": metadata,
+        "description": description,
+        "entry_points": entry_points,
+        "packages": packages,
+        "package_dir": package_dir,
+        "py_modules": split_list(py_modules) if py_modules is not None else None,
+        "license_files": license_files,
+        "universal": universal,
+    }
+
+
+def find_packages(where, include=("*",), exclude=(), namespaces=False):
+    """
+    Returns the packages (directories with an ``__init__.py``) under ``where``, like setuptools' ``find_packages``.
+
+    With ``namespaces`` (as setuptools' automatic discovery and ``packages.find`` in ``pyproject.toml`` do) directories
+    that have Python files but no ``__init__.py`` are implicit namespace packages, which the native writer doesn't
+    handle.
+    """
+    packages = []
+    pending = [(where, "")]
+    while pending:
+        path, prefix = pending.pop()
+        for child in sorted(path.listdir(lambda child: child.check(dir=1)), reverse=True):
+            if "." in child.basename:
+                continue
+            package = prefix + child.basename
+            excluded = any(fnmatchcase(package, pattern) for pattern in exclude)
+            if not child.join("__init__.py").check(file=1):
+                if namespaces and not excluded and next(child.visit("*.py"), None) is not None:
+                    raise UnsupportedProject("implicit namespace package {}".format(package))
+                continue
+            if any(fnmatchcase(package, pattern) for pattern in include) and not excluded:
+                packages.append(package)
+            pending.append((child, package + "."))
+    return sorted(packages)
+
+
+def find_license_files(setupdir, patterns):
+    """
+    Returns the paths (relative to ``setupdir``) of the license files matching ``patterns``, like setuptools.
+    """
+    files = []
+    for pattern in patterns:
+        for path in sorted(glob(os.path.join(escape(str(setupdir)), pattern))):
+            name = os.path.relpath(path, str(setupdir)).replace(os.sep, "/")
+            if not path.endswith("~") and os.path.isfile(path) and name not in files:
+                files.append(name)
+    return files
+
+
+def discover(setupdir, project):
+    """
+    Fills the packages and modules of a ``project`` that doesn't list them, like setuptools' automatic discovery.
+
+    Only the src-layout and flat layouts with a single top-level package or module are supported.
+    """
+    if project["packages"] is not None or project["py_modules"] is not None:
+        project["packages"] = project["packages"] or []
+        project["py_modules"] = project["py_modules"] or []
+        return
+    if "" in project["package_dir"]:
+        root = setupdir.join(project["package_dir"][""])
+    elif setupdir.join("src").check(dir=1):
+        root = setupdir.join("src")
+        project["package_dir"] = {"": "src"}
+    else:
+        exclude = [pattern for excluded in FLAT_LAYOUT_EXCLUDED_PACKAGES for pattern in (excluded, excluded + ".*")]
+        packages = find_packages(setupdir, exclude=exclude, namespaces=True)
+        modules = [
+            path.purebasename for path in setupdir.listdir("*.py")
+            if not any(fnmatchcase(path.purebasename, pattern) for pattern in FLAT_LAYOUT_EXCLUDED_MODULES)
+        ]
+        top_level = {package.split(".")[0] for package in packages}
+        if len(top_level) > 1 or top_level and modules or len(modules) > 1:
+            raise UnsupportedProject("multiple top-level packages or modules in a flat layout")
+        if not top_level and not modules:
+            raise UnsupportedProject("no packages or modules found")
+        project["packages"] = packages
+        project["py_modules"] = modules
+        return
+    project["packages"] = find_packages(root, namespaces=True)
+    project["py_modules"] = [path.purebasename for path in root.listdir("*.py")]
+
+
+def get_package_path(setupdir, package_dir, package):
+    """
+    Returns the directory of ``package`` according to the ``package_dir`` mapping.
+    """
+    parts = package.split(".") if package else []
+    for index in range(len(parts), -1, -1):
+        prefix = ".".join(parts[:index])
+        if prefix in package_dir:
+            return setupdir.join(package_dir[prefix], *parts[index:])
+    return setupdir.join(*parts)
+
+
+def get_native_project(setupdir):
+    """
+    Returns what's needed to build a wheel of the project in ``setupdir`` natively.
+
+    Raises ``UnsupportedProject`` if the project needs the real build backend (custom ``setup.py``, dynamic metadata,
+    setuptools plugins, package data, extensions, other build backends and so on).
+    """
+    setup = setupdir.join("setup.py")
+    if setup.check() and not is_trivial_setup(setup):
+        raise UnsupportedProject("setup.py does more than calling setup()")
+    if setupdir.join("MANIFEST.in").check():
+        raise UnsupportedProject("MANIFEST.in")
+    pyproject_path = setupdir.join("pyproject.toml")
+    pyproject = get_py_project_toml(pyproject_path) if pyproject_path.check() else {}
+    build_system = pyproject.get("build-system", {})
+    backend = build_system.get("build-backend")
+    if backend not in SETUPTOOLS_BACKENDS:
+        raise UnsupportedProject("build backend {}".format(backend))
+    for requirement in build_system.get("requires", []):
+        try:
+            name = canonicalize_name(Requirement(requirement).name)
+        except InvalidRequirement as exc:
+            raise UnsupportedProject("invalid build requirement {!r}: {}".format(requirement, exc))
+        if name not in SETUPTOOLS_REQUIRES:
+            raise UnsupportedProject("build requirement {}".format(requirement))
+    if "project" in pyproject:
+        project = get_pyproject_project(setupdir, pyproject)
+    elif setupdir.join("setup.cfg").check():
+        project = get_setup_cfg_project(setupdir, setupdir.join("setup.cfg"))
+    else:
+        raise UnsupportedProject("no static metadata")
+    metadata = dict(project["metadata"])
+    try:
+        project["version"] = str(Version(metadata["Version"]))
+    except InvalidVersion:
+        raise UnsupportedProject("invalid version {!r}".format(metadata["Version"]))
+    project["name"] = metadata["Name"]
+    discover(setupdir, project)
+
+    files = []
+    for package in project["packages"]:
+        path = get_package_path(setupdir, project["package_dir"], package)
+        if not path.join("__init__.py").check(file=1):
+            raise UnsupportedProject("package {} not found".format(package))
+        for child in path.listdir(lambda child: child.check(file=1) and (child.ext == ".py" or child.basename == "py.typed")):
+            files.append(("/".join(package.split(".") + [child.basename]), child))
+    for module in project["py_modules"]:
+        package, _, name = module.rpartition(".")
+        path = get_package_path(setupdir, project["package_dir"], package).join("{}.py".format(name))
+        if not path.check(file=1):
+            raise UnsupportedProject("module {} not found".format(module))
+        files.append(("/".join(module.split(".")) + ".py", path))
+    project["files"] = sorted(files, key=lambda item: item[0])
+
+    # bdist_wheel copies the license files into the dist-info directory (by their base name)
+    patterns = project["license_files"]
+    license_files = find_license_files(setupdir, LICENSE_FILE_PATTERNS if patterns is None else patterns)
+    project["metadata"].extend(("License-File", name) for name in license_files)
+    project["license_files"] = []
+    for name in license_files:
+        if all(os.path.basename(name) != other for other, _ in project["license_files"]):
+            project["license_files"].append((os.path.basename(name), setupdir.join(name)))
+    return project
+
+
+def get_dist_info_name(name, version):
+    return "{}-{}".format(canonicalize_name(name).replace("-", "_"), version)
+
+
+def format_metadata(project):
+    """
+    Returns the ``METADATA`` of a ``project``, written as plain UTF-8 like setuptools does (no RFC 2047 encoded words
+    or folded lines).
+    """
+    headers = [("Metadata-Version", "2.1")]
+    for header, value in project["metadata"]:
+        if header == "Version":
+            value = project["version"]
+        headers.append((header, value.replace("\n", "\n        ") if header == "License" else value))
+    description = project["description"]
+    if description:
+        headers.append(("Description-Content-Type", description[1]))
+    return "".join("{}: {}\n".format(header, value) for header, value in headers) + "\n" + (
+        description[0] if description else ""
+    )
+
+
+def format_entry_points(entry_points):
+    return "".join(
+        "[{}]\n{}\n".format(group, "".join("{} = {}\n".format(name, value) for name, value in entries.items()))
+        for group, entries in entry_points.items() if entries
+    )
+
+
+def write_native_wheel(project, wheel_directory, compression=None, source_date_epoch=None):
+    """
+    Writes the wheel of a ``project`` (as returned by ``get_native_project``) in ``wheel_directory``, with the given
+    zip ``(compression, compresslevel)`` (deflated by default). All the files get the ``source_date_epoch`` timestamp
+    if given (see ``reproducible.get_source_date_epoch``).
+
+    Returns the path of the wheel.
+    """
+    tag = "py2.py3-none-any" if project.get("universal") else "py3-none-any"
+    dist_info = "{}.dist-info".format(get_dist_info_name(project["name"], project["version"]))
+    wheel = wheel_directory.join("{}-{}.whl".format(get_dist_info_name(project["name"], project["version"]), tag))
+    generated = [
+        ("METADATA", format_metadata(project)),
+        ("WHEEL", "Wheel-Version: 1.0\nGenerator: tox-wheel ({})\nRoot-Is-Purelib: true\n{}".format(
+            __version__, "".join("Tag: {}-none-any\n".format(python) for python in tag.split("-")[0].split("."))
+        )),
+        ("top_level.txt", "".join("{}\n".format(name) for name in sorted({
+            get_top_level(path) for path, _ in project["files"]
+        }))),
+    ]
+    if project["entry_points"]:
+        generated.append(("entry_points.txt", format_entry_points(project["entry_points"])))
+    generated.extend((name, path.read_binary()) for name, path in project["license_files"])
+    record = io.StringIO()
+    writer = csv.writer(record, lineterminator="\n")
+    method, level = compression or (zipfile.ZIP_DEFLATED, None)
+    with zipfile.ZipFile(str(wheel), "w") as archive:
+        for arcname, path in project["files"]:
+            data = path.read_binary()
+            info = zipfile.ZipInfo(arcname, date_time=get_date_time(
+                int(os.stat(str(path)).st_mtime if source_date_epoch is None else source_date_epoch)
+            ))
+            info.external_attr = (stat.S_IFREG | (0o755 if os.access(str(path), os.X_OK) else 0o644)) << 16
+            info.compress_type = method
+            write_member(archive, info, data, level)
+            writer.writerow([arcname, "sha256=" + get_digest(data), len(data)])
+        date_time = get_date_time(int(time.time() if source_date_epoch is None else source_date_epoch))
+        for name, content in generated:
+            data = content if isinstance(content, bytes) else content.encode("utf-8")
+            info = zipfile.ZipInfo("{}/{}".format(dist_info, name), date_time=date_time)
+            info.external_attr = (stat.S_IFREG | 0o644) << 16
+            info.compress_type = method
+            write_member(archive, info, data, level)
+            writer.writerow([info.filename, "sha256=" + get_digest(data), len(data)])
+        writer.writerow(["{}/RECORD".format(dist_info), "", ""])
+        info = zipfile.ZipInfo("{}/RECORD".format(dist_info), date_time=date_time)
+        info.external_attr = (stat.S_IFREG | 0o644) << 16
+        info.compress_type = method
+        write_member(archive, info, record.getvalue(), level)
+    return wheel
+
+
+def get_top_level(path):
+    """
+    Returns the top level name (package or module) of a file path in the wheel.
+    """
+    name = path.split("/")[0]
+    return os.path.splitext(name)[0] if name.endswith(".py") else name
+
+
+def get_digest(data):
+    return base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=").decode("ascii")
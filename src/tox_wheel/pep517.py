@@ -0,0 +1,84 @@
+import json
+import os
+import subprocess
+
+from tox import reporter
+from tox.config import get_py_project_toml
+from tox.exception import InvocationError
+
+BACKEND_SCRIPT = os.path.join(os.path.dirname(__file__), "helpers", "pep517_backend.py")
+
+#: What PEP 517/518 frontends assume when ``pyproject.toml`` doesn't specify a ``[build-system]``.
+DEFAULT_REQUIRES = ["setuptools>=40.8.0", "wheel"]
+DEFAULT_BACKEND = "setuptools.build_meta:__legacy__"
+
+
+def get_build_system(setupdir):
+    """
+    Returns ``(requires, build_backend, backend_path)`` as specified in the project's ``pyproject.toml``.
+    """
+    pyproject = setupdir.join("pyproject.toml")
+    if pyproject.check():
+        build_system = get_py_project_toml(pyproject).get("build-system", {})
+    else:
+        build_system = {}
+    requires = build_system.get("requires", DEFAULT_REQUIRES)
+    backend = build_system.get("build-backend", DEFAULT_BACKEND)
+    backend_path = [str(setupdir.join(path)) for path in build_system.get("backend-path", [])]
+    return requires, backend, backend_path
+
+
+class BuildBackend(object):
+    """
+    A build backend running in a subprocess (with the given ``python``) that serves hook calls until closed.
+    """
+
+    def __init__(self, python, setupdir, backend, backend_path, env=None):
+        self.backend = backend
+        self.args = [str(python), BACKEND_SCRIPT, backend, os.pathsep.join(backend_path)]
+        reporter.verbosity1("starting build backend {} with {}".format(backend, python))
+        self.process = subprocess.Popen(
+            self.args,
+            cwd=str(setupdir),
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        )
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def call(self, hook, profile=None, **kwargs):
+        request = {"hook": hook, "kwargs": kwargs}
+        if profile:
+            request["profile"] = str(profile)
+        try:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except (IOError, OSError):
+            line = ""
+        if not line:
+            raise InvocationError(self.args, self.process.wait())
+        response = json.loads(line)
+        if "error" in response:
+            reporter.error("{} failed in {}:\n{}".format(hook, self.backend, response["traceback"]))
+            raise InvocationError("{}.{}".format(self.backend, hook))
+        return response["result"]
+
+    def close(self):
+        if self.alive:
+            self.process.stdin.close()
+            self.process.wait()
+        self.process.stdout.close()
+
+
+def get_backend_env(venv):
+    """
+    Returns the environment variables for running a build backend inside ``venv``.
+    """
+    env = venv._get_os_environ(is_test_command=True)
+    env["PATH"] = os.pathsep.join([str(venv.envconfig.envbindir), env.get("PATH", os.environ["PATH"])])
+    return env
@@ -1,4 +1,12 @@
-import os.path
+import cProfile
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 from contextlib import contextmanager
 from functools import partial
 
@@ -6,10 +14,72 @@ import pluggy
 import py
 from tox import package
 from tox import reporter
+from tox.config.parallel import OFF_VALUE as PARALLEL_OFF
+from tox.exception import ConfigError
 from tox.exception import InterpreterNotFound
+from tox.exception import InvocationError
 from tox.package import get_package
+from tox.package.view import create_session_view
 from tox.util.path import ensure_empty_dir
 
+from .builddir import clean_build_dir
+from .builddir import get_config_digest
+from .builddir import record_build_dir
+from .buildenv import WarmBuildEnv
+from .buildenv import Wheelhouse
+from .buildenv import get_warm_env_key
+from .cache import WheelCache
+from .cache import format_size
+from .cache import get_build_settings
+from .cache import get_cache_key
+from .cache import get_excluded_paths
+from .cache import parse_age
+from .cache import parse_size
+from .compiler import DIST_EXTRA_CONFIG_SETUPTOOLS
+from .compiler import find_compiler_cache
+from .compiler import get_cache_stats
+from .compiler import get_compilers
+from .compiler import get_setuptools_version
+from .compression import COMPRESSIONS
+from .compression import get_compression
+from .compression import get_date_time
+from .compression import repack_wheel
+from .install import WheelInstallError
+from .install import get_install_scheme
+from .install import get_requirements
+from .install import install_wheel
+from .native import UnsupportedProject
+from .native import get_native_project
+from .native import write_native_wheel
+from .pep517 import BuildBackend
+from .pep517 import get_backend_env
+from .pep517 import get_build_system
+from .prebuilt import find_prebuilt_wheel
+from .prebuilt import get_project_metadata
+from .prebuilt import get_supported_tags
+from .prebuilt import parse_wheel_filename
+from .profiling import DEFAULT_LIMIT
+from .profiling import get_profile_command
+from .profiling import get_profile_summary
+from .reproducible import get_source_date_epoch
+from .store import get_wheel_store
+from .timings import finish_timings
+from .timings import format_timings
+from .timings import start_timings
+from .timings import timed
+from .timings import write_timings
+from .trees import get_tree
+from .trees import is_staged
+from .trees import link_tree
+from .trees import stage_wheel
+from .verify import WheelVerificationError
+from .verify import verify_wheel
+from .watch import drain_changes
+from .watch import get_changed
+from .watch import get_watcher
+from .watch import snapshot_sources
+from .watch import wait_for_changes
+
 hookimpl = pluggy.HookimplMarker("tox")
 
 
@@ -25,19 +95,91 @@ def tox_addoption(parser):
         action="store_true",
         help="Do not remove build directory (fast but dirty builds)",
     )
+    parser.add_argument(
+        "--wheel-incremental",
+        action="store_true",
+        help="Only remove the build directory outputs whose sources were removed",
+    )
+    parser.add_argument(
+        "--wheel-cache",
+        action="store_true",
+        help="Reuse previously built wheels if the sources did not change",
+    )
+    parser.add_argument(
+        "--wheel-cache-prune",
+        action="store_true",
+        help="Evict the wheel cache entries over the configured limits (wheel_cache_max_size/age) and exit",
+    )
+    parser.add_argument(
+        "--wheel-cache-stats",
+        action="store_true",
+        help="Show the size and entries of the wheel cache and exit",
+    )
+    parser.add_argument(
+        "--wheel-watch",
+        action="store_true",
+        help=(
+            "Build the wheels into the wheel cache and rebuild them whenever the sources change (until interrupted), "
+            "tox runs with the wheel cache enabled then reuse them"
+        ),
+    )
+    parser.add_argument(
+        "--wheel-from",
+        metavar="PATH",
+        default=None,
+        help="Install a prebuilt wheel from PATH (a directory or a glob) instead of building it",
+    )
+    parser.add_argument(
+        "--wheel-background",
+        action="store_true",
+        help="Build wheels in the background while the test envs are created and their deps installed",
+    )
+    parser.add_argument(
+        "--wheel-build-parallel",
+        metavar="N",
+        type=wheel_parse_parallel,
+        default=1,
+        help=(
+            "Build the wheels of up to N build envs concurrently (each in a private build directory), "
+            "auto to use the number of CPUs. Default: %(default)s"
+        ),
+    )
+    parser.add_argument(
+        "--wheel-profile",
+        metavar="N",
+        nargs="?",
+        type=int,
+        const=DEFAULT_LIMIT,
+        default=None,
+        help=(
+            "Run the wheel-make step of the builds under cProfile (the wheel cache is not used), save the profile data "
+            "next to distdir and show the N functions with the most time (default: %(const)s)"
+        ),
+    )
+    parser.add_argument(
+        "--wheel-timings",
+        metavar="PATH",
+        default=None,
+        help="Write a JSON report with the timings of each packaging phase to PATH",
+    )
     parser.add_testenv_attribute(
         name="wheel",
-        type="bool",
-        default=False,
-        help="Build wheel instead of sdist",
+        type="string",
+        default="false",
+        postprocess=wheel_parse_wheel,
+        help=(
+            "Build wheel instead of sdist (true, false or editable to build a PEP 660 editable wheel once per "
+            "session)"
+        ),
     )
     parser.add_testenv_attribute(
         name="wheel_pep517",
         type="string",
         default="",
         help=(
-            "Build wheel using PEP 517/518 (pass true to build with pip or "
-            "build to build with build)"
+            "Build wheel using PEP 517/518 (pass true to build with pip, "
+            "build to build with build, hooks to call the build backend directly "
+            "or native to write simple pure Python wheels without the build backend)"
         ),
     )
     parser.add_testenv_attribute(
@@ -46,12 +188,167 @@ def tox_addoption(parser):
         default=False,
         help="Do not remove build directory (fast but dirty builds)"
     )
+    parser.add_testenv_attribute(
+        name="wheel_incremental",
+        type="bool",
+        default=False,
+        help="Only remove the build directory outputs whose sources were removed (instead of the whole build directory)"
+    )
+    parser.add_testenv_attribute(
+        name="wheel_path",
+        type="path",
+        default=None,
+        help="Install a prebuilt wheel from this directory or glob instead of building it"
+    )
+    parser.add_testenv_attribute(
+        name="wheel_share",
+        type="bool",
+        default=True,
+        help="Reuse interpreter independent wheels (e.g.: py3-none-any) built for other envs if the interpreter supports them"
+    )
+    parser.add_testenv_attribute(
+        name="wheel_background",
+        type="bool",
+        default=False,
+        help="Build the wheel in the background while the env is created and its deps installed"
+    )
+    parser.add_testenv_attribute(
+        name="wheel_verify",
+        type="bool",
+        default=True,
+        help="Check the RECORD hashes and metadata of wheels that were not just built (cached, shared or prebuilt)"
+    )
+    parser.add_testenv_attribute(
+        name="wheel_compression",
+        type="string",
+        default="default",
+        postprocess=wheel_parse_compression,
+        help=(
+            "Compression of the built wheels: default (as the build backend makes them), "
+            "fast (low compression level, only with wheel_pep517 = native) or stored (no compression)"
+        )
+    )
+    parser.add_testenv_attribute(
+        name="wheel_reproducible",
+        type="bool",
+        default=False,
+        help=(
+            "Build byte for byte identical wheels from identical sources (SOURCE_DATE_EPOCH from the last commit, "
+            "normalized zip order, timestamps and permissions)"
+        )
+    )
+    parser.add_testenv_attribute(
+        name="wheel_install",
+        type="string",
+        default="pip",
+        help=(
+            "How the wheel is installed: pip (with the install_command), unpack (unpacked straight into the env, "
+            "its dependencies are still installed with the install_command) or link (like unpack, but the wheel is "
+            "unpacked once per interpreter version and its files are hardlinked into the envs)"
+        )
+    )
+    parser.add_testenv_attribute(
+        name="wheel_build_jobs",
+        type="string",
+        default="",
+        help="Compile the extensions of setuptools projects in parallel with this many jobs (auto to use all the CPUs)"
+    )
+    parser.add_testenv_attribute(
+        name="wheel_compiler_cache",
+        type="string",
+        default="",
+        help="Run the compiler through this cache, e.g.: ccache or sccache (auto to use the first one available)"
+    )
     parser.add_testenv_attribute(
         name="wheel_build_env",
         type="string",
         default="{envname}",
         help="Environment to use for building the wheel. Default: %(default)r"
     )
+    parser.add_testenv_attribute(
+        name="wheel_warm_build_env",
+        type="bool",
+        default=False,
+        help=(
+            "Build PEP 517 wheels without isolation, in a reusable env that is only recreated "
+            "when the build requirements change"
+        )
+    )
+    parser.add_testenv_attribute(
+        name="wheel_build_wheelhouse",
+        type="path",
+        default=None,
+        help=(
+            "Directory where build requirements are fetched (once) as wheels, "
+            "builds will then install them from there without using the package index"
+        )
+    )
+    parser.add_testenv_attribute(
+        name="wheel_cache",
+        type="bool",
+        default=False,
+        help="Reuse previously built wheels if the sources did not change"
+    )
+    parser.add_testenv_attribute(
+        name="wheel_cache_dir",
+        type="path",
+        default="{toxworkdir}/.wheel-cache",
+        help="Directory for the persistent wheel cache. Default: %(default)r"
+    )
+    parser.add_testenv_attribute(
+        name="wheel_cache_ignore",
+        type="line-list",
+        default=[],
+        help="Glob patterns (relative to the project, e.g.: tests/*) of files that don't change the cached wheel"
+    )
+    parser.add_testenv_attribute(
+        name="wheel_cache_shared",
+        type="string",
+        default="",
+        help=(
+            "Shared wheel store (e.g.: a directory on a network filesystem) checked after the wheel cache, "
+            "wheels built by any machine are published there for the others to reuse"
+        )
+    )
+    parser.add_testenv_attribute(
+        name="wheel_cache_max_size",
+        type="string",
+        default="",
+        help="Evict the least recently used wheels when the cache grows over this size (e.g.: 500M or 2G)"
+    )
+    parser.add_testenv_attribute(
+        name="wheel_cache_max_age",
+        type="string",
+        default="",
+        help="Evict the wheels that were not used for this long (e.g.: 12h, 30d or 2w)"
+    )
+
+
+def wheel_parse_wheel(testenv_config, value):
+    normalized = value.strip().lower()
+    if normalized == "editable":
+        return normalized
+    elif normalized in ("true", "false", ""):
+        return normalized == "true"
+    raise ConfigError("wheel: value {!r} needs to be 'True', 'False' or 'editable'".format(value))
+
+
+def wheel_parse_compression(testenv_config, value):
+    normalized = value.strip() or "default"
+    if normalized not in COMPRESSIONS:
+        raise ConfigError("wheel_compression: value {!r} needs to be one of: {}".format(value, ", ".join(COMPRESSIONS)))
+    elif normalized == "fast" and testenv_config.wheel_pep517 != "native":
+        raise ConfigError("wheel_compression: fast only works with wheel_pep517 = native (use default or stored)")
+    return normalized
+
+
+def wheel_parse_parallel(value):
+    if value == "auto":
+        return os.cpu_count() or 1
+    value = int(value)
+    if value < 1:
+        raise ValueError("value must be at least 1")
+    return value
 
 
 @contextmanager
@@ -64,39 +361,681 @@ def patch(obj, attr, value):
         setattr(obj, attr, original)
 
 
+def wheel_get_wheelhouse(venv):
+    if venv.envconfig.wheel_build_wheelhouse:
+        return Wheelhouse(venv.envconfig.wheel_build_wheelhouse)
+
+
+def wheel_get_os_environ(is_test_command=False, get_os_environ=None, extra=None):
+    env = get_os_environ(is_test_command=is_test_command)
+    env.update(extra)
+    return env
+
+
+@hookimpl
+def tox_configure(config):
+    if config.run_provision or not (config.option.wheel_cache_prune or config.option.wheel_cache_stats):
+        return
+    caches = OrderedDict()
+    for name in config.envlist:
+        envconfig = config.envconfigs[name]
+        caches.setdefault(envconfig.wheel_cache_dir, wheel_get_cache(envconfig))
+    for cache in caches.values():
+        if config.option.wheel_cache_prune:
+            wheel_prune_cache(cache)
+        if config.option.wheel_cache_stats:
+            wheel_report_cache(cache)
+    raise SystemExit(0)
+
+
+def wheel_get_cache(envconfig):
+    limits = []
+    for option, parse in [("wheel_cache_max_size", parse_size), ("wheel_cache_max_age", parse_age)]:
+        value = getattr(envconfig, option)
+        try:
+            limits.append(parse(value) if value.strip() else None)
+        except ValueError:
+            reporter.error("Invalid {} {!r} for {}".format(option, value, envconfig.envname))
+            raise SystemExit(1)
+    return WheelCache(envconfig.wheel_cache_dir, *limits)
+
+
+def wheel_get_shared_store(envconfig):
+    location = envconfig.wheel_cache_shared.strip()
+    if not location:
+        return None
+    try:
+        return get_wheel_store(location, envconfig.config.toxinidir)
+    except ValueError as exc:
+        reporter.error("Invalid wheel_cache_shared for {}: {}".format(envconfig.envname, exc))
+        raise SystemExit(1)
+
+
+def wheel_prune_cache(cache, keep=(), action=None):
+    if cache.max_size is None and cache.max_age is None:
+        reporter.line("wheel cache {}: no limits configured (wheel_cache_max_size/wheel_cache_max_age)".format(cache.path))
+        return
+    removed = cache.prune(keep=keep)
+    if removed is None:
+        message = "another process is pruning {}".format(cache.path)
+    else:
+        message = "evicted {} wheels ({}) from {}".format(
+            len(removed), format_size(sum(entry[2] for entry in removed)), cache.path
+        )
+    if action is not None:
+        if removed:
+            action.setactivity("wheel-cache", message)
+    else:
+        reporter.line("wheel cache {}".format(message))
+
+
+def wheel_report_cache(cache):
+    entries = cache.entries()
+    limits = []
+    if cache.max_size is not None:
+        limits.append("max size {}".format(format_size(cache.max_size)))
+    if cache.max_age is not None:
+        limits.append("max age {:.1f} days".format(cache.max_age / 86400.0))
+    reporter.line("wheel cache {}: {} wheels, {}{}".format(
+        cache.path,
+        len(entries),
+        format_size(sum(entry[2] for entry in entries)),
+        " ({})".format(", ".join(limits)) if limits else "",
+    ))
+    now = time.time()
+    for key, wheel, size, last_used in reversed(entries):
+        reporter.verbosity1("  {} {} {} (last used {:.1f} days ago)".format(
+            key[:16], wheel.basename if wheel else "<empty>", format_size(size), (now - last_used) / 86400.0
+        ))
+
+
 @hookimpl
 def tox_testenv_install_deps(venv, action):
-    if venv.envconfig.wheel_pep517 == "build":
-        venv.run_install_command(["build[virtualenv]>=0.7.0"], action)
+    if venv.envconfig.wheel_pep517 == "build" and not venv.envconfig.wheel_warm_build_env:
+        requires = ["build[virtualenv]>=0.7.0"]
+        wheelhouse = wheel_get_wheelhouse(venv)
+        if wheelhouse:
+            wheelhouse.fill(action, venv.envconfig.envpython, venv.envconfig, requires)
+            venv.run_install_command(requires, action, options=wheelhouse.get_install_options(venv.envconfig))
+        else:
+            venv.run_install_command(requires, action)
     return None
 
 
 @hookimpl
 def tox_package(session, venv):
-    if session.config.option.wheel or venv.envconfig.wheel:
-        build_venv = session.getvenv(venv.envconfig.wheel_build_env)
-        if not hasattr(build_venv, "wheel_package"):
-            try:
-                with patch(package, "build_package", partial(wheel_build_package, venv=build_venv)):
-                    build_venv.wheel_package, build_venv.wheel_dist = get_package(session)
-            except InterpreterNotFound:
-                if session.config.option.skip_missing_interpreters:
-                    return None
-                raise
-        return build_venv.wheel_package
+    if wheel_install_mode(venv) != "pip":
+        venv.installpkg = partial(wheel_installpkg, installpkg=venv.installpkg, venv=venv)
+    if session.config.option.wheel_watch:
+        wheel_watch(session)
+    wheel_path = session.config.option.wheel_from or venv.envconfig.wheel_path
+    if wheel_path and not session.config.option.installpkg:
+        try:
+            return wheel_find_prebuilt(session, venv, py.path.local(wheel_path))
+        except InterpreterNotFound:
+            if session.config.option.skip_missing_interpreters:
+                return None
+            raise
+
+    elif session.config.option.wheel or venv.envconfig.wheel:
+        if wheel_is_background(session, venv):
+            wheel_start_builds(session.config, session)
+            venv.setupenv = partial(wheel_setupenv, setupenv=venv.setupenv, session=session, venv=venv)
+            # the real package is only known after the build, wheel_setupenv replaces this
+            return session.config.temp_dir.join("package", "wheel-pending")
+        try:
+            return wheel_get_venv_package(session, venv)
+        except InterpreterNotFound:
+            if session.config.option.skip_missing_interpreters:
+                return None
+            raise
 
     elif hasattr(session, "package"):
         return session.package
 
 
+def wheel_get_venv_package(session, venv):
+    build_venv = session.getvenv(venv.envconfig.wheel_build_env)
+    if not hasattr(build_venv, "wheel_package"):
+        with patch(package, "build_package", partial(wheel_build_package, venv=build_venv)):
+            build_venv.wheel_package, build_venv.wheel_dist = get_package(session)
+    return build_venv.wheel_package
+
+
+def wheel_install_mode(venv):
+    mode = venv.envconfig.wheel_install.strip() or "pip"
+    if mode not in ("pip", "unpack", "link"):
+        reporter.error("Invalid wheel_install {!r} for {}, expected pip, unpack or link".format(venv.envconfig.wheel_install, venv.name))
+        raise SystemExit(1)
+    return mode
+
+
+def wheel_installpkg(path, action, installpkg=None, venv=None):
+    """
+    Replaces ``venv.installpkg`` for ``wheel_install = unpack`` or ``link``: the wheel is unpacked into the env instead
+    of being installed with pip. Its dependencies are installed with the ``install_command`` in new envs (existing envs
+    only get the package reinstalled, as tox does).
+
+    With ``link`` the wheel is unpacked and byte-compiled once per interpreter version into a tree in
+    ``{toxworkdir}/.wheel-trees`` and the files of that tree are hardlinked into the envs.
+
+    Sdists (and Windows, where console scripts need launchers) go through the original ``installpkg``.
+    """
+    path = py.path.local(path)
+    if path.ext != ".whl" or os.name == "nt":
+        return installpkg(path, action)
+    just_created = getattr(venv, "just_created", False)
+    venv.finish()
+    try:
+        scheme = get_install_scheme(venv.envconfig.envpython)
+        if just_created:
+            requirements = get_requirements(path, venv.envconfig.extras, scheme["environment"])
+            if requirements:
+                action.setactivity("wheel-install", "installing dependencies: {}".format(", ".join(requirements)))
+                venv._install(requirements, action=action)
+        tree = None
+        if wheel_install_mode(venv) == "link":
+            tree = get_tree(venv.envconfig.config.toxworkdir.join(".wheel-trees"), path, scheme)
+        if tree is None:
+            action.setactivity("wheel-install", "unpacking {}".format(path.basename))
+            installed = install_wheel(path, scheme)
+            reporter.verbosity1("unpacked {} files from {}".format(len(installed), path.basename))
+        else:
+            if not is_staged(tree):
+                action.setactivity("wheel-install", "unpacking {} into {}".format(path.basename, tree))
+                stage_wheel(path, scheme, tree)
+            action.setactivity("wheel-install", "linking {}".format(path.basename))
+            installed, method = link_tree(tree, scheme)
+            reporter.verbosity1("linked {} files from {} ({})".format(len(installed), tree, method))
+    except WheelInstallError as exc:
+        reporter.error("Could not install {}: {}".format(path, exc))
+        raise SystemExit(1)
+
+
+def wheel_is_background(session, venv):
+    option = session.config.option
+    if option.sdistonly or option.installpkg or option.parallel != PARALLEL_OFF:
+        return False
+    return bool(option.wheel_background or venv.envconfig.wheel_background)
+
+
+def wheel_setupenv(setupenv=None, session=None, venv=None):
+    """
+    Replaces ``venv.setupenv`` for envs that have their wheel built in the background: after the env is created and
+    the deps installed waits for the wheel and sets it as ``venv.package``.
+    """
+    if not setupenv():
+        return False
+    try:
+        venv.package = wheel_get_venv_package(session, venv)
+    except InterpreterNotFound as exception:
+        venv.status = exception
+        if session.config.option.skip_missing_interpreters == "true":
+            reporter.skip(str(exception))
+        else:
+            reporter.error(str(exception))
+        return False
+    except SystemExit:
+        venv.status = "could not package project"
+        raise
+    if not venv.package:
+        venv.status = "could not package project"
+        return False
+    venv.envconfig.setenv["TOX_PACKAGE"] = str(venv.package)
+    return True
+
+
+def wheel_register_shared(session, venv, wheel):
+    """
+    Makes ``wheel`` (built in ``venv``) available to other envs if it is interpreter independent (abi ``none`` and
+    platform ``any``).
+    """
+    if not venv.envconfig.wheel_share:
+        return
+    parsed = parse_wheel_filename(wheel.basename)
+    if parsed is None:
+        return
+    _, _, tags = parsed
+    if all(tag.endswith("-none-any") for tag in tags):
+        if not hasattr(session, "wheel_shared"):
+            session.wheel_shared = []
+        session.wheel_shared.append((wheel_share_key(session.config, venv), tags, venv.name, wheel))
+
+
+def wheel_share_key(config, venv):
+    """
+    Returns what the build env of another env needs to have in common with ``venv`` to reuse its wheel (the mode and
+    the settings that change the wheel, as in the cache key).
+    """
+    return wheel_build_mode(config, venv), json.dumps(get_build_settings(config, venv.envconfig), sort_keys=True)
+
+
+def wheel_find_shared(session, venv):
+    """
+    Returns a previously built interpreter independent wheel that ``venv`` can use (or ``None``).
+    """
+    if not (venv.envconfig.wheel_share and getattr(session, "wheel_shared", None)):
+        return None
+    python_info = venv.envconfig.python_info
+    if not python_info.executable or not python_info.version_info:
+        raise InterpreterNotFound(venv.envconfig.basepython)
+    supported_tags = get_supported_tags(python_info.executable)
+    if not supported_tags:
+        return None
+    key = wheel_share_key(session.config, venv)
+    for shared_key, tags, name, wheel in session.wheel_shared:
+        if shared_key == key and set(tags).intersection(supported_tags) and wheel.check():
+            with session.newaction(venv.name, "packaging") as action:
+                action.setactivity("wheel-share", "reusing {} built in {}".format(wheel.basename, name))
+            return wheel
+    return None
+
+
+def wheel_find_prebuilt(session, venv, pattern):
+    python_info = venv.envconfig.python_info
+    if not python_info.executable or not python_info.version_info:
+        raise InterpreterNotFound(venv.envconfig.basepython)
+    if not hasattr(session, "wheel_project_metadata"):
+        session.wheel_project_metadata = get_project_metadata(session.config.setupdir, python_info.executable)
+    name, version = session.wheel_project_metadata
+    supported_tags = get_supported_tags(python_info.executable)
+    if supported_tags is None:
+        reporter.warning("could not determine the wheel tags supported by {}".format(python_info.executable))
+    wheel, rejected = find_prebuilt_wheel(pattern, name, version, supported_tags)
+    if wheel is None:
+        reporter.error("No prebuilt wheel for {} {} found in {}:{}".format(
+            name or "<unknown name>",
+            version or "<unknown version>",
+            pattern,
+            "".join("\n  {}: {}".format(path, reason) for path, reason in rejected) or " no files",
+        ))
+        raise SystemExit(1)
+    problem = wheel_verify(session, venv, wheel)
+    if problem:
+        reporter.error("Prebuilt wheel {} is corrupt: {}".format(wheel, problem))
+        raise SystemExit(1)
+    with session.newaction(venv.name, "packaging") as action:
+        action.setactivity("wheel-from", "using {}".format(wheel))
+    # tox removes the package at the end of the session, thus it needs a copy
+    return create_session_view(wheel, session.config.temp_dir)
+
+
+def wheel_verify(session, venv, wheel):
+    """
+    Returns why ``wheel`` is not intact (``None`` if it is or if ``wheel_verify`` is disabled).
+
+    Results are remembered for the session (a wheel can be used by many envs).
+    """
+    if not venv.envconfig.wheel_verify:
+        return None
+    if not hasattr(session, "wheel_verified"):
+        session.wheel_verified = {}
+    stat = wheel.stat()
+    key = str(wheel), stat.size, stat.mtime
+    if key not in session.wheel_verified:
+        with timed(venv, "verify"):
+            try:
+                verify_wheel(wheel)
+            except WheelVerificationError as exc:
+                session.wheel_verified[key] = str(exc)
+            else:
+                session.wheel_verified[key] = None
+    return session.wheel_verified[key]
+
+
+def wheel_start_builds(config, session):
+    """
+    Starts building the wheels of all the build envs in background threads, if ``--wheel-build-parallel`` allows
+    concurrent builds or if any env uses ``wheel_background``.
+
+    Build envs that could share a wheel (same ``wheel_share_key``) wait for the build of the first one and reuse its
+    wheel if they can (see ``wheel_find_shared``). The results are stored as ``venv.wheel_future`` on the build envs.
+    """
+    if hasattr(session, "wheel_executor"):
+        return
+    session.wheel_executor = None
+    build_venvs = OrderedDict()
+    background = False
+    for venv, build_venv in wheel_iter_builds(session):
+        build_venvs[build_venv.name] = build_venv
+        background = background or wheel_is_background(session, venv)
+    jobs = min(session.config.option.wheel_build_parallel, len(build_venvs))
+    if jobs < 2 and not background:
+        return
+    session.wheel_executor = ThreadPoolExecutor(max_workers=jobs)
+    session.wheel_build_lock = threading.Lock()
+    if not hasattr(session, "wheel_shared"):
+        session.wheel_shared = []
+    first_builds = OrderedDict()
+    waiting = []
+    for build_venv in build_venvs.values():
+        build_venv.wheel_private_build_dir = jobs > 1
+        # tox can set up the build env (if it's also a test env) while its wheel is built
+        build_venv.update = partial(wheel_update, update=build_venv.update, venv=build_venv, lock=threading.Lock())
+        if build_venv.envconfig.wheel_share:
+            first = first_builds.setdefault(wheel_share_key(config, build_venv), build_venv)
+        else:
+            first = first_builds.setdefault(build_venv.name, build_venv)
+        if first is not build_venv:
+            waiting.append((first, build_venv))
+    # the first builds are queued before the ones waiting for them, thus the waiting never blocks them
+    for build_venv in first_builds.values():
+        build_venv.wheel_future = session.wheel_executor.submit(wheel_get_package, config, session, build_venv)
+    for first, build_venv in waiting:
+        build_venv.wheel_future = session.wheel_executor.submit(
+            wheel_get_package_after, first.wheel_future, config, session, build_venv
+        )
+
+
+def wheel_get_package_after(future, config, session, venv):
+    wait([future])  # the build env builds its own wheel if this one failed or can't be shared
+    return wheel_get_package(config, session, venv)
+
+
+def wheel_update(action, update=None, venv=None, lock=None):
+    """
+    Replaces ``venv.update`` for build envs that build in background threads or for ``--wheel-watch``: they are only
+    created or updated once per session and recorded as created right away (tox does that after installing the
+    package), thus tox reuses the build env if it's also a test env and the rounds of ``--wheel-watch`` don't recreate
+    it. Sequential builds keep tox's own ``update``.
+
+    The ``lock`` is held meanwhile, as tox can set up the build env while its wheel is built in the background.
+    """
+    with lock:
+        if getattr(venv, "wheel_updated", False):
+            return None
+        status = update(action=action)
+        if not status:
+            venv.finish()
+            venv.wheel_updated = True
+        return status
+
+
+def wheel_iter_builds(session):
+    """
+    Yields ``(venv, build_venv)`` for every env that gets its wheel built.
+    """
+    for venv in session.venv_dict.values():
+        envconfig = venv.envconfig
+        if envconfig.skip_install or envconfig.usedevelop:
+            continue
+        if session.config.option.wheel_from or envconfig.wheel_path:
+            continue
+        if session.config.option.wheel or envconfig.wheel:
+            yield venv, session.getvenv(envconfig.wheel_build_env)
+
+
+def wheel_watch(session):
+    """
+    Runs ``--wheel-watch``: builds the wheels of all the build envs into the wheel cache and rebuilds them after the
+    sources change (changes are debounced), until interrupted. The build envs (and the build backends of
+    ``wheel_pep517 = hooks``) are kept alive between builds. Files changed while building are considered written by
+    the build and don't start another round, later changes to them do. Never returns.
+    """
+    config = session.config
+    build_venvs = OrderedDict((build_venv.name, build_venv) for _, build_venv in wheel_iter_builds(session))
+    if not build_venvs:
+        reporter.error("No environments build wheels, nothing to watch (use --wheel or wheel = true)")
+        raise SystemExit(1)
+    for build_venv in build_venvs.values():
+        build_venv.update = partial(wheel_update, update=build_venv.update, venv=build_venv, lock=threading.Lock())
+    config.option.wheel_cache = True
+    excluded = [path for build_venv in build_venvs.values() for path in get_excluded_paths(config, build_venv.envconfig)]
+    watcher = get_watcher(config.setupdir, excluded)
+    try:
+        while True:
+            # wheels registered for sharing by the previous round are outdated
+            session.wheel_shared = []
+            # files the builds write into the source tree (e.g.: a generated version file) would start the next round
+            before = snapshot_sources(config.setupdir, excluded)
+            for build_venv in build_venvs.values():
+                wheel_watch_build(config, session, build_venv)
+            drain_changes(watcher)
+            written = get_changed(before, snapshot_sources(config.setupdir, excluded))
+            if written:
+                reporter.line("wheel-watch: ignoring {} (written by the build)".format(
+                    ", ".join(sorted(config.setupdir.bestrelpath(py.path.local(path)) for path in written))
+                ))
+            reporter.line("wheel-watch: waiting for changes in {} (ctrl+c to stop)".format(config.setupdir))
+            changes = sorted(config.setupdir.bestrelpath(py.path.local(path)) for path in wait_for_changes(watcher))
+            reporter.line("wheel-watch: {}{} changed".format(
+                changes[0], " (and {} more)".format(len(changes) - 1) if len(changes) > 1 else ""
+            ))
+    except KeyboardInterrupt:
+        reporter.line("wheel-watch: stopped")
+    finally:
+        watcher.close()
+    raise SystemExit(0)
+
+
+def wheel_watch_build(config, session, venv):
+    venv.wheel_timings = None  # stays unset if the wheel of another build env of the round is reused
+    try:
+        wheel_get_package(config, session, venv)
+    except (SystemExit, InvocationError, InterpreterNotFound) as exc:
+        reporter.error("wheel-watch: building the wheel in {} failed{}".format(
+            venv.name, "" if isinstance(exc, SystemExit) else ": {}".format(exc)
+        ))
+    else:
+        if venv.wheel_timings is not None:
+            reporter.line("wheel-watch: {}".format(format_timings(venv.wheel_timings)))
+
+
 def wheel_build_package(config, session, venv):
-    if config.isolated_build or venv.envconfig.wheel_pep517:
+    wheel_start_builds(config, session)
+    future = getattr(venv, "wheel_future", None)
+    if future is not None:
+        return future.result()
+    else:
+        return wheel_get_package(config, session, venv)
+
+
+def wheel_get_package(config, session, venv):
+    wheel_package = wheel_find_shared(session, venv)
+    if wheel_package:
+        return wheel_package
+    mode = wheel_build_mode(config, venv)
+    timings = start_timings(venv, mode)
+    shared = wheel_get_shared_store(venv.envconfig)
+    # editable wheels point to the sources, thus there's nothing worth caching (and profiled builds need to build)
+    option = session.config.option
+    if mode != "editable" and option.wheel_profile is None and (option.wheel_cache or venv.envconfig.wheel_cache or shared):
+        cache = wheel_get_cache(venv.envconfig)
+        with timed(venv, "cache-lookup"):
+            key = get_cache_key(config, venv)
+        with cache.lock(key):
+            wheel_package = cache.get(key)
+            problem = wheel_package and wheel_verify(session, venv, wheel_package)
+            if problem:
+                reporter.warning("discarding corrupt cached wheel {}: {}".format(wheel_package, problem))
+                cache.discard(key)
+                wheel_package = None
+            if wheel_package:
+                timings["cache"] = "hit"
+                with session.newaction(venv.name, "packaging") as action:
+                    action.setactivity("wheel-cache", "reusing {}".format(wheel_package))
+            elif shared:
+                wheel_package = wheel_get_shared(config, session, venv, cache, shared, key)
+            else:
+                timings["cache"] = "miss"
+                wheel_package = wheel_build(config, session, venv)
+                with timed(venv, "cache-store"):
+                    wheel_package = cache.put(key, wheel_package)
+        if timings["cache"] != "hit" and (cache.max_size is not None or cache.max_age is not None):
+            with timed(venv, "cache-prune"), session.newaction(venv.name, "packaging") as action:
+                wheel_prune_cache(cache, keep=[key], action=action)
+    else:
+        wheel_package = wheel_build(config, session, venv)
+    finish_timings(venv, wheel_package)
+    wheel_register_shared(session, venv, wheel_package)
+    return wheel_package
+
+
+def wheel_get_shared(config, session, venv, cache, shared, key):
+    """
+    Returns the wheel for ``key`` from the ``shared`` store, builds and publishes it there if it's missing.
+
+    The entry is only changed while holding its lock: waiters that find the published entry corrupt take the lock
+    before discarding it, and the built wheel is not published if the lock was broken meanwhile.
+    """
+    wait_for_entry = True
+    while True:
+        with shared.lock(key, wait_for_entry=wait_for_entry) as held:
+            with timed(venv, "shared-lookup"):
+                wheel_package = shared.get(key)
+            problem = wheel_package and wheel_verify(session, venv, wheel_package)
+            if problem:
+                reporter.warning("corrupt shared wheel {}: {}".format(wheel_package, problem))
+                wheel_package = None
+            if wheel_package:
+                venv.wheel_timings["cache"] = "shared"
+                with session.newaction(venv.name, "packaging") as action:
+                    action.setactivity("wheel-cache", "reusing {} from {}".format(wheel_package.basename, shared))
+                with timed(venv, "cache-store"):
+                    return cache.put(key, wheel_package)
+            if not held:
+                wait_for_entry = False
+                continue
+            if problem:
+                shared.discard(key)
+            venv.wheel_timings["cache"] = "miss"
+            wheel_package = wheel_build(config, session, venv)
+            with timed(venv, "cache-store"):
+                wheel_package = cache.put(key, wheel_package)
+            with timed(venv, "shared-store"):
+                if shared.holds_lock(key):
+                    shared.put(key, wheel_package)
+                else:
+                    reporter.warning("lost the lock of {} in {} while building, not publishing {}".format(
+                        key[:16], shared, wheel_package.basename
+                    ))
+            return wheel_package
+
+
+def wheel_build_mode(config, venv):
+    if venv.envconfig.wheel == "editable":
+        return "editable"
+    elif venv.envconfig.wheel_pep517 in ("hooks", "native"):
+        return venv.envconfig.wheel_pep517
+    elif config.isolated_build or venv.envconfig.wheel_pep517:
+        mode = "build" if venv.envconfig.wheel_pep517 == "build" else "pip"
+        if venv.envconfig.wheel_warm_build_env:
+            return "{}-warm".format(mode)
+        else:
+            return mode
+    else:
+        return "legacy"
+
+
+@hookimpl
+def tox_cleanup(session):
+    executor = getattr(session, "wheel_executor", None)
+    if executor is not None:
+        for venv in session.existing_venvs.values():
+            future = getattr(venv, "wheel_future", None)
+            if future is not None:
+                future.cancel()
+        executor.shutdown(wait=True)
+    builds = []
+    for venv in session.existing_venvs.values():
+        backend = getattr(venv, "wheel_backend", None)
+        if backend is not None:
+            backend.close()
+            del venv.wheel_backend
+        timings = getattr(venv, "wheel_timings", None)
+        if timings is not None:
+            builds.append(timings)
+    if builds:
+        path = session.config.option.wheel_timings
+        report = reporter.verbosity0 if path else reporter.verbosity1
+        reporter.separator("_", "wheel timings", reporter.Verbosity.DEFAULT if path else reporter.Verbosity.INFO)
+        for timings in builds:
+            report("  {}".format(format_timings(timings)))
+        if path:
+            path = py.path.local(path)
+            reporter.line("write wheel timings report at: {}".format(path))
+            write_timings(path, builds)
+
+
+def wheel_build(config, session, venv):
+    """
+    Builds the wheel of ``venv``. Builds in a private build directory (concurrent builds) are checked to have used it:
+    setuptools versions that don't support ``DIST_EXTRA_CONFIG`` ignore it and build in the project's ``build``
+    directory (where concurrent builds can also make each other fail). These are built again, one at a time, in the
+    project's build directory.
+    """
+    if getattr(venv, "wheel_private_build_dir", False):
+        try:
+            wheel_package = wheel_build_once(config, session, venv)
+        except (SystemExit, InvocationError):
+            if not venv.wheel_uses_build_dir or wheel_build_dir_used(config, venv):
+                raise
+        else:
+            if not venv.wheel_uses_build_dir or wheel_build_dir_used(config, venv):
+                return wheel_package
+        reporter.warning(
+            "{} did not build in its private build directory (DIST_EXTRA_CONFIG needs setuptools >= 65.4), "
+            "building again without concurrent builds".format(venv.name)
+        )
+        venv.wheel_private_build_dir = False
+    with wheel_build_lock(session):
+        return wheel_build_once(config, session, venv)
+
+
+@contextmanager
+def wheel_build_lock(session):
+    """
+    Holds the lock of the builds that use the project's build directory, if builds run concurrently.
+    """
+    lock = getattr(session, "wheel_build_lock", None)
+    if lock is None:
+        yield
+    else:
+        with lock:
+            yield
+
+
+def wheel_build_once(config, session, venv):
+    compiler_cache = wheel_compiler_cache(venv)
+    stats = compiler_cache and get_cache_stats(compiler_cache)
+    venv.wheel_uses_build_dir = False  # set by wheel_cleanup (native and editable builds don't use the build dir)
+    if venv.envconfig.wheel == "editable":
+        wheel_package = wheel_build_hooks(config, session, venv, editable=True)
+    elif venv.envconfig.wheel_pep517 == "native":
+        wheel_package = wheel_build_native(config, session, venv)
+    elif venv.envconfig.wheel_pep517 == "hooks":
+        wheel_package = wheel_build_hooks(config, session, venv)
+    elif (config.isolated_build or venv.envconfig.wheel_pep517) and venv.envconfig.wheel_warm_build_env:
+        wheel_package = wheel_build_warm(config, session, venv)
+    elif config.isolated_build or venv.envconfig.wheel_pep517:
         wheel_package = wheel_build_pep517(config, session, venv)
     else:
         wheel_package = wheel_build_legacy(config, session, venv)
+    if venv.wheel_uses_build_dir and wheel_cleanup_mode(session, venv) == "incremental":
+        with timed(venv, "cleanup"):
+            record_build_dir(config.setupdir, wheel_build_dir(config, venv), excluded=[
+                config.toxworkdir,
+                config.distdir,
+                config.distshare,
+                config.setupdir.join("dist"),
+            ])
+    if stats:
+        wheel_report_compiler_cache(session, venv, compiler_cache, stats)
     return wheel_package
 
 
+def wheel_report_compiler_cache(session, venv, compiler_cache, before):
+    after = get_cache_stats(compiler_cache)
+    if not after:
+        return
+    hits, misses = after[0] - before[0], after[1] - before[1]
+    timings = getattr(venv, "wheel_timings", None)
+    if timings is not None:
+        timings["compiler_cache"] = {"name": compiler_cache.purebasename, "hits": hits, "misses": misses}
+    with session.newaction(venv.name, "packaging") as action:
+        action.setactivity("wheel-{}".format(compiler_cache.purebasename), "{} hits, {} misses".format(hits, misses))
+
+
 def wheel_is_allowed_external(path, venv, is_allowed_external=None):
     if is_allowed_external is None:
         is_allowed_external = venv.is_allowed_external
@@ -105,29 +1044,239 @@ def wheel_is_allowed_external(path, venv, is_allowed_external=None):
     return True
 
 
+def wheel_cleanup_mode(session, venv):
+    if session.config.option.wheel_dirty or venv.envconfig.wheel_dirty:
+        return "dirty"
+    elif session.config.option.wheel_incremental or venv.envconfig.wheel_incremental:
+        return "incremental"
+    else:
+        return "full"
+
+
+def wheel_cleanup(config, session, venv, action):
+    """
+    Cleans up the build directory of ``venv`` (see ``wheel_cleanup_mode``). Returns ``True`` if it was emptied.
+    """
+    venv.wheel_uses_build_dir = True
+    mode = wheel_cleanup_mode(session, venv)
+    build_dir = wheel_build_dir(config, venv)
+    emptied = False
+    if mode == "incremental":
+        with timed(venv, "cleanup"):
+            action.setactivity("wheel-make", "cleaning up stale outputs in build directory ...")
+            build_dir.ensure(dir=1)
+            removed = clean_build_dir(config.setupdir, build_dir)
+            if removed:
+                reporter.verbosity1("removed stale build outputs: {}".format(", ".join(removed)))
+            emptied = removed is None
+    elif mode == "full":
+        with timed(venv, "cleanup"):
+            action.setactivity("wheel-make", "cleaning up build directory ...")
+            ensure_empty_dir(build_dir)
+        emptied = True
+    build_dir.ensure(dir=1)
+    venv.wheel_build_dir_mtime = os.stat(str(build_dir)).st_mtime_ns
+    return emptied
+
+
+def wheel_build_dir_used(config, venv):
+    """
+    Returns whether the last build of ``venv`` used its build directory: setuptools always makes (and removes) the
+    ``bdist.<platform>`` directory in it, thus its modification time changes.
+    """
+    return os.stat(str(wheel_build_dir(config, venv))).st_mtime_ns != venv.wheel_build_dir_mtime
+
+
+def wheel_build_dir(config, venv):
+    if getattr(venv, "wheel_private_build_dir", False):
+        return config.toxworkdir.join(".wheel-build", venv.name)
+    else:
+        return config.setupdir.join("build")
+
+
+def wheel_build_environ(config, venv, build_jobs=True):
+    """
+    Returns the environment variables that configure the setuptools build of ``venv``.
+
+    Concurrent builds can't share the project's ``build`` directory (and egg-info), thus an extra distutils config
+    file sets their location. The same file enables parallel extension compilation (``wheel_build_jobs``), unless
+    ``build_jobs`` is false (legacy builds pass it on the command line, the file needs setuptools >= 65.4). The
+    compiler cache (``wheel_compiler_cache``) is used by prefixing the compilers. Reproducible builds
+    (``wheel_reproducible``) get a ``SOURCE_DATE_EPOCH``.
+    """
+    environ = {}
+    source_date_epoch = wheel_source_date_epoch(config, venv)
+    if source_date_epoch is not None:
+        environ["SOURCE_DATE_EPOCH"] = str(source_date_epoch)
+    sections = []
+    if getattr(venv, "wheel_private_build_dir", False):
+        build_dir = wheel_build_dir(config, venv)
+        build_dir.ensure(dir=1)
+        sections.append("[build]\nbuild_base = {0}\n\n[egg_info]\negg_base = {0}\n".format(build_dir))
+    jobs = build_jobs and wheel_build_jobs(venv)
+    if jobs:
+        sections.append("[build_ext]\nparallel = {}\n".format(jobs))
+    if sections:
+        extra_config = config.toxworkdir.join(".wheel-build", "{}.cfg".format(venv.name))
+        extra_config.ensure()
+        extra_config.write("\n".join(sections))
+        environ["DIST_EXTRA_CONFIG"] = str(extra_config)
+    compiler_cache = wheel_compiler_cache(venv)
+    if compiler_cache:
+        for name, compiler in get_compilers(venv.envconfig.python_info.executable).items():
+            environ[name] = "{} {}".format(compiler_cache, compiler)
+    return environ
+
+
+def wheel_build_jobs(venv):
+    jobs = venv.envconfig.wheel_build_jobs.strip()
+    if not jobs:
+        return None
+    elif jobs == "auto":
+        return os.cpu_count() or 1
+    try:
+        jobs = int(jobs)
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        reporter.error("Invalid wheel_build_jobs {!r} for {}, expected auto or a number".format(venv.envconfig.wheel_build_jobs, venv.name))
+        raise SystemExit(1)
+    return jobs
+
+
+def wheel_check_build_jobs(venv, python):
+    """
+    Warns if ``wheel_build_jobs`` is set but the setuptools of ``python`` (the interpreter the build backend runs in)
+    is too old to read it from ``DIST_EXTRA_CONFIG``.
+    """
+    if not wheel_build_jobs(venv):
+        return
+    version = get_setuptools_version(python)
+    if version is not None and version < DIST_EXTRA_CONFIG_SETUPTOOLS:
+        reporter.warning(
+            "wheel_build_jobs is ignored by setuptools {} in {} (DIST_EXTRA_CONFIG needs setuptools >= {}), "
+            "the extensions are compiled one at a time".format(version, venv.name, DIST_EXTRA_CONFIG_SETUPTOOLS)
+        )
+
+
+def wheel_compiler_cache(venv):
+    name = venv.envconfig.wheel_compiler_cache.strip()
+    if not name:
+        return None
+    compiler_cache = find_compiler_cache(name)
+    if compiler_cache is None and name != "auto":
+        reporter.error("Compiler cache {!r} not found (wheel_compiler_cache in {})".format(name, venv.name))
+        raise SystemExit(1)
+    return compiler_cache
+
+
+@contextmanager
+def wheel_staging_dir(config, venv):
+    config.distdir.ensure(dir=1)
+    staging = py.path.local(tempfile.mkdtemp(prefix=".{}-".format(venv.name), dir=str(config.distdir)))
+    try:
+        yield staging
+    finally:
+        staging.remove(ignore_errors=True)
+
+
+def wheel_publish(config, venv, staging, dists, repack=True):
+    """
+    Moves the artifacts of a build from its staging dir into distdir.
+
+    Only the files the build made are replaced (everything else in distdir is left alone) and the moves are atomic
+    renames, thus concurrent builds or readers never see partial files. Wheels are repacked first if the build couldn't
+    make them with the ``wheel_compression`` of ``venv`` or if they are not normalized (``wheel_reproducible``).
+    """
+    if len(dists) > 1:
+        reporter.error("Multiple wheels were built, expected only one: {}".format(", ".join(dist.basename for dist in dists)))
+        raise SystemExit(1)
+    compression = wheel_compression(venv)
+    source_date_epoch = wheel_source_date_epoch(config, venv)
+    if repack and (compression or source_date_epoch is not None):
+        with timed(venv, "repack"):
+            repack_wheel(dists[0], compression, None if source_date_epoch is None else get_date_time(source_date_epoch))
+    with timed(venv, "publish"):
+        for artifact in staging.listdir():
+            os.replace(str(artifact), str(config.distdir.join(artifact.basename)))
+    return config.distdir.join(dists[0].basename)
+
+
+def wheel_profile_path(config, venv):
+    """
+    Returns where the profile data of the ``wheel-make`` step of ``venv`` is saved (``None`` without
+    ``--wheel-profile``), any previous profile is removed.
+    """
+    if config.option.wheel_profile is None:
+        return None
+    profile = config.distdir.dirpath().join(".wheel-profile", "{}.prof".format(venv.name))
+    profile.dirpath().ensure(dir=1)
+    if profile.check():
+        profile.remove()
+    return profile
+
+
+def wheel_report_profile(config, action, profile):
+    try:
+        lines = get_profile_summary(profile, config.option.wheel_profile)
+    except (OSError, EOFError, ValueError, TypeError) as exc:
+        reporter.warning("Could not read the profile data in {}: {}".format(profile, exc))
+        return
+    action.setactivity("wheel-profile", "{}: {}".format(profile, lines[0]))
+    for line in lines[1:]:
+        reporter.verbosity0("  {}".format(line))
+
+
+def wheel_compression(venv):
+    return get_compression(venv.envconfig.wheel_compression)
+
+
+def wheel_source_date_epoch(config, venv):
+    if venv.envconfig.wheel_reproducible:
+        try:
+            return get_source_date_epoch(config.setupdir)
+        except ValueError as exc:
+            reporter.error("Invalid SOURCE_DATE_EPOCH for {} (wheel_reproducible): {}".format(venv.name, exc))
+            raise SystemExit(1)
+    return None
+
+
 def wheel_build_legacy(config, session, venv):
     setup = config.setupdir.join("setup.py")
     if not setup.check():
         reporter.error("No setup.py file found. The expected location is: {}".format(setup))
         raise SystemExit(1)
-    with session.newaction(venv.name, "packaging") as action:
+    with session.newaction(venv.name, "packaging") as action, wheel_staging_dir(config, venv) as staging:
         with patch(venv, "is_allowed_external", partial(wheel_is_allowed_external, venv=venv)):
-            venv.update(action=action)
-            if not (session.config.option.wheel_dirty or venv.envconfig.wheel_dirty):
-                action.setactivity("wheel-make", "cleaning up build directory ...")
-                ensure_empty_dir(config.setupdir.join("build"))
-            ensure_empty_dir(config.distdir)
-            venv.test(
-                name="wheel-make",
-                commands=[["python", setup, "bdist_wheel", "--dist-dir", config.distdir]],
-                redirect=False,
-                ignore_outcome=False,
-                ignore_errors=False,
-                display_hash_seed=False,
-            )
-        try:
-            dists = config.distdir.listdir()
-        except py.error.ENOENT:
+            with timed(venv, "update"):
+                venv.update(action=action)
+            wheel_cleanup(config, session, venv, action)
+            environ = wheel_build_environ(config, venv, build_jobs=False)
+            with patch(venv, "_get_os_environ", partial(wheel_get_os_environ, get_os_environ=venv._get_os_environ, extra=environ)), \
+                    timed(venv, "wheel-make"):
+                commands = ["python", setup]
+                jobs = wheel_build_jobs(venv)
+                if jobs:
+                    # build_ext runs first and bdist_wheel reuses it, this works with any setuptools version
+                    commands.extend(["build_ext", "--parallel", str(jobs)])
+                commands.extend(["bdist_wheel", "--dist-dir", staging])
+                if wheel_compression(venv) == COMPRESSIONS["stored"]:
+                    commands.append("--compression=stored")
+                profile = wheel_profile_path(config, venv)
+                if profile:
+                    commands = get_profile_command(commands, profile)
+                venv.test(
+                    name="wheel-make",
+                    commands=[commands],
+                    redirect=False,
+                    ignore_outcome=False,
+                    ignore_errors=False,
+                    display_hash_seed=False,
+                )
+            if profile:
+                wheel_report_profile(config, action, profile)
+        dists = staging.listdir("*.whl")
+        if not dists:
             # check if empty or comment only
             data = []
             with open(str(setup)) as fp:
@@ -139,18 +1288,48 @@ def wheel_build_legacy(config, session, venv):
                 reporter.error("setup.py is empty")
                 raise SystemExit(1)
             reporter.error(
-                "No dist directory found. Please check setup.py, e.g with:\n"
+                "No distributions found in the dist directory found. Please check setup.py, e.g with:\n"
                 "     python setup.py bdist_wheel"
             )
             raise SystemExit(1)
+        return wheel_publish(config, venv, staging, dists)
+
+
+def wheel_build_native(config, session, venv):
+    try:
+        with timed(venv, "metadata"):
+            project = get_native_project(config.setupdir)
+    except UnsupportedProject as exc:
+        with session.newaction(venv.name, "packaging") as action:
+            action.setactivity("wheel-native", "using the build backend instead: {}".format(exc))
+        if not config.setupdir.join("pyproject.toml").check():
+            return wheel_build_legacy(config, session, venv)
+        elif venv.envconfig.wheel_warm_build_env:
+            return wheel_build_warm(config, session, venv)
         else:
-            if not dists:
-                reporter.error(
-                    "No distributions found in the dist directory found. Please check setup.py, e.g with:\n"
-                    "     python setup.py bdist_wheel"
-                )
-                raise SystemExit(1)
-            return dists[0]
+            return wheel_build_pep517(config, session, venv)
+    with session.newaction(venv.name, "packaging") as action, wheel_staging_dir(config, venv) as staging:
+        with timed(venv, "wheel-make"):
+            action.setactivity("wheel-native", "writing {} {} ({} files)".format(
+                project["name"], project["version"], len(project["files"])
+            ))
+            build = partial(
+                write_native_wheel, project, staging,
+                compression=wheel_compression(venv), source_date_epoch=wheel_source_date_epoch(config, venv),
+            )
+            profile = wheel_profile_path(config, venv)
+            if profile:
+                # native builds run in the tox process
+                profiler = cProfile.Profile()
+                try:
+                    wheel = profiler.runcall(build)
+                finally:
+                    profiler.dump_stats(str(profile))
+            else:
+                wheel = build()
+        if profile:
+            wheel_report_profile(config, action, profile)
+        return wheel_publish(config, venv, staging, [wheel], repack=False)
 
 
 def wheel_build_pep517(config, session, venv):
@@ -158,19 +1337,23 @@ def wheel_build_pep517(config, session, venv):
     if not pyproject.check():
         reporter.error("No pyproject.toml file found. The expected location is: {}".format(pyproject))
         raise SystemExit(1)
-    with session.newaction(venv.name, "packaging") as action:
-        venv.update(action=action)
-        if not (session.config.option.wheel_dirty or venv.envconfig.wheel_dirty):
-            action.setactivity("wheel-make", "cleaning up build directory ...")
-            ensure_empty_dir(config.setupdir.join("build"))
-        ensure_empty_dir(config.distdir)
+    if config.option.wheel_profile is not None:
+        reporter.error(
+            "--wheel-profile can't profile the build backend of isolated builds in {} (pip and build run it in their "
+            "own subprocess), use wheel_pep517 = hooks or wheel_warm_build_env = true".format(venv.name)
+        )
+        raise SystemExit(1)
+    with session.newaction(venv.name, "packaging") as action, wheel_staging_dir(config, venv) as staging:
+        with timed(venv, "update"):
+            venv.update(action=action)
+        wheel_cleanup(config, session, venv, action)
         if venv.envconfig.wheel_pep517 == "build":
             commands = [
                 "python",
                 "-Im",
                 "build",
                 "--outdir",
-                config.distdir,
+                staging,
                 config.setupdir,
             ]
         else:
@@ -181,30 +1364,188 @@ def wheel_build_pep517(config, session, venv):
                 "--no-deps",
                 "--use-pep517",
                 "--wheel-dir",
-                config.distdir,
+                staging,
             ]
-        venv.test(
-            name="wheel-make",
-            commands=[commands],
-            redirect=False,
-            ignore_outcome=False,
-            ignore_errors=False,
-            display_hash_seed=False,
+        environ = wheel_build_environ(config, venv)
+        wheelhouse = wheel_get_wheelhouse(venv)
+        if wheelhouse:
+            with timed(venv, "build-requires"):
+                wheel_fill_wheelhouse(config, venv, action, wheelhouse)
+            environ.update(wheelhouse.get_environ(venv.envconfig))
+        with patch(venv, "_get_os_environ", partial(wheel_get_os_environ, get_os_environ=venv._get_os_environ, extra=environ)), \
+                timed(venv, "wheel-make"):
+            venv.test(
+                name="wheel-make",
+                commands=[commands],
+                redirect=False,
+                ignore_outcome=False,
+                ignore_errors=False,
+                display_hash_seed=False,
+            )
+        # we need to filter our list of dists to include only wheels
+        dists = staging.listdir("*.whl")
+        if not dists:
+            reporter.error(
+                "No distributions found in the dist directory found. Please check pyproject.toml, e.g with:\n"
+                "     pip wheel . --use-pep517"
+            )
+            raise SystemExit(1)
+        return wheel_publish(config, venv, staging, dists)
+
+
+def wheel_fill_wheelhouse(config, venv, action, wheelhouse):
+    """
+    Fetches the build requirements of an isolated build into the ``wheelhouse``: the ones in ``pyproject.toml`` and
+    the ones the build backend asks for (``get_requires_for_build_wheel``, e.g.: ``wheel`` for older setuptools).
+
+    The backend is asked in a warm build env with the static requirements, once per interpreter and build configuration.
+    """
+    requires, backend, backend_path = get_build_system(config.setupdir)
+    wheelhouse.fill(action, venv.envconfig.envpython, venv.envconfig, requires)
+    env_key = get_warm_env_key(venv.envconfig, requires)
+    key = "{}-{}".format(env_key[:16], get_config_digest(config.setupdir)[:16])
+    dynamic = wheelhouse.get_dynamic_requires(key)
+    if dynamic is None:
+        warm_env = WarmBuildEnv(config.toxworkdir.join(".wheel-build-envs", env_key[:16]), venv.envconfig.python_info.executable)
+        with warm_env.lock():
+            warm_env.ensure(action, requires, wheelhouse=wheelhouse, envconfig=venv.envconfig)
+        action.setactivity("wheelhouse", "{} get_requires_for_build_wheel".format(backend))
+        build_backend = BuildBackend(
+            warm_env.python, config.setupdir, backend, backend_path, env=warm_env.environ(venv._get_os_environ(is_test_command=True))
         )
         try:
-            # we need to filter our list of dists to include only wheels
-            dists = [dist for dist in config.distdir.listdir() if os.path.splitext(dist)[1] == ".whl"]
-        except py.error.ENOENT:
+            dynamic = build_backend.call("get_requires_for_build_wheel")
+        finally:
+            build_backend.close()
+        wheelhouse.fill(action, venv.envconfig.envpython, venv.envconfig, dynamic)
+        wheelhouse.set_dynamic_requires(key, dynamic)
+
+
+def wheel_install_build_requires(venv, action, requires):
+    """
+    Installs the ``requires`` that aren't in the build env yet (the installed ones are recorded in a marker file).
+    """
+    marker = venv.path.join(".wheel-build-requires")
+    installed = json.loads(marker.read()) if marker.check() else []
+    missing = sorted(set(requires).difference(installed))
+    if not missing:
+        return
+    wheelhouse = wheel_get_wheelhouse(venv)
+    if wheelhouse:
+        wheelhouse.fill(action, venv.envconfig.envpython, venv.envconfig, missing)
+        options = wheelhouse.get_install_options(venv.envconfig)
+    else:
+        options = ()
+    action.setactivity("wheel-make", "installing build requirements ...")
+    venv.run_install_command(missing, action, options=options)
+    marker.write(json.dumps(sorted(set(installed).union(missing))))
+
+
+def wheel_build_hooks(config, session, venv, editable=False):
+    """
+    Builds the wheel by calling the build backend hooks in a long-lived process in the build env (``editable`` builds a
+    PEP 660 editable wheel through ``build_editable``, the build directory isn't cleaned up or recorded for these).
+    """
+    requires, backend, backend_path = get_build_system(config.setupdir)
+    kind = "editable" if editable else "wheel"
+    with session.newaction(venv.name, "packaging") as action, wheel_staging_dir(config, venv) as staging:
+        with timed(venv, "update"):
+            venv.update(action=action)
+        if not editable and wheel_cleanup(config, session, venv, action) and getattr(venv, "wheel_backend", None):
+            # distutils remembers the directories it made (and won't make them again), thus a backend that already
+            # built can't build into an emptied build directory
+            venv.wheel_backend.close()
+            venv.wheel_backend = None
+        with timed(venv, "build-requires"):
+            wheel_install_build_requires(venv, action, requires)
+            if getattr(venv, "wheel_backend", None) is None or not venv.wheel_backend.alive:
+                env = get_backend_env(venv)
+                env.update(wheel_build_environ(config, venv))
+                venv.wheel_backend = BuildBackend(venv.envconfig.envpython, config.setupdir, backend, backend_path, env=env)
+            action.setactivity("wheel-make", "{} get_requires_for_build_{}".format(backend, kind))
+            wheel_install_build_requires(venv, action, requires + venv.wheel_backend.call("get_requires_for_build_{}".format(kind)))
+            wheel_check_build_jobs(venv, venv.envconfig.envpython)
+        profile = wheel_profile_path(config, venv)
+        with timed(venv, "wheel-make"):
+            action.setactivity("wheel-make", "{} build_{}".format(backend, kind))
+            basename = venv.wheel_backend.call("build_{}".format(kind), profile=profile, wheel_directory=str(staging))
+        if profile:
+            wheel_report_profile(config, action, profile)
+        return wheel_publish(config, venv, staging, [staging.join(basename)])
+
+
+def wheel_build_warm(config, session, venv):
+    pyproject = config.setupdir.join("pyproject.toml")
+    if not pyproject.check():
+        reporter.error("No pyproject.toml file found. The expected location is: {}".format(pyproject))
+        raise SystemExit(1)
+    requires, backend, backend_path = get_build_system(config.setupdir)
+    if venv.envconfig.wheel_pep517 == "build":
+        requires = requires + ["build>=0.7.0"]
+    key = get_warm_env_key(venv.envconfig, requires)
+    warm_env = WarmBuildEnv(config.toxworkdir.join(".wheel-build-envs", key[:16]), venv.envconfig.python_info.executable)
+    with session.newaction(venv.name, "packaging") as action, wheel_staging_dir(config, venv) as staging:
+        wheelhouse = wheel_get_wheelhouse(venv)
+        with timed(venv, "update"), warm_env.lock():
+            warm_env.ensure(
+                action, requires, recreate=venv.envconfig.recreate, wheelhouse=wheelhouse, envconfig=venv.envconfig
+            )
+        wheel_cleanup(config, session, venv, action)
+        env = warm_env.environ(venv._get_os_environ(is_test_command=True))
+        env.update(wheel_build_environ(config, venv))
+        with timed(venv, "build-requires"):
+            action.setactivity("wheel-make", "{} get_requires_for_build_wheel".format(backend))
+            build_backend = BuildBackend(warm_env.python, config.setupdir, backend, backend_path, env=env)
+            try:
+                backend_requires = build_backend.call("get_requires_for_build_wheel")
+            finally:
+                build_backend.close()
+            with warm_env.lock():
+                warm_env.install(action, backend_requires, wheelhouse=wheelhouse, envconfig=venv.envconfig)
+            wheel_check_build_jobs(venv, warm_env.python)
+        if venv.envconfig.wheel_pep517 == "build":
+            commands = [
+                warm_env.python,
+                "-Im",
+                "build",
+                "--no-isolation",
+                "--outdir",
+                staging,
+                config.setupdir,
+            ]
+        else:
+            commands = [
+                warm_env.python,
+                "-m",
+                "pip",
+                "wheel",
+                config.setupdir,
+                "--no-deps",
+                "--no-build-isolation",
+                "--use-pep517",
+                "--wheel-dir",
+                staging,
+            ]
+        profile = wheel_profile_path(config, venv)
+        with timed(venv, "wheel-make"):
+            if profile:
+                # pip and build run the backend in a subprocess, profiled builds call it directly
+                action.setactivity("wheel-make", "{} build_wheel".format(backend))
+                build_backend = BuildBackend(warm_env.python, config.setupdir, backend, backend_path, env=env)
+                try:
+                    build_backend.call("build_wheel", profile=profile, wheel_directory=str(staging))
+                finally:
+                    build_backend.close()
+            else:
+                action.setactivity("wheel-make", " ".join(str(arg) for arg in commands))
+                action.popen(commands, cwd=config.setupdir, env=env, redirect=False)
+        if profile:
+            wheel_report_profile(config, action, profile)
+        dists = staging.listdir("*.whl")
+        if not dists:
             reporter.error(
-                "No dist directory found. Please check pyproject.toml, e.g with:\n"
+                "No distributions found in the dist directory found. Please check pyproject.toml, e.g with:\n"
                 "     pip wheel . --use-pep517"
             )
             raise SystemExit(1)
-        else:
-            if not dists:
-                reporter.error(
-                    "No distributions found in the dist directory found. Please check pyproject.toml, e.g with:\n"
-                    "     pip wheel . --use-pep517"
-                )
-                raise SystemExit(1)
-            return dists[0]
+        return wheel_publish(config, venv, staging, dists)
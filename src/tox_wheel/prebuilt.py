@@ -0,0 +1,141 @@
+import glob
+import json
+import os
+import subprocess
+from configparser import ConfigParser
+
+import py
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion
+from packaging.version import Version
+from tox.config import get_py_project_toml
+from tox.exception import InterpreterNotFound
+
+TAGS_SCRIPT = os.path.join(os.path.dirname(__file__), "helpers", "supported_tags.py")
+
+#: Interpreter executable mapped to the tags it supports (or ``None`` if they can't be determined).
+supported_tags_cache = {}
+
+
+def parse_wheel_filename(filename):
+    """
+    Returns ``(name, version, tags)`` for a wheel filename (``None`` if it's not a valid wheel filename).
+
+    The compressed tag sets are expanded, e.g.: ``py2.py3-none-any`` gives ``["py2-none-any", "py3-none-any"]``.
+    """
+    if not filename.endswith(".whl"):
+        return None
+    parts = filename[:-4].split("-")
+    if len(parts) not in (5, 6):
+        return None
+    name, version = parts[:2]
+    pythons, abis, platforms = (part.split(".") for part in parts[-3:])
+    tags = [
+        "{}-{}-{}".format(python, abi, platform)
+        for python in pythons
+        for abi in abis
+        for platform in platforms
+    ]
+    return name, version, tags
+
+
+def parse_version(version):
+    version = version.replace("_", "-")
+    try:
+        return Version(version)
+    except InvalidVersion:
+        return version
+
+
+def get_project_metadata(setupdir, python):
+    """
+    Returns the ``(name, version)`` of the project, ``None`` for what can't be determined.
+
+    Static metadata (the ``[project]`` table in ``pyproject.toml`` or ``[metadata]`` in ``setup.cfg``) is used if
+    available, otherwise ``setup.py --name --version`` is run with the ``python`` interpreter (the one of the env, as
+    ``setup.py`` can depend on it).
+    """
+    name = version = None
+    pyproject = setupdir.join("pyproject.toml")
+    if pyproject.check():
+        project = get_py_project_toml(pyproject).get("project", {})
+        name = project.get("name")
+        if "version" not in project.get("dynamic", []):
+            version = project.get("version")
+    setup_cfg = setupdir.join("setup.cfg")
+    if setup_cfg.check() and not (name and version):
+        parser = ConfigParser()
+        parser.read(str(setup_cfg))
+        if parser.has_section("metadata"):
+            name = name or parser.get("metadata", "name", fallback=None)
+            static_version = parser.get("metadata", "version", fallback="")
+            if static_version and not static_version.startswith(("attr:", "file:")):
+                version = version or static_version
+    setup = setupdir.join("setup.py")
+    if setup.check() and not (name and version):
+        process = subprocess.run(
+            [str(python), str(setup), "--name", "--version"],
+            cwd=str(setupdir),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        )
+        lines = [line.strip() for line in process.stdout.splitlines() if line.strip()]
+        if process.returncode == 0 and len(lines) >= 2:
+            name = name or lines[-2]
+            version = version or lines[-1]
+    return name, version
+
+
+def get_supported_tags(python):
+    """
+    Returns the wheel tags supported by the ``python`` interpreter, most preferred first.
+
+    Raises ``InterpreterNotFound`` if the interpreter can't run.
+    """
+    python = str(python)
+    if python not in supported_tags_cache:
+        try:
+            output = subprocess.check_output([python, TAGS_SCRIPT], universal_newlines=True)
+        except (OSError, subprocess.CalledProcessError) as exc:
+            raise InterpreterNotFound("{} (could not get its supported wheel tags: {})".format(python, exc))
+        supported_tags_cache[python] = json.loads(output)
+    return supported_tags_cache[python]
+
+
+def find_prebuilt_wheel(pattern, name, version, supported_tags):
+    """
+    Finds the best wheel in ``pattern`` (a directory or a glob) for the given project ``name``, ``version`` and
+    ``supported_tags`` (``None`` values are not checked).
+
+    Returns ``(wheel, rejected)``, where ``rejected`` is a list of ``(path, reason)`` for the wheels that didn't match.
+    """
+    pattern = str(pattern)
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.whl")
+    tag_ranks = {tag: rank for rank, tag in enumerate(supported_tags or ())}
+    best = None
+    rejected = []
+    for path in sorted(glob.glob(pattern)):
+        parsed = parse_wheel_filename(os.path.basename(path))
+        if parsed is None:
+            rejected.append((path, "not a wheel"))
+            continue
+        wheel_name, wheel_version, wheel_tags = parsed
+        if name and canonicalize_name(wheel_name) != canonicalize_name(name):
+            rejected.append((path, "name {!r} does not match project name {!r}".format(wheel_name, name)))
+            continue
+        if version and parse_version(wheel_version) != parse_version(version):
+            rejected.append((path, "version {!r} does not match project version {!r}".format(wheel_version, version)))
+            continue
+        if supported_tags is None:
+            rank = 0
+        else:
+            ranks = [tag_ranks[tag] for tag in wheel_tags if tag in tag_ranks]
+            if not ranks:
+                rejected.append((path, "tags {} are not supported by the interpreter".format(", ".join(wheel_tags))))
+                continue
+            rank = min(ranks)
+        if best is None or rank < best[0]:
+            best = rank, path
+    return (py.path.local(best[1]) if best else None), rejected
@@ -0,0 +1,45 @@
+import os
+import pstats
+import re
+
+#: How many functions the summary shows by default (``--wheel-profile`` without a value).
+DEFAULT_LIMIT = 20
+
+#: Prefix of the paths of installed packages and of the standard library (not shown in the summary).
+LIBRARY_PREFIX = re.compile(r"^.*/(?:site-packages|dist-packages|lib/python[0-9.]+)/")
+
+
+def get_profile_command(command, path):
+    """
+    Returns ``command`` (an interpreter followed by a script or ``-m module``) changed to run under cProfile, with the
+    profile data written to ``path``.
+    """
+    python, first, rest = command[0], str(command[1]), command[2:]
+    if first == "-Im":
+        return [python, "-I", "-m", "cProfile", "-o", path, "-m"] + rest
+    elif first == "-m":
+        return [python, "-m", "cProfile", "-o", path, "-m"] + rest
+    else:
+        return [python, "-m", "cProfile", "-o", path, command[1]] + rest
+
+
+def format_function(function):
+    filename, line, name = function
+    if filename == "~":  # builtins
+        return name
+    return "{}:{}({})".format(LIBRARY_PREFIX.sub("", filename.replace(os.sep, "/")), line, name)
+
+
+def get_profile_summary(path, limit=DEFAULT_LIMIT):
+    """
+    Returns the lines of a summary of the profile data in ``path``: the total time and the ``limit`` functions with
+    the most internal time.
+    """
+    stats = pstats.Stats(str(path))
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    lines = ["{:.3f}s in {} function calls".format(stats.total_tt, stats.total_calls)]
+    if rows:
+        lines.append("{:>10} {:>10} {:>10}  {}".format("tottime", "cumtime", "calls", "function"))
+        for function, (_, calls, tottime, cumtime, _) in rows:
+            lines.append("{:>10.3f} {:>10.3f} {:>10}  {}".format(tottime, cumtime, calls, format_function(function)))
+    return lines
@@ -0,0 +1,39 @@
+import os
+import subprocess
+
+from .compression import ZIP_EPOCH
+
+#: Commands printing the time of the last commit that touched the current directory (the first number is used).
+VCS_COMMANDS = [
+    ["git", "log", "-1", "--format=%ct", "--", "."],
+    ["hg", "log", "--limit", "1", "--template", "{date|hgdate}", "."],
+]
+
+#: Project directory mapped to its ``SOURCE_DATE_EPOCH``.
+source_date_epochs = {}
+
+
+def get_source_date_epoch(setupdir):
+    """
+    Returns the ``SOURCE_DATE_EPOCH`` for builds of the project in ``setupdir``: the environment variable if it's set,
+    otherwise the time of the last commit (git or mercurial), or the earliest zip timestamp if there is no commit.
+
+    Raises ``ValueError`` if the environment variable is not a timestamp.
+    """
+    value = os.environ.get("SOURCE_DATE_EPOCH", "").strip()
+    if value:
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError("SOURCE_DATE_EPOCH {!r} is not a Unix timestamp".format(value))
+    setupdir = str(setupdir)
+    if setupdir not in source_date_epochs:
+        source_date_epochs[setupdir] = ZIP_EPOCH
+        for command in VCS_COMMANDS:
+            try:
+                output = subprocess.check_output(command, cwd=setupdir, stderr=subprocess.DEVNULL, universal_newlines=True)
+                source_date_epochs[setupdir] = int(output.split()[0])
+            except (OSError, subprocess.CalledProcessError, ValueError, IndexError):
+                continue
+            break
+    return source_date_epochs[setupdir]
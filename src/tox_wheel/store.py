@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import py
+from tox.reporter import verbosity0
+from tox.reporter import warning
+
+#: A lock whose heartbeat was not refreshed for this many seconds was left behind by a dead process and is broken.
+STALE_LOCK_TIMEOUT = 300
+LOCK_HEARTBEAT_INTERVAL = 30
+LOCK_POLL_INTERVAL = 1
+ENTRY_NAME = "entry.json"
+
+
+def get_wheel_store(location, root):
+    """
+    Returns the wheel store for ``location`` (a path, relative to ``root``, or a URL).
+
+    Stores are looked up by URL scheme in ``STORES`` (plain paths are ``file`` URLs).
+    """
+    scheme, sep, rest = location.partition("://")
+    if not sep or len(scheme) == 1:  # no scheme or a windows drive letter
+        scheme, rest = "file", location
+    if scheme not in STORES:
+        raise ValueError("unsupported wheel store {!r} (supported schemes: {})".format(location, ", ".join(sorted(STORES))))
+    return STORES[scheme](root.join(rest, abs=1) if scheme == "file" else location)
+
+
+def copy_with_digest(source, target):
+    """
+    Copies ``source`` to ``target`` and returns the sha256 hexdigest of the contents.
+    """
+    digest = hashlib.sha256()
+    with source.open("rb") as src, target.open("wb") as dst:
+        for chunk in iter(lambda: src.read(1 << 20), b""):
+            digest.update(chunk)
+            dst.write(chunk)
+    return digest.hexdigest()
+
+
+def get_digest(path):
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SharedWheelStore(object):
+    """
+    A directory of built wheels shared by several machines (e.g.: on a NFS mount), stored as
+    ``<path>/<key>/<wheel filename>`` along with an ``entry.json`` that has the size and sha256 of the wheel.
+
+    Only primitives that work on network filesystems are used: files are published by renaming them into place (the
+    ``entry.json`` last, thus an entry without it is incomplete) and locks are exclusively created files refreshed by
+    a heartbeat, so the locks of dead processes are broken after ``stale_lock_timeout`` seconds. Entries are only
+    changed by the holder of their lock (see ``holds_lock``).
+    """
+
+    def __init__(self, path, stale_lock_timeout=STALE_LOCK_TIMEOUT, heartbeat_interval=LOCK_HEARTBEAT_INTERVAL,
+                 poll_interval=LOCK_POLL_INTERVAL):
+        self.path = py.path.local(path)
+        self.stale_lock_timeout = stale_lock_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        #: Key mapped to the token written in the lock file of the locks taken by this store.
+        self.tokens = {}
+
+    def __str__(self):
+        return str(self.path)
+
+    @contextmanager
+    def lock(self, key, wait_for_entry=True):
+        """
+        Holds the lock for ``key`` across all the machines sharing the store, yields whether it's held.
+
+        With ``wait_for_entry`` waiters stop waiting as soon as the entry is published (the holder releases the lock
+        after that), without holding the lock.
+        """
+        lock = self.path.join("{}.lock".format(key))
+        self.path.ensure(dir=1)
+        token = uuid.uuid4().hex
+        reported = False
+        while True:
+            try:
+                fd = os.open(str(lock), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                pass
+            else:
+                info = {"host": socket.gethostname(), "pid": os.getpid(), "time": time.time(), "token": token}
+                with os.fdopen(fd, "w") as fh:
+                    json.dump(info, fh)
+                break
+            if wait_for_entry and self.path.join(key, ENTRY_NAME).check():
+                yield False
+                return
+            try:
+                age = time.time() - lock.mtime()
+            except py.error.ENOENT:
+                continue
+            if age > self.stale_lock_timeout:
+                self.break_lock(lock, age)
+                continue
+            if not reported:
+                verbosity0("lock file {} present ({}), will wait until released".format(lock, self.describe_lock(lock)))
+                reported = True
+            time.sleep(self.poll_interval)
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat, args=(lock, stop))
+        heartbeat.daemon = True
+        heartbeat.start()
+        self.tokens[key] = token
+        try:
+            yield True
+        finally:
+            stop.set()
+            heartbeat.join()
+            # the lock could have been broken (e.g.: the heartbeat stalled) and taken by another process
+            if self.holds_lock(key):
+                try:
+                    lock.remove()
+                except py.error.ENOENT:
+                    pass
+            del self.tokens[key]
+
+    def holds_lock(self, key):
+        """
+        Returns whether the lock for ``key`` is (still) held by this store.
+        """
+        if key not in self.tokens:
+            return False
+        try:
+            return json.loads(self.path.join("{}.lock".format(key)).read()).get("token") == self.tokens[key]
+        except (IOError, OSError, ValueError, AttributeError):
+            return False
+
+    def heartbeat(self, lock, stop):
+        while not stop.wait(self.heartbeat_interval):
+            try:
+                os.utime(str(lock))
+            except OSError:
+                pass
+
+    def describe_lock(self, lock):
+        try:
+            info = json.loads(lock.read())
+            return "held by pid {} on {}".format(info["pid"], info["host"])
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return "held by an unknown process"
+
+    def break_lock(self, lock, age):
+        # renaming first makes sure that only one of the processes that found the stale lock removes it
+        stale = lock.new(basename="{}.stale-{}".format(lock.basename, uuid.uuid4().hex))
+        try:
+            os.rename(str(lock), str(stale))
+        except OSError:
+            return
+        # the lock could have been released and taken again (or refreshed) after its age was checked
+        try:
+            age = time.time() - stale.mtime()
+        except py.error.ENOENT:
+            return
+        if age <= self.stale_lock_timeout:
+            try:
+                os.link(str(stale), str(lock))  # unlike a rename this never replaces a lock taken meanwhile
+            except OSError:
+                pass
+            stale.remove(ignore_errors=True)
+            return
+        warning("breaking stale lock {} ({}, not refreshed for {:.0f}s)".format(lock, self.describe_lock(stale), age))
+        stale.remove(ignore_errors=True)
+
+    def get(self, key):
+        """
+        Returns the wheel stored for ``key`` (``None`` if there is none or if it fails the integrity check, corrupt
+        entries are discarded if the lock is held).
+        """
+        entry = self.path.join(key)
+        try:
+            info = json.loads(entry.join(ENTRY_NAME).read())
+            wheel = entry.join(info["wheel"])
+            if wheel.size() == info["size"] and get_digest(wheel) == info["sha256"]:
+                return wheel
+        except py.error.ENOENT:
+            return None
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            pass
+        if self.holds_lock(key):
+            warning("discarding corrupt wheel store entry {}".format(entry))
+            self.discard(key)
+        else:
+            warning("ignoring corrupt wheel store entry {}".format(entry))
+        return None
+
+    def put(self, key, wheel):
+        """
+        Publishes ``wheel`` and returns the stored path, the lock for ``key`` must be held.
+        """
+        entry = self.path.join(key)
+        entry.ensure(dir=1)
+        target = entry.join(wheel.basename)
+        tmp = entry.join(".tmp-{}-{}".format(uuid.uuid4().hex, wheel.basename))
+        try:
+            info = {"wheel": wheel.basename, "size": wheel.size(), "sha256": copy_with_digest(wheel, tmp)}
+            os.replace(str(tmp), str(target))
+            tmp.write(json.dumps(info, sort_keys=True))
+            os.replace(str(tmp), str(entry.join(ENTRY_NAME)))
+        except BaseException:
+            tmp.remove(ignore_errors=True)
+            raise
+        return target
+
+    def discard(self, key):
+        """
+        Removes the entry for ``key``, the lock for ``key`` must be held.
+        """
+        entry = self.path.join(key)
+        trash = self.path.join(".trash-{}-{}".format(key, uuid.uuid4().hex))
+        try:
+            os.rename(str(entry), str(trash))
+        except OSError:
+            return
+        trash.remove(ignore_errors=True)
+
+
+#: URL scheme mapped to the wheel store class, stores need to implement ``lock``, ``holds_lock``, ``get``, ``put`` and
+#: ``discard``.
+STORES = {
+    "file": SharedWheelStore,
+}
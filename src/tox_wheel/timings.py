@@ -0,0 +1,65 @@
+import json
+import time
+from contextlib import contextmanager
+
+
+def start_timings(venv, mode):
+    """
+    Starts recording the timings of a wheel build in ``venv`` (stored as ``venv.wheel_timings``).
+    """
+    venv.wheel_timings = {
+        "build_env": venv.name,
+        "mode": mode,
+        "cache": None,
+        "wheel": None,
+        "size": None,
+        "phases": {},
+        "duration": None,
+        "started": time.time(),
+    }
+    venv.wheel_timings_start = time.perf_counter()
+    return venv.wheel_timings
+
+
+@contextmanager
+def timed(venv, phase):
+    """
+    Adds the time spent in the block to the given ``phase`` of the current build in ``venv`` (if one is recorded).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = getattr(venv, "wheel_timings", None)
+        if timings is not None:
+            timings["phases"][phase] = round(timings["phases"].get(phase, 0) + time.perf_counter() - start, 4)
+
+
+def finish_timings(venv, wheel):
+    timings = venv.wheel_timings
+    timings["duration"] = round(time.perf_counter() - venv.wheel_timings_start, 4)
+    if wheel:
+        timings["wheel"] = wheel.basename
+        timings["size"] = wheel.size()
+    return timings
+
+
+def write_timings(path, builds):
+    path.write(json.dumps({
+        "builds": builds,
+        "duration": round(sum(build["duration"] or 0 for build in builds), 4),
+    }, indent=2, sort_keys=True))
+
+
+def format_timings(timings):
+    """
+    Returns a one line summary of a build's timings.
+    """
+    if timings["cache"] in ("hit", "shared"):
+        action = "reused"
+    else:
+        action = "built"
+    phases = ", ".join("{} {:.2f}s".format(name, seconds) for name, seconds in timings["phases"].items())
+    return "{} {} {} in {:.2f}s ({}) [{}]".format(
+        timings["build_env"], action, timings["wheel"], timings["duration"] or 0, phases, timings["mode"]
+    )
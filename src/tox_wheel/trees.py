@@ -0,0 +1,243 @@
+import csv
+import errno
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import py
+
+from .install import SCHEME_KEYS
+from .install import get_record_hash
+from .install import get_shebang
+from .install import install_wheel
+from .install import uninstall_dist
+from .prebuilt import parse_wheel_filename
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+#: Files are put in the envs with the first of these that works (clones need reflinks, e.g.: btrfs or xfs).
+LINK_METHODS = ("hardlink", "clone", "copy")
+#: The ``FICLONE`` ioctl (Linux).
+FICLONE = 0x40049409
+TREE_INFO = "tree.json"
+#: Older trees of a wheel are removed if they weren't linked for this many seconds (other trees after ``MAX_AGE``).
+STALE_AGE = 60
+MAX_AGE = 7 * 24 * 3600
+
+#: Wheel ``(path, mtime, size)`` mapped to its sha256 (the wheels are copied around, thus trees use the contents).
+wheel_digests = {}
+
+
+def get_relative_scheme(scheme):
+    """
+    Returns the install paths of ``scheme`` relative to its ``prefix`` (``None`` if any of them is outside of it).
+    """
+    relative = {}
+    for key in SCHEME_KEYS:
+        path = os.path.relpath(scheme[key], scheme["prefix"])
+        if path == os.pardir or path.startswith(os.pardir + os.sep) or os.path.isabs(path):
+            return None
+        relative[key] = path
+    return relative
+
+
+def get_wheel_digest(wheel):
+    stat = os.stat(str(wheel))
+    signature = str(wheel), stat.st_mtime_ns, stat.st_size
+    if signature not in wheel_digests:
+        digest = hashlib.sha256()
+        with open(str(wheel), "rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(chunk)
+        wheel_digests[signature] = digest.hexdigest()
+    return wheel_digests[signature]
+
+
+def get_tree(trees, wheel, scheme):
+    """
+    Returns the directory in ``trees`` where ``wheel`` is staged for envs with the ``scheme`` (one tree per wheel,
+    interpreter version and install layout), or ``None`` if the scheme can't use staged trees.
+    """
+    relative = get_relative_scheme(scheme)
+    if relative is None:
+        return None
+    key = hashlib.sha256(
+        json.dumps([get_wheel_digest(wheel), scheme["cache_tag"], relative], sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return trees.join("{}-{}-{}".format(wheel.purebasename, scheme["cache_tag"], key[:12]))
+
+
+def is_staged(tree):
+    return tree.join(TREE_INFO).check()
+
+
+def prune_trees(tree):
+    """
+    Removes the trees of older builds of the wheel staged in ``tree`` (for the same interpreter version) and the trees
+    that weren't linked for a long time. Recently linked trees are kept as concurrent envs might be using them.
+    """
+    trees = tree.dirpath()
+    if not trees.check(dir=1):
+        return
+    prefix = tree.basename.rsplit("-", 1)[0] + "-"
+    now = time.time()
+    for other in trees.listdir():
+        if other == tree or other.basename.startswith("."):  # staging in progress
+            continue
+        try:
+            age = now - other.join(TREE_INFO).mtime()
+        except py.error.Error:
+            age = MAX_AGE
+        if age >= MAX_AGE or age >= STALE_AGE and other.basename.startswith(prefix):
+            shutil.rmtree(str(other), ignore_errors=True)
+
+
+def stage_wheel(wheel, scheme, tree):
+    """
+    Unpacks and byte-compiles ``wheel`` into ``tree`` (laid out like the prefix of an env with the ``scheme``). Scripts
+    keep the ``#!python`` shebang, it's rewritten for each env when the tree is linked.
+
+    The tree is made in a temporary directory and renamed, thus concurrent envs either see it complete or not at all.
+    Returns ``False`` if the tree was already staged.
+    """
+    if is_staged(tree):
+        return False
+    prune_trees(tree)
+    tree.dirpath().ensure(dir=1)
+    tmp = py.path.local(tempfile.mkdtemp(prefix=".{}-".format(tree.basename), dir=str(tree.dirpath())))
+    try:
+        prefix = tmp.join("prefix")
+        staged = dict(scheme, prefix=str(prefix))
+        staged.update((key, os.path.normpath(str(prefix.join(path)))) for key, path in get_relative_scheme(scheme).items())
+        installed = install_wheel(wheel, staged, executable="python")
+        name, _, _ = parse_wheel_filename(wheel.basename)
+        tmp.join(TREE_INFO).write(json.dumps({
+            "wheel": wheel.basename,
+            "name": name,
+            "record": os.path.relpath(installed[-1], str(prefix)),
+        }))
+        try:
+            os.rename(str(tmp), str(tree))
+        except OSError as exc:
+            if exc.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                raise
+            return False  # staged by another env meanwhile
+    finally:
+        shutil.rmtree(str(tmp), ignore_errors=True)  # already renamed if staged
+    return True
+
+
+def link_tree(tree, scheme):
+    """
+    Installs the wheel staged in ``tree`` into the env with the ``scheme`` (replacing any installed version of the
+    distribution): files are hardlinked, cloned or copied (see ``LINK_METHODS``), scripts get the shebang of the env's
+    interpreter and ``RECORD`` is rewritten for them.
+
+    Returns the installed files (absolute paths) and the link method that was used.
+    """
+    info = json.loads(tree.join(TREE_INFO).read())
+    tree.join(TREE_INFO).setmtime()  # see prune_trees
+    uninstall_dist(scheme, info["name"])
+    prefix = str(tree.join("prefix"))
+    scripts = os.path.normpath(os.path.join(prefix, get_relative_scheme(scheme)["scripts"]))
+    record = os.path.join(prefix, info["record"])
+    shebang = get_shebang(scheme["executable"]).encode("utf-8") + b"\n"
+    methods = list(LINK_METHODS)
+    installed = []
+    rewritten = set()
+    for dirpath, _, filenames in os.walk(prefix):
+        target_dir = os.path.normpath(os.path.join(scheme["prefix"], os.path.relpath(dirpath, prefix)))
+        os.makedirs(target_dir, exist_ok=True)
+        for filename in filenames:
+            source = os.path.join(dirpath, filename)
+            target = os.path.join(target_dir, filename)
+            if source == record:
+                continue
+            elif os.path.normpath(dirpath) == scripts and rewrite_script(source, target, shebang):
+                rewritten.add(target)
+            else:
+                link_file(source, target, methods)
+            installed.append(target)
+    target = os.path.join(scheme["prefix"], info["record"])
+    write_linked_record(record, target, rewritten)
+    installed.append(target)
+    return installed, methods[0]
+
+
+def rewrite_script(source, target, shebang):
+    """
+    Copies the ``source`` script to ``target`` with the given ``shebang`` if it has the ``#!python`` placeholder.
+    """
+    with open(source, "rb") as src:
+        if src.readline().rstrip(b"\r\n") != b"#!python":
+            return False
+        if os.path.lexists(target):
+            os.unlink(target)
+        with open(target, "wb") as dst:
+            dst.write(shebang)
+            shutil.copyfileobj(src, dst, 1 << 20)
+    os.chmod(target, 0o755)
+    return True
+
+
+def link_file(source, target, methods):
+    """
+    Puts ``source`` at ``target`` with the first of ``methods`` that works. Methods that fail are removed from the list,
+    thus they aren't tried again for the next files.
+    """
+    if os.path.lexists(target):
+        os.unlink(target)
+    while True:
+        method = methods[0]
+        try:
+            if method == "hardlink":
+                os.link(source, target)
+            elif method == "clone":
+                clone_file(source, target)
+            else:
+                shutil.copy2(source, target)
+            return
+        except OSError:
+            if len(methods) == 1:
+                raise
+            methods.pop(0)
+
+
+def clone_file(source, target):
+    """
+    Makes ``target`` a copy-on-write clone of ``source`` (with the same timestamps, the ``.pyc`` files depend on them).
+    """
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "cloning files is not supported")
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.unlink(target)
+            raise
+    shutil.copystat(source, target)
+
+
+def write_linked_record(source, target, rewritten):
+    """
+    Writes the staged ``RECORD`` at ``source`` to ``target`` with new hashes for the ``rewritten`` files.
+    """
+    lib = os.path.dirname(os.path.dirname(target))
+    with open(source, newline="") as fh:
+        rows = [row for row in csv.reader(fh) if row]
+    for row in rows:
+        path = os.path.normpath(os.path.join(lib, row[0]))
+        if path in rewritten:
+            row[1:] = get_record_hash(path)
+    record = io.StringIO()
+    csv.writer(record, lineterminator="\n").writerows(rows)
+    with open(target, "w", newline="") as fh:
+        fh.write(record.getvalue())
@@ -0,0 +1,127 @@
+import base64
+import csv
+import hashlib
+import io
+import mmap
+import os
+import zipfile
+from email.parser import Parser
+
+from packaging.utils import canonicalize_name
+
+from .prebuilt import parse_version
+from .prebuilt import parse_wheel_filename
+
+#: Hashes allowed in ``RECORD`` (md5 and sha1 are not accepted by the wheel spec).
+RECORD_HASHES = {"sha224", "sha256", "sha384", "sha512", "sha3_224", "sha3_256", "sha3_384", "sha3_512", "blake2b", "blake2s"}
+RECORD_SIGNATURES = ("RECORD.jws", "RECORD.p7s")
+CHUNK_SIZE = 1 << 20
+
+
+class WheelVerificationError(Exception):
+    pass
+
+
+class MappedFile(mmap.mmap):
+    """
+    A read-only memory map usable as the file of a ``ZipFile`` (``mmap`` is only seekable on Python 3.13+).
+    """
+
+    def seekable(self):
+        return True
+
+
+def verify_wheel(path):
+    """
+    Checks that the wheel at ``path`` is intact, raises ``WheelVerificationError`` if it's not.
+
+    Every member is streamed once (through a memory map of the archive) and checked against the hash and size in
+    ``RECORD`` (the zip CRCs are checked too). The ``WHEEL`` and ``METADATA`` files need to match the filename.
+    """
+    path = str(path)
+    parsed = parse_wheel_filename(os.path.basename(path))
+    if parsed is None:
+        raise WheelVerificationError("not a wheel filename")
+    name, version, tags = parsed
+    try:
+        with open(path, "rb") as fh, MappedFile(fh.fileno(), 0, access=mmap.ACCESS_READ) as data, \
+                zipfile.ZipFile(data) as archive:
+            verify_archive(archive, name, version, tags)
+    except (OSError, ValueError, EOFError, zipfile.BadZipFile) as exc:
+        raise WheelVerificationError(str(exc) or exc.__class__.__name__)
+
+
+def verify_archive(archive, name, version, tags):
+    members = archive.infolist()
+    names = [member.filename for member in members]
+    if len(set(names)) != len(names):
+        raise WheelVerificationError("duplicate archive members")
+    dist_infos = {
+        member.split("/")[0] for member in names if member.split("/")[0].endswith(".dist-info") and member.endswith("/RECORD")
+    }
+    if len(dist_infos) != 1:
+        raise WheelVerificationError("expected one .dist-info directory with a RECORD, found {}".format(len(dist_infos)))
+    dist_info = dist_infos.pop()
+
+    verify_headers(archive, dist_info, name, version, tags)
+    records = read_record(archive, dist_info)
+    ignored = {"{}/{}".format(dist_info, basename) for basename in ("RECORD",) + RECORD_SIGNATURES}
+    for member in members:
+        if member.is_dir() or member.filename in ignored:
+            continue
+        if member.filename not in records:
+            raise WheelVerificationError("{} is not in RECORD".format(member.filename))
+        algorithm, expected, size = records.pop(member.filename)
+        if size is not None and size != member.file_size:
+            raise WheelVerificationError("{} has size {}, RECORD says {}".format(member.filename, member.file_size, size))
+        digest = hashlib.new(algorithm)
+        with archive.open(member) as fh:
+            for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        if base64.urlsafe_b64encode(digest.digest()).rstrip(b"=").decode("ascii") != expected:
+            raise WheelVerificationError("{} does not match its {} hash in RECORD".format(member.filename, algorithm))
+    if records:
+        raise WheelVerificationError("{} in RECORD missing from the archive".format(", ".join(sorted(records))))
+
+
+def read_record(archive, dist_info):
+    """
+    Returns the ``RECORD`` of the wheel as a dict of path to ``(hash algorithm, urlsafe base64 digest, size)``.
+    """
+    records = {}
+    content = archive.read("{}/RECORD".format(dist_info)).decode("utf-8")
+    for row in csv.reader(io.StringIO(content)):
+        if not row:
+            continue
+        if len(row) != 3:
+            raise WheelVerificationError("invalid RECORD row {!r}".format(row))
+        path, hash_value, size = row
+        if not hash_value:
+            if path.startswith(dist_info + "/") and path[len(dist_info) + 1:] in ("RECORD",) + RECORD_SIGNATURES:
+                continue
+            raise WheelVerificationError("{} has no hash in RECORD".format(path))
+        algorithm, _, expected = hash_value.partition("=")
+        if algorithm not in RECORD_HASHES:
+            raise WheelVerificationError("{} has an unsupported hash {!r} in RECORD".format(path, algorithm))
+        records[path] = algorithm, expected.rstrip("="), int(size) if size else None
+    return records
+
+
+def verify_headers(archive, dist_info, name, version, tags):
+    parser = Parser()
+    try:
+        wheel = parser.parsestr(archive.read("{}/WHEEL".format(dist_info)).decode("utf-8"), headersonly=True)
+        metadata = parser.parsestr(archive.read("{}/METADATA".format(dist_info)).decode("utf-8"), headersonly=True)
+    except KeyError as exc:
+        raise WheelVerificationError(exc.args[0])
+    if not (wheel.get("Wheel-Version") or "").startswith("1."):
+        raise WheelVerificationError("unsupported Wheel-Version {!r}".format(wheel.get("Wheel-Version")))
+    if wheel.get("Root-Is-Purelib") not in ("true", "false"):
+        raise WheelVerificationError("invalid Root-Is-Purelib {!r}".format(wheel.get("Root-Is-Purelib")))
+    missing = set(tags).difference(wheel.get_all("Tag") or ())
+    if missing:
+        raise WheelVerificationError("tags {} are not in WHEEL".format(", ".join(sorted(missing))))
+    if canonicalize_name(metadata.get("Name") or "") != canonicalize_name(name):
+        raise WheelVerificationError("METADATA name {!r} does not match the filename".format(metadata.get("Name")))
+    if parse_version(metadata.get("Version") or "") != parse_version(version):
+        raise WheelVerificationError("METADATA version {!r} does not match the filename".format(metadata.get("Version")))
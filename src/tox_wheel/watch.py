@@ -0,0 +1,193 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+from .cache import SKIP_FILE_EXTENSIONS
+from .cache import is_source_dir
+from .cache import iter_source_dirs
+from .cache import iter_source_files
+from .cache import normalize_paths
+
+#: Changes are collected until nothing changed for this many seconds (editors often save in several steps).
+DEBOUNCE = 0.5
+POLL_INTERVAL = 1
+
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    | IN_MOVE_SELF | IN_ONLYDIR
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def get_watcher(root, excluded=()):
+    """
+    Returns a watcher for the source files under ``root`` (the same files the wheel cache key covers): inotify on
+    Linux, polling everywhere else (or if inotify can't be used).
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, excluded)
+        except OSError:
+            pass
+    return PollingWatcher(root, excluded)
+
+
+def wait_for_changes(watcher, debounce=DEBOUNCE):
+    """
+    Blocks until something changes and keeps collecting changes until there were none for ``debounce`` seconds.
+
+    Returns the changed paths.
+    """
+    changes = set()
+    while not changes:
+        changes.update(watcher.read(None))
+    while True:
+        more = watcher.read(debounce)
+        if not more:
+            return changes
+        changes.update(more)
+
+
+def snapshot_sources(root, excluded=()):
+    """
+    Returns the modification time and size of every source file under ``root`` (see ``iter_source_files``).
+    """
+    snapshot = {}
+    for path in iter_source_files(root, excluded):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        snapshot[path] = stat.st_mtime_ns, stat.st_size
+    return snapshot
+
+
+def get_changed(before, after):
+    """
+    Returns the paths that were changed, added or removed between two snapshots (see ``snapshot_sources``).
+    """
+    return {path for path in set(before).union(after) if before.get(path) != after.get(path)}
+
+
+def drain_changes(watcher):
+    """
+    Returns the paths changed since the last read, without waiting.
+    """
+    changes = set()
+    while True:
+        more = watcher.read(0)
+        if not more:
+            return changes
+        changes.update(more)
+
+
+class InotifyWatcher(object):
+    """
+    Watches a source tree with inotify (through ``ctypes``, a watch is added for every source directory).
+    """
+
+    def __init__(self, root, excluded=()):
+        self.root = str(root)
+        self.excluded = excluded
+        self.skipped = normalize_paths(excluded)
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+        self.add_tree(self.root)
+
+    def add_tree(self, path):
+        for directory in iter_source_dirs(path, self.excluded):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                code = ctypes.get_errno()
+                if code in (errno.ENOENT, errno.ENOTDIR):  # removed meanwhile
+                    continue
+                raise OSError(code, "inotify_add_watch failed for {}".format(directory))
+            self.watches[wd] = directory
+
+    def read(self, timeout):
+        """
+        Returns the paths changed since the last call, waits up to ``timeout`` seconds (forever if ``None``) for one.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        data = os.read(self.fd, 1 << 16)
+        changes = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0"))
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                self.add_tree(self.root)
+                changes.add(self.root)
+                continue
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                continue
+            path = os.path.join(directory, name) if name else directory
+            if mask & IN_ISDIR:
+                if not is_source_dir(path, self.skipped):  # e.g.: the build directory
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # files created before the watch was added are only seen by the rebuild
+                    self.add_tree(path)
+                changes.add(path)
+            elif os.path.splitext(name)[1] not in SKIP_FILE_EXTENSIONS:
+                changes.add(path)
+        return changes
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher(object):
+    """
+    Watches a source tree by comparing the modification times and sizes of the source files every ``POLL_INTERVAL``.
+    """
+
+    def __init__(self, root, excluded=()):
+        self.root = root
+        self.excluded = excluded
+        self.snapshot = self.scan()
+
+    def scan(self):
+        return snapshot_sources(self.root, self.excluded)
+
+    def read(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            time.sleep(POLL_INTERVAL if deadline is None else max(0, min(POLL_INTERVAL, deadline - time.monotonic())))
+            snapshot = self.scan()
+            changes = get_changed(self.snapshot, snapshot)
+            self.snapshot = snapshot
+            if changes or deadline is not None and time.monotonic() >= deadline:
+                return changes
+
+    def close(self):
+        pass
@@ -1,8 +1,32 @@
+import base64
+import hashlib
+import json
+import os
+import pstats
+import signal
+import subprocess
 import sys
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
+from tox.exception import InterpreterNotFound
 
+import tox_wheel.builddir
+import tox_wheel.buildenv
+import tox_wheel.cache
+import tox_wheel.compression
+import tox_wheel.install
+import tox_wheel.native
+import tox_wheel.pep517
 import tox_wheel.plugin
+import tox_wheel.prebuilt
+import tox_wheel.reproducible
+import tox_wheel.store
+import tox_wheel.trees
+import tox_wheel.verify
+import tox_wheel.watch
 
 try:
     from unittest.mock import MagicMock
@@ -81,6 +105,19 @@ build-backend = "setuptools.build_meta"
     return testdir
 
 
+@pytest.fixture
+def testdir_pep517_hooks(testdir_pep517):
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py-{a,b}
+
+[testenv]
+wheel = true
+wheel_pep517 = hooks
+""")
+    return testdir_pep517
+
+
 @pytest.fixture(params=['', '--parallel 1 --parallel-live'], ids=['sequential', 'parallel'])
 def options(request):
     return ['-e', 'py-a,py-b'] + request.param.split()
@@ -107,12 +144,65 @@ def test_disabled(testdir_legacy, options):
 def test_enabled_legacy(testdir_legacy, options):
     result = testdir_legacy.run('tox', '--wheel', *options)
     result.stdout.fnmatch_lines([
-        'py* wheel-make: *',
+        'py-a wheel-make: *',
+        'py-b wheel-share: reusing foobar-0.0.0-py3-none-any.whl built in py-a',
     ])
+    # the wheel is interpreter independent, thus it's only built once
+    assert result.stdout.str().count('running bdist_wheel') == 1
+    assert result.ret == 0
+
+
+def test_share_disabled(testdir_legacy, options):
+    testdir_legacy.tmpdir.join('tox.ini').write("""
+[testenv]
+wheel = true
+wheel_share = false
+""", mode='a')
+    result = testdir_legacy.run('tox', *options)
+    assert 'wheel-share' not in result.stdout.str()
+    assert result.stdout.str().count('running bdist_wheel') == 2
+    assert result.ret == 0
+
+
+@pytest.mark.parametrize('setting', [
+    'setenv = b: FOO = 1',
+    'deps = b: wheel',
+    'wheel_compression = b: stored',
+    'wheel_reproducible = b: true',
+])
+def test_share_different_settings(testdir_legacy, setting):
+    testdir_legacy.tmpdir.join('tox.ini').write("""
+[testenv]
+wheel = true
+%s
+""" % setting, mode='a')
+    result = testdir_legacy.run('tox', '-e', 'py-a,py-b', '--notest')
+    assert 'wheel-share' not in result.stdout.str()
     assert result.stdout.str().count('running bdist_wheel') == 2
     assert result.ret == 0
 
 
+def test_fast_compression_not_native(testdir_legacy):
+    # fast only applies to native builds (recompressing the deflated wheels of the other modes costs more than it saves)
+    testdir_legacy.tmpdir.join('tox.ini').write("""
+[testenv]
+wheel = true
+wheel_compression = b: fast
+""", mode='a')
+    result = testdir_legacy.run('tox', '-e', 'py-a,py-b', '--notest')
+    assert 'wheel_compression: fast only works with wheel_pep517 = native' in result.stderr.str() + result.stdout.str()
+    assert 'running bdist_wheel' not in result.stdout.str()
+    assert result.ret != 0
+
+    testdir_legacy.tmpdir.join('tox.ini').write("""
+[testenv]
+wheel = true
+wheel_compression = bzip2
+""")
+    result = testdir_legacy.run('tox', '-e', 'py', '--notest')
+    assert "wheel_compression: value 'bzip2' needs to be one of: default, fast, stored" in result.stderr.str() + result.stdout.str()
+
+
 def test_enabled_pep517(testdir_pep517, options):
     result = testdir_pep517.run('tox', *options)
     result.stdout.fnmatch_lines([
@@ -122,7 +212,7 @@ def test_enabled_pep517(testdir_pep517, options):
         build_string = 'Building wheel for foobar (pyproject.toml)'
     else:
         build_string = 'Building wheel for foobar (PEP 517)'
-    assert result.stdout.str().count(build_string) == 4
+    assert result.stdout.str().count(build_string) == 2
     assert result.ret == 0
 
 
@@ -132,8 +222,166 @@ def test_enabled_pep517_build(testdir_pep517_build, options):
         'py* wheel-make: *',
     ])
     build_string = 'Successfully built foobar-0.0.0.tar.gz and foobar-0.0.0-py3-none-any.whl'
-    assert result.stdout.str().count(build_string) == 2
+    assert result.stdout.str().count(build_string) == 1
+    assert result.ret == 0
+
+
+def test_warm_build_env_parallel(testdir_pep517):
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py-{a,b}
+
+[testenv]
+wheel = true
+wheel_pep517 = true
+wheel_warm_build_env = true
+wheel_share = false
+""")
+    for _ in range(2):
+        # both builds use the same warm build env, it's only (re)created once
+        result = testdir_pep517.run('tox', '--wheel-build-parallel=2', '--recreate', '--notest')
+        assert result.stdout.str().count('creating warm build env') == 1
+        assert result.stdout.str().count('--no-build-isolation') == 2
+        assert result.ret == 0
+
+
+def test_enabled_pep517_hooks(testdir_pep517_hooks, options):
+    result = testdir_pep517_hooks.run('tox', *options)
+    result.stdout.fnmatch_lines([
+        'py* wheel-make: setuptools.build_meta get_requires_for_build_wheel',
+        'py* wheel-make: setuptools.build_meta build_wheel',
+    ])
+    assert result.ret == 0
+    assert testdir_pep517_hooks.tmpdir.join('.tox', 'dist', 'foobar-0.0.0-py3-none-any.whl').check()
+
+
+@pytest.mark.parametrize('mode', ['true', 'build'])
+def test_warm_build_env(testdir_pep517, mode):
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py-{a,b}
+
+[testenv]
+wheel = true
+wheel_pep517 = %s
+wheel_warm_build_env = true
+""" % mode)
+    result = testdir_pep517.run('tox')
+    # both envs use the same interpreter and build requirements, thus one warm build env
+    assert result.stdout.str().count('creating warm build env') == 1
+    assert result.stdout.str().count('--no-build-isolation' if mode == 'true' else '--no-isolation') == 1
+    assert result.ret == 0
+
+    result = testdir_pep517.run('tox')
+    assert 'creating warm build env' not in result.stdout.str()
+    assert 'installing build requirements ...' not in result.stdout.str()
+    assert result.ret == 0
+
+    testdir_pep517.tmpdir.join('pyproject.toml').write("""
+[build-system]
+requires = ["setuptools >= 40"]
+build-backend = "setuptools.build_meta"
+""")
+    result = testdir_pep517.run('tox')
+    assert result.stdout.str().count('creating warm build env') == 1
+    assert result.ret == 0
+    envs = testdir_pep517.tmpdir.join('.tox', '.wheel-build-envs')
+    assert len(envs.listdir(lambda path: path.check(dir=1))) == 2
+
+    # warm envs that weren't used for a while are removed when another one is created
+    for env in envs.listdir(lambda path: path.check(dir=1)):
+        env.join('.wheel-build-requires').setmtime(time.time() - tox_wheel.buildenv.MAX_AGE - 60)
+    testdir_pep517.tmpdir.join('pyproject.toml').write(testdir_pep517.tmpdir.join('pyproject.toml').read().replace('40', '41'))
+    result = testdir_pep517.run('tox')
+    assert result.stdout.str().count('creating warm build env') == 1
+    assert result.ret == 0
+    assert len(envs.listdir(lambda path: path.check(dir=1))) == 1
+
+
+def test_prune_warm_envs(tmpdir):
+    now = time.time()
+    for name, age in [('old', 8), ('fresh', 1), ('unfinished', None), ('locked', 8), ('kept', 8)]:
+        tmpdir.join(name).ensure(dir=True)
+        if age is not None:
+            tmpdir.join(name, '.wheel-build-requires').write('[]')
+            tmpdir.join(name, '.wheel-build-requires').setmtime(now - age * 24 * 3600)
+    lock = tox_wheel.buildenv.FileLock(str(tmpdir.join('locked.lock')))
+    with lock:
+        removed = tox_wheel.buildenv.prune_warm_envs(tmpdir, keep=[tmpdir.join('kept')], now=now)
+    assert sorted(env.basename for env in removed) == ['old', 'unfinished']
+    assert sorted(path.basename for path in tmpdir.listdir(lambda path: path.check(dir=1))) == ['fresh', 'kept', 'locked']
+    assert not tmpdir.join('old.lock').check()
+
+
+@pytest.mark.parametrize('mode', ['true', 'hooks'])
+def test_wheelhouse(testdir_pep517, monkeypatch, mode):
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py-{a,b}
+
+[testenv]
+wheel = true
+wheel_pep517 = %s
+wheel_build_wheelhouse = {toxinidir}/wheelhouse
+""" % mode)
+    # setuptools gives the setup_requires from get_requires_for_build_wheel
+    testdir_pep517.tmpdir.join('setup.py').write("""
+from setuptools import setup
+
+setup(name='foobar', setup_requires=['six'])
+""")
+    result = testdir_pep517.run('tox')
+    # the static requirements first, then the ones the backend asks for
+    assert result.stdout.str().count('wheelhouse: fetching build requirements into') == 2
     assert result.ret == 0
+    assert testdir_pep517.tmpdir.join('wheelhouse').listdir('setuptools-*.whl')
+    # the requirements the backend asks for are fetched too, all of them are pinned
+    assert testdir_pep517.tmpdir.join('wheelhouse').listdir('six-*.whl')
+    constraints, = testdir_pep517.tmpdir.join('wheelhouse').listdir('.constraints-*.txt')
+    assert {line.split('==')[0] for line in constraints.read().splitlines()} >= {'setuptools', 'six'}
+
+    # offline builds only need the wheelhouse
+    monkeypatch.setenv('PIP_INDEX_URL', 'http://127.0.0.1:9/simple')
+    for name in ['http_proxy', 'https_proxy', 'HTTP_PROXY', 'HTTPS_PROXY']:
+        monkeypatch.setenv(name, 'http://127.0.0.1:9')
+    testdir_pep517.tmpdir.join('.tox').remove()
+    result = testdir_pep517.run('tox')
+    assert 'fetching build requirements' not in result.stdout.str()
+    assert result.ret == 0
+
+
+def test_wheelhouse_concurrent_writers(tmpdir):
+    wheelhouse = tox_wheel.buildenv.Wheelhouse(tmpdir.join('wheelhouse'))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda key: wheelhouse.set_dynamic_requires(key, [key]), map(str, range(32))))
+    # nothing is lost and no temporary files are left behind
+    assert all(wheelhouse.get_dynamic_requires(str(key)) == [str(key)] for key in range(32))
+    assert not wheelhouse.path.listdir('.tmp-*')
+
+
+def test_build_backend(tmpdir):
+    tmpdir.join('backend', 'fake_backend.py').write("""
+import os
+
+def build_wheel(wheel_directory, config_settings=None, metadata_directory=None):
+    print('noise on stdout')
+    open(os.path.join(wheel_directory, 'foobar-1.0-py3-none-any.whl'), 'w').close()
+    return 'foobar-1.0-py3-none-any.whl'
+
+def build_sdist(sdist_directory, config_settings=None):
+    raise ValueError('no sdist')
+""", ensure=True)
+    backend = tox_wheel.pep517.BuildBackend(sys.executable, tmpdir, 'fake_backend', [str(tmpdir.join('backend'))])
+    try:
+        assert backend.call('get_requires_for_build_wheel') == []
+        assert backend.call('build_wheel', wheel_directory=str(tmpdir)) == 'foobar-1.0-py3-none-any.whl'
+        assert tmpdir.join('foobar-1.0-py3-none-any.whl').check()
+        with pytest.raises(tox_wheel.pep517.InvocationError):
+            backend.call('build_sdist', sdist_directory=str(tmpdir))
+        assert backend.alive
+    finally:
+        backend.close()
+    assert not backend.alive
 
 
 def test_build_env_legacy(testdir_legacy, options):
@@ -214,6 +462,80 @@ wheel_build_env = build
     assert result.ret == 0
 
 
+def test_editable(testdir_pep517, options):
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py-{a,b}
+
+[testenv]
+wheel = editable
+commands = python -c "import foobar; print('value', foobar.value, foobar.__file__)"
+""")
+    testdir_pep517.tmpdir.join('setup.py').remove()
+    testdir_pep517.tmpdir.join('pyproject.toml').write("""
+[build-system]
+requires = ["setuptools>=64"]
+build-backend = "setuptools.build_meta"
+
+[project]
+name = "foobar"
+version = "1.0"
+""")
+    source = testdir_pep517.tmpdir.join('src', 'foobar', '__init__.py')
+    source.write('value = 1', ensure=True)
+    testdir_pep517.tmpdir.join('build', 'keep').ensure()
+    result = testdir_pep517.run('tox', *options)
+    result.stdout.fnmatch_lines([
+        'py-a wheel-make: setuptools.build_meta build_editable',
+        'py-b wheel-share: reusing foobar-1.0-0.editable-py3-none-any.whl built in py-a',
+    ])
+    result.stdout.fnmatch_lines([
+        'value 1 {}'.format(source),
+    ])
+    assert testdir_pep517.tmpdir.join('build', 'keep').check()
+    assert result.ret == 0
+
+    source.write('value = 2')
+    result = testdir_pep517.run(testdir_pep517.tmpdir.join('.tox', 'py-a', 'bin', 'python'), '-c', 'import foobar; print(foobar.value)')
+    assert result.stdout.lines == ['2']
+
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[testenv]
+wheel = bogus
+""")
+    result = testdir_pep517.run('tox', '-e', 'py')
+    assert "wheel: value 'bogus' needs to be 'True', 'False' or 'editable'" in result.stderr.str() + result.stdout.str()
+
+
+def test_editable_incremental(testdir_pep517):
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py
+
+[testenv]
+wheel = editable
+wheel_incremental = true
+""")
+    testdir_pep517.tmpdir.join('setup.py').remove()
+    testdir_pep517.tmpdir.join('build').remove()
+    testdir_pep517.tmpdir.join('pyproject.toml').write("""
+[build-system]
+requires = ["setuptools>=64"]
+build-backend = "setuptools.build_meta"
+
+[project]
+name = "foobar"
+version = "1.0"
+""")
+    testdir_pep517.tmpdir.join('src', 'foobar', '__init__.py').write('', ensure=True)
+    result = testdir_pep517.run('tox', '--notest')
+    result.stdout.fnmatch_lines([
+        'py wheel-make: setuptools.build_meta build_editable',
+    ])
+    assert result.ret == 0
+    assert not testdir_pep517.tmpdir.join('build', '.tox-wheel-outputs.json').check()
+
+
 def test_enabled_toxini_noclean_legacy(testdir_legacy, options):
     testdir_legacy.tmpdir.join('tox.ini').write("""
 [testenv]
@@ -263,7 +585,7 @@ wheel = true
 """, mode='a')
     result = testdir_legacy.run('tox', '-vv', *options)
     result.stdout.fnmatch_lines([
-        'py* wheel-make: *',
+        'py* start: packaging *',
         'py* wheel-make: cleaning up build directory ...',
         '  removing *[\\/]build',
         'py* finish: packaging *',
@@ -277,8 +599,10 @@ def test_skip_missing_interpreters():
     with patch.object(tox_wheel.plugin, 'get_package') as mock_build:
         venv = MagicMock()
         venv.envconfig.wheel = True
+        venv.envconfig.wheel_install = 'pip'
         session = MagicMock()
         session.config.option.wheel = True
+        session.config.option.wheel_watch = False
         session.getvenv.return_value = object()
         mock_build.side_effect = tox_wheel.plugin.InterpreterNotFound("No interpreter")
 
@@ -320,3 +644,1526 @@ basepython = python3.nothing
         '*Building wheels*',
     ])
     assert result.ret == 0, result.stdout
+
+
+def test_cache_legacy(testdir_legacy, options):
+    # pytester writes output files and HOME in the root dir, thus the project needs to live elsewhere
+    project = testdir_legacy.tmpdir.join('project')
+    project.join('tox.ini').write(testdir_legacy.tmpdir.join('tox.ini').read() + """
+[testenv]
+wheel = true
+wheel_cache = true
+""", ensure=True)
+    testdir_legacy.tmpdir.join('setup.py').copy(project.join('setup.py'))
+    result = testdir_legacy.run('tox', '-c', project, *options)
+    # same interpreter and same sources, so py-b reuses the wheel built for py-a
+    assert result.stdout.str().count('running bdist_wheel') == 1
+    assert result.ret == 0
+
+    result = testdir_legacy.run('tox', '-c', project, *options)
+    result.stdout.fnmatch_lines([
+        'py* wheel-cache: reusing *.whl',
+    ])
+    assert 'running bdist_wheel' not in result.stdout.str()
+    assert result.ret == 0
+
+    project.join('foobar.py').write('')
+    result = testdir_legacy.run('tox', '-c', project, *options)
+    assert result.stdout.str().count('running bdist_wheel') == 1
+    assert result.ret == 0
+
+    # cached wheels are verified before they're reused
+    for wheel in project.join('.tox', '.wheel-cache').visit('*.whl'):
+        wheel.write('corrupt')
+    result = testdir_legacy.run('tox', '-c', project, *options)
+    result.stdout.fnmatch_lines([
+        'WARNING: discarding corrupt cached wheel *foobar-0.0.0-py3-none-any.whl: *',
+    ])
+    assert result.stdout.str().count('running bdist_wheel') == 1
+    assert result.ret == 0
+
+
+def test_cache_setenv(testdir_legacy):
+    project = testdir_legacy.tmpdir.join('project').ensure(dir=1)
+    testdir_legacy.tmpdir.join('setup.py').copy(project.join('setup.py'))
+    for setenv, built in [('FOO = 1', True), ('FOO = 1', False), ('FOO = 2', True)]:
+        project.join('tox.ini').write("""
+[testenv]
+wheel = true
+wheel_cache = true
+setenv = %s
+""" % setenv)
+        result = testdir_legacy.run('tox', '-c', project, '-e', 'py', '--notest')
+        assert result.ret == 0
+        assert ('running bdist_wheel' in result.stdout.str()) == built
+
+
+def test_cache_reproducible(testdir_legacy, monkeypatch):
+    project = testdir_legacy.tmpdir.join('project').ensure(dir=1)
+    testdir_legacy.tmpdir.join('setup.py').copy(project.join('setup.py'))
+    project.join('tox.ini').write("""
+[testenv]
+wheel = true
+wheel_cache = true
+wheel_reproducible = true
+""")
+    for epoch, built in [('1600000000', True), ('1600000000', False), ('1700000000', True)]:
+        monkeypatch.setenv('SOURCE_DATE_EPOCH', epoch)
+        result = testdir_legacy.run('tox', '-c', project, '-e', 'py', '--notest')
+        assert result.ret == 0
+        assert ('running bdist_wheel' in result.stdout.str()) == built
+
+
+def test_cache_eviction(tmpdir):
+    cache = tox_wheel.cache.WheelCache(tmpdir.join('cache'), max_size=2500)
+    # nothing was cached yet
+    assert cache.prune() == []
+    assert not cache.path.check()
+    for i, key in enumerate(['a', 'b', 'c']):
+        wheel = tmpdir.join('foobar-{}-py3-none-any.whl'.format(i))
+        wheel.write('x' * 1000)
+        with cache.lock(key):
+            cache.put(key, wheel)
+        os.utime(str(cache.path.join(key)), (1000 + i, 1000 + i))
+    assert cache.get('a').basename == 'foobar-0-py3-none-any.whl'
+    assert [key for key, _, _, _ in cache.entries()] == ['b', 'c', 'a']
+
+    # b is the least recently used
+    assert [key for key, _, _, _ in cache.prune()] == ['b']
+    assert not cache.path.join('b.lock').check()
+    assert cache.path.join('a.lock').check()
+    cache.max_size = 0
+    assert [key for key, _, _, _ in cache.prune(keep=['a'])] == ['c']
+    assert [key for key, _, _, _ in cache.entries()] == ['a']
+
+    cache.max_size = None
+    cache.max_age = 3600
+    assert cache.prune() == []
+    assert [key for key, _, _, _ in cache.prune(now=time.time() + 7200)] == ['a']
+    assert cache.entries() == []
+
+    # the locks of failed builds are removed once stale
+    with cache.lock('d'):
+        pass
+    cache.prune()
+    assert cache.path.join('d.lock').check()
+    cache.prune(now=time.time() + tox_wheel.cache.STALE_TMP_AGE + 1)
+    assert not cache.path.join('d.lock').check()
+    assert cache.path.join('.prune.lock').check()
+
+    assert tox_wheel.cache.parse_size('1.5k') == 1536
+    assert tox_wheel.cache.parse_size('2GB') == 2 << 30
+    assert tox_wheel.cache.parse_age('30d') == 30 * 86400
+    with pytest.raises(ValueError):
+        tox_wheel.cache.parse_age('30x')
+
+
+def test_cache_commands(testdir_legacy):
+    project = testdir_legacy.tmpdir.join('project')
+    project.join('tox.ini').write(testdir_legacy.tmpdir.join('tox.ini').read() + """
+[testenv]
+wheel = true
+wheel_cache = true
+wheel_cache_max_size = 1
+""", ensure=True)
+    testdir_legacy.tmpdir.join('setup.py').copy(project.join('setup.py'))
+    result = testdir_legacy.run('tox', '-c', project)
+    assert 'evicted' not in result.stdout.str()
+    assert result.ret == 0
+
+    project.join('foobar.py').write('')
+    result = testdir_legacy.run('tox', '-c', project)
+    result.stdout.fnmatch_lines([
+        'py-a wheel-cache: evicted 1 wheels (*) from *?.wheel-cache',
+    ])
+    assert result.ret == 0
+
+    result = testdir_legacy.run('tox', '-c', project, '--wheel-cache-stats', '-v')
+    result.stdout.fnmatch_lines([
+        'wheel cache *?.wheel-cache: 1 wheels, * (max size 1B)',
+        '  * foobar-0.0.0-py3-none-any.whl * (last used 0.0 days ago)',
+    ])
+    assert 'py-a' not in result.stdout.str()
+    assert result.ret == 0
+
+    # the wheel is only kept over the limit while it's being used
+    result = testdir_legacy.run('tox', '-c', project, '--wheel-cache-prune', '--wheel-cache-stats')
+    result.stdout.fnmatch_lines([
+        'wheel cache evicted 1 wheels (*) from *?.wheel-cache',
+        'wheel cache *?.wheel-cache: 0 wheels, 0B (max size 1B)',
+    ])
+    assert result.ret == 0
+
+
+def test_shared_store(tmpdir):
+    store = tox_wheel.store.get_wheel_store('shared', tmpdir)
+    assert store.path == tmpdir.join('shared')
+    with pytest.raises(ValueError):
+        tox_wheel.store.get_wheel_store('http://example.com/wheels', tmpdir)
+    wheel = tmpdir.join('foobar-1.0-py3-none-any.whl')
+    wheel.write('wheel')
+    assert store.get('key') is None
+    with store.lock('key'):
+        assert store.put('key', wheel).read() == 'wheel'
+    assert not store.path.join('key.lock').check()
+    assert store.get('key') == store.path.join('key', wheel.basename)
+
+    # waiters don't need the lock once the entry is published
+    store.path.join('key.lock').write('{}')
+    with store.lock('key') as held:
+        assert not held
+        assert not store.holds_lock('key')
+    store.path.join('key.lock').remove()
+
+    # corrupt entries are only discarded by the holder of the lock
+    store.path.join('key', wheel.basename).write('corrupt')
+    assert store.get('key') is None
+    assert store.path.join('key').check()
+    with store.lock('key', wait_for_entry=False) as held:
+        assert held
+        assert store.get('key') is None
+    assert not store.path.join('key').check()
+
+    # locks of dead processes are broken
+    store.stale_lock_timeout = 60
+    store.path.join('other.lock').write('{}')
+    os.utime(str(store.path.join('other.lock')), (time.time() - 120, time.time() - 120))
+    with store.lock('other'):
+        assert json.loads(store.path.join('other.lock').read())['pid'] == os.getpid()
+
+    # a lock taken again after it was found stale is put back
+    store.path.join('fresh.lock').write('{"pid": 1, "host": "other"}')
+    store.break_lock(store.path.join('fresh.lock'), 120)
+    assert store.path.join('fresh.lock').read() == '{"pid": 1, "host": "other"}'
+    assert not store.path.listdir('*.stale-*')
+
+
+def test_shared_store_competing_writers(tmpdir):
+    # two machines sharing the store, the lock of the first one is broken while it builds
+    first = tox_wheel.store.get_wheel_store('shared', tmpdir)
+    second = tox_wheel.store.get_wheel_store('shared', tmpdir)
+    second.stale_lock_timeout = 60
+    wheel = tmpdir.join('foobar-1.0-py3-none-any.whl')
+    wheel.write('wheel')
+    with first.lock('key') as held:
+        assert held
+        assert first.holds_lock('key')
+        os.utime(str(first.path.join('key.lock')), (time.time() - 120, time.time() - 120))
+        with second.lock('key') as second_held:
+            assert second_held
+            assert second.holds_lock('key')
+            assert not first.holds_lock('key')
+            second.put('key', wheel)
+        first_lock = first.path.join('key.lock')
+        first_lock.write(json.dumps({'token': 'third'}))
+    # the lock of another process is not released
+    assert first_lock.read() == json.dumps({'token': 'third'})
+    assert second.get('key').read() == 'wheel'
+
+
+def test_shared_store_legacy(testdir_legacy):
+    project = testdir_legacy.tmpdir.join('project')
+    project.join('tox.ini').write(testdir_legacy.tmpdir.join('tox.ini').read() + """
+[testenv]
+wheel = true
+wheel_cache_shared = {toxinidir}/../shared
+""", ensure=True)
+    testdir_legacy.tmpdir.join('setup.py').copy(project.join('setup.py'))
+    result = testdir_legacy.run('tox', '-c', project, '-e', 'py-a', '--workdir', testdir_legacy.tmpdir.join('node1'))
+    assert result.stdout.str().count('running bdist_wheel') == 1
+    assert result.ret == 0
+    assert list(testdir_legacy.tmpdir.join('shared').visit('entry.json'))
+
+    result = testdir_legacy.run('tox', '-c', project, '-e', 'py-a', '--workdir', testdir_legacy.tmpdir.join('node2'))
+    result.stdout.fnmatch_lines([
+        'py-a wheel-cache: reusing foobar-0.0.0-py3-none-any.whl from *?shared',
+    ])
+    assert 'running bdist_wheel' not in result.stdout.str()
+    assert result.ret == 0
+
+
+def test_verify_wheel(tmpdir):
+    def make_wheel(name, files):
+        record = ['{},sha256={},{}'.format(
+            path,
+            base64.urlsafe_b64encode(hashlib.sha256(content).digest()).rstrip(b'=').decode(),
+            len(content),
+        ) for path, content in files.items()]
+        record.append('foobar-1.0.dist-info/RECORD,,')
+        wheel = tmpdir.join(name)
+        with zipfile.ZipFile(str(wheel), 'w') as archive:
+            for path, content in files.items():
+                archive.writestr(path, content)
+            archive.writestr('foobar-1.0.dist-info/RECORD', '\n'.join(record))
+        return wheel
+
+    files = {
+        'foobar.py': b'',
+        'foobar-1.0.dist-info/WHEEL': b'Wheel-Version: 1.0\nRoot-Is-Purelib: true\nTag: py3-none-any\n',
+        'foobar-1.0.dist-info/METADATA': b'Metadata-Version: 2.1\nName: foobar\nVersion: 1.0\n',
+    }
+    tox_wheel.verify.verify_wheel(make_wheel('foobar-1.0-py3-none-any.whl', files))
+
+    with pytest.raises(tox_wheel.verify.WheelVerificationError, match='tags py2-none-any are not in WHEEL'):
+        tox_wheel.verify.verify_wheel(make_wheel('foobar-1.0-py2.py3-none-any.whl', files))
+    with pytest.raises(tox_wheel.verify.WheelVerificationError, match="METADATA version '1.0' does not match"):
+        tox_wheel.verify.verify_wheel(make_wheel('foobar-2.0-py3-none-any.whl', files))
+
+    wheel = make_wheel('foobar-1.0-py3-none-any.whl', files)
+    with zipfile.ZipFile(str(wheel), 'a') as archive:
+        archive.writestr('extra.py', b'')
+    with pytest.raises(tox_wheel.verify.WheelVerificationError, match='extra.py is not in RECORD'):
+        tox_wheel.verify.verify_wheel(wheel)
+
+    wheel = make_wheel('foobar-1.0-py3-none-any.whl', files)
+    wheel.write_binary(wheel.read_binary().replace(b'Root-Is-Purelib: true', b'Root-Is-Purelib: True'))
+    with pytest.raises(tox_wheel.verify.WheelVerificationError):
+        tox_wheel.verify.verify_wheel(wheel)
+
+    tmpdir.join('foobar-1.0-py3-none-any.whl').write('')
+    with pytest.raises(tox_wheel.verify.WheelVerificationError):
+        tox_wheel.verify.verify_wheel(tmpdir.join('foobar-1.0-py3-none-any.whl'))
+
+
+def test_timings(testdir_legacy, options):
+    result = testdir_legacy.run('tox', '--wheel', '--wheel-timings', 'timings.json', *options)
+    result.stdout.fnmatch_lines([
+        '*_ wheel timings _*',
+        '  py-a built foobar-0.0.0-py3-none-any.whl in *s (update *s, cleanup *s, wheel-make *s, publish *s) ?legacy?',
+        'write wheel timings report at: *timings.json',
+    ])
+    assert result.ret == 0
+    report = json.loads(testdir_legacy.tmpdir.join('timings.json').read())
+    assert [build['build_env'] for build in report['builds']] == ['py-a']
+    for build in report['builds']:
+        assert build['cache'] is None
+        assert build['mode'] == 'legacy'
+        assert build['wheel'] == 'foobar-0.0.0-py3-none-any.whl'
+        assert build['size'] > 0
+        assert sorted(build['phases']) == ['cleanup', 'publish', 'update', 'wheel-make']
+        assert build['duration'] >= sum(build['phases'].values())
+
+
+def test_hash_source_tree(tmpdir):
+    def tree_hash():
+        return tox_wheel.cache.hash_source_tree(tmpdir, hashlib.sha256(), excluded=[tmpdir.join('dist')]).hexdigest()
+
+    tmpdir.join('setup.py').write('')
+    tmpdir.join('src', 'foobar.py').write('', ensure=True)
+    initial = tree_hash()
+    tmpdir.join('dist', 'foobar.whl').write('', ensure=True)
+    tmpdir.join('.git', 'index').write('', ensure=True)
+    tmpdir.join('src', '__pycache__', 'foobar.pyc').write('', ensure=True)
+    tmpdir.join('src', 'foobar.egg-info', 'PKG-INFO').write('', ensure=True)
+    tmpdir.join('venv', 'pyvenv.cfg').write('', ensure=True)
+    assert tree_hash() == initial
+    tmpdir.join('src', 'foobar.py').write('x = 1')
+    assert tree_hash() != initial
+
+
+def test_hash_tracked_files(tmpdir):
+    def tree_hash(ignored=()):
+        return tox_wheel.cache.hash_source_tree(tmpdir, hashlib.sha256(), ignored=ignored).hexdigest()
+
+    def git(*args):
+        subprocess.check_call(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com'] + list(args),
+                              cwd=str(tmpdir), stdout=subprocess.DEVNULL)
+
+    tmpdir.join('setup.py').write('')
+    tmpdir.join('src', 'foobar.py').write('', ensure=True)
+    tmpdir.join('tests', 'test_foobar.py').write('', ensure=True)
+    tmpdir.join('.gitignore').write('.coverage\n')
+    git('init', '-q')
+    git('add', '.')
+    git('commit', '-q', '-m', 'initial')
+    initial = tree_hash()
+    assert tox_wheel.cache.list_vcs_files(tmpdir) == [
+        '.gitignore', 'setup.py', os.path.join('src', 'foobar.py'), os.path.join('tests', 'test_foobar.py')
+    ]
+    tmpdir.join('.coverage').write('data')
+    tmpdir.join('src', 'untracked.py').write('')
+    assert tree_hash() == initial
+    tmpdir.join('src', 'foobar.py').write('x = 1')
+    assert tree_hash() != initial
+    changed = tree_hash()
+    ignored = tree_hash(ignored=['tests/*'])
+    tmpdir.join('tests', 'test_foobar.py').write('x = 1')
+    assert tree_hash() != changed
+    assert tree_hash(ignored=['tests/*']) == ignored
+    tmpdir.join('src', 'foobar.py').remove()
+    assert tree_hash() != changed
+
+
+def test_incremental_build_dir(tmpdir):
+    build = tmpdir.join('build')
+    tmpdir.join('setup.py').write('')
+    tmpdir.join('src', 'foobar', '__init__.py').write('', ensure=True)
+    tmpdir.join('src', 'foobar', 'old.py').write('', ensure=True)
+    tmpdir.join('src', 'foobar', '_speedups.c').write('', ensure=True)
+    build.join('lib', 'foobar', '__init__.py').write('', ensure=True)
+    build.join('lib', 'foobar', 'old.py').write('', ensure=True)
+    build.join('lib', 'foobar', '_speedups.so').write('', ensure=True)
+    build.join('temp', 'src', 'foobar', '_speedups.o').write('', ensure=True)
+    assert tox_wheel.builddir.clean_build_dir(tmpdir, build) is None
+    assert build.listdir() == []
+
+    build.join('lib', 'foobar', '__init__.py').write('', ensure=True)
+    build.join('lib', 'foobar', 'old.py').write('', ensure=True)
+    build.join('lib', 'foobar', '_speedups.so').write('', ensure=True)
+    build.join('temp', 'src', 'foobar', '_speedups.o').write('', ensure=True)
+    tox_wheel.builddir.record_build_dir(tmpdir, build)
+    build.join('bdist.linux', 'wheel', 'foobar.py').write('', ensure=True)
+    assert tox_wheel.builddir.clean_build_dir(tmpdir, build) == ['bdist.linux/wheel/foobar.py']
+
+    tmpdir.join('src', 'foobar', 'old.py').move(tmpdir.join('src', 'foobar', 'new.py'))
+    assert tox_wheel.builddir.clean_build_dir(tmpdir, build) == ['lib/foobar/old.py']
+    assert build.join('lib', 'foobar', '_speedups.so').check()
+    assert build.join('temp', 'src', 'foobar', '_speedups.o').check()
+
+    # only the object files are kept if the configuration changed (e.g.: a package was removed from it)
+    tmpdir.join('setup.py').write('# changed')
+    assert tox_wheel.builddir.clean_build_dir(tmpdir, build) == ['lib/foobar/__init__.py', 'lib/foobar/_speedups.so']
+    assert build.join('temp', 'src', 'foobar', '_speedups.o').check()
+
+
+def test_incremental_legacy(testdir_legacy, options):
+    testdir_legacy.tmpdir.join('tox.ini').write("""
+[testenv]
+wheel = true
+wheel_incremental = true
+""", mode='a')
+    testdir_legacy.tmpdir.join('setup.py').write("""
+from setuptools import setup
+
+setup(name='foobar', py_modules=['foo', 'bar'])
+""")
+    testdir_legacy.tmpdir.join('foo.py').write('')
+    testdir_legacy.tmpdir.join('bar.py').write('')
+    result = testdir_legacy.run('tox', *options)
+    result.stdout.fnmatch_lines([
+        'py* wheel-make: cleaning up stale outputs in build directory ...',
+    ])
+    assert result.ret == 0
+    assert sorted(path.basename for path in testdir_legacy.tmpdir.join('build', 'lib').listdir()) == ['bar.py', 'foo.py']
+
+    testdir_legacy.tmpdir.join('setup.py').write("""
+from setuptools import setup
+
+setup(name='foobar', py_modules=['foo'])
+""")
+    testdir_legacy.tmpdir.join('bar.py').remove()
+    result = testdir_legacy.run('tox', *options)
+    assert result.ret == 0
+    assert [path.basename for path in testdir_legacy.tmpdir.join('build', 'lib').listdir()] == ['foo.py']
+    wheel, = testdir_legacy.tmpdir.join('.tox', 'dist').listdir('*.whl')
+    with zipfile.ZipFile(str(wheel)) as fh:
+        assert 'bar.py' not in fh.namelist()
+        assert 'foo.py' in fh.namelist()
+
+
+def test_incremental_config_changed(testdir_legacy):
+    testdir_legacy.tmpdir.join('tox.ini').write("""
+[testenv]
+wheel = true
+wheel_incremental = true
+""", mode='a')
+    testdir_legacy.tmpdir.join('setup.py').write("""
+from setuptools import setup
+
+setup(name='foobar', packages=['foo', 'bar'])
+""")
+    testdir_legacy.tmpdir.join('foo', '__init__.py').write('', ensure=True)
+    testdir_legacy.tmpdir.join('bar', '__init__.py').write('', ensure=True)
+    result = testdir_legacy.run('tox', '-e', 'py-a')
+    assert result.ret == 0
+    assert sorted(path.basename for path in testdir_legacy.tmpdir.join('build', 'lib').listdir()) == ['bar', 'foo']
+
+    # the sources of bar are still there, but it's no longer a package of the project
+    testdir_legacy.tmpdir.join('setup.py').write("""
+from setuptools import setup
+
+setup(name='foobar', packages=['foo'])
+""")
+    result = testdir_legacy.run('tox', '-e', 'py-a')
+    assert result.ret == 0
+    assert not testdir_legacy.tmpdir.join('build', 'lib', 'bar', '__init__.py').check()
+    wheel, = testdir_legacy.tmpdir.join('.tox', 'dist').listdir('*.whl')
+    with zipfile.ZipFile(str(wheel)) as fh:
+        assert 'bar/__init__.py' not in fh.namelist()
+        assert 'foo/__init__.py' in fh.namelist()
+
+
+def test_incremental_native(testdir_pep517):
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py
+
+[testenv]
+wheel = true
+wheel_pep517 = native
+wheel_incremental = true
+""")
+    testdir_pep517.tmpdir.join('setup.py').remove()
+    testdir_pep517.tmpdir.join('build').remove()
+    testdir_pep517.tmpdir.join('pyproject.toml').write("""
+[build-system]
+requires = ["setuptools>=61"]
+build-backend = "setuptools.build_meta"
+
+[project]
+name = "foobar"
+version = "1.0"
+""")
+    testdir_pep517.tmpdir.join('src', 'foobar', '__init__.py').write('', ensure=True)
+    result = testdir_pep517.run('tox', '--notest')
+    result.stdout.fnmatch_lines([
+        'py wheel-native: writing foobar 1.0 (1 files)',
+    ])
+    assert result.ret == 0
+    assert not testdir_pep517.tmpdir.join('build').check()
+
+
+def test_cache_concurrent_processes(testdir_legacy):
+    project = testdir_legacy.tmpdir.join('project')
+    project.join('tox.ini').write("""
+[testenv]
+wheel = true
+wheel_cache = true
+wheel_cache_dir = {toxinidir}/wheel-cache
+""", ensure=True)
+    testdir_legacy.tmpdir.join('setup.py').copy(project.join('setup.py'))
+    processes = [
+        testdir_legacy.popen(
+            ['tox', '-c', str(project), '-e', 'py', '--workdir', str(testdir_legacy.tmpdir.join(workdir))],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+        for workdir in ['work-a', 'work-b']
+    ]
+    outputs = [process.communicate()[0].decode() for process in processes]
+    assert [process.returncode for process in processes] == [0, 0], outputs
+    assert sum(output.count('running bdist_wheel') for output in outputs) == 1, outputs
+    assert sum(output.count('wheel-cache: reusing') for output in outputs) == 1, outputs
+
+
+@pytest.mark.parametrize('watcher', ['InotifyWatcher', 'PollingWatcher'])
+def test_watcher(tmpdir, watcher):
+    if watcher == 'InotifyWatcher' and not sys.platform.startswith('linux'):
+        pytest.skip('needs inotify')
+    tmpdir.join('src', 'foo', '__init__.py').write('', ensure=True)
+    tmpdir.join('build').ensure(dir=1)
+    watcher = getattr(tox_wheel.watch, watcher)(tmpdir, excluded=[tmpdir.join('build')])
+    try:
+        assert watcher.read(0.1) == set()
+        tmpdir.join('build', 'foo.o').write('')
+        tmpdir.join('src', 'foo', '__pycache__', 'foo.cpython-311.pyc').write('', ensure=True)
+        tmpdir.join('src', 'foo.egg-info', 'PKG-INFO').write('', ensure=True)
+        assert watcher.read(0.1 if watcher.__class__.__name__ == 'InotifyWatcher' else 1.1) == set()
+
+        tmpdir.join('src', 'foo', '__init__.py').write('x = 1')
+        tmpdir.join('src', 'foo', 'bar').ensure(dir=1)
+        assert tox_wheel.watch.wait_for_changes(watcher, debounce=0.1) >= {str(tmpdir.join('src', 'foo', '__init__.py'))}
+        tmpdir.join('src', 'foo', 'bar', 'baz.py').write('')
+        assert tox_wheel.watch.wait_for_changes(watcher, debounce=0.1) == {str(tmpdir.join('src', 'foo', 'bar', 'baz.py'))}
+    finally:
+        watcher.close()
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs SIGINT')
+def test_wheel_watch(testdir):
+    project = testdir.tmpdir.join('project')
+    project.join('tox.ini').write("""
+[tox]
+envlist = py-{a,b}
+
+[testenv]
+wheel = true
+wheel_pep517 = native
+commands = python -c "import foobar; print('value', foobar.value)"
+""", ensure=True)
+    project.join('pyproject.toml').write("""
+[project]
+name = "foobar"
+version = "1.0"
+""")
+    project.join('src', 'foobar', '__init__.py').write('value = 1', ensure=True)
+    log = testdir.tmpdir.join('watch.log')
+
+    def wait_for(text, count):
+        deadline = time.time() + 60
+        while log.read().count(text) < count:
+            assert time.time() < deadline, log.read()
+            time.sleep(0.1)
+
+    with log.open('w') as fh:
+        process = testdir.popen(
+            ['tox', '-c', str(project), '-e', 'py-a,py-b', '--wheel-watch'], stdin=subprocess.DEVNULL, stdout=fh, stderr=subprocess.STDOUT
+        )
+        try:
+            wait_for('wheel-watch: waiting for changes', 1)
+            project.join('src', 'foobar', '__init__.py').write('value = 2')
+            wait_for('wheel-watch: waiting for changes', 2)
+        finally:
+            process.send_signal(signal.SIGINT)
+            process.wait()
+    output = log.read()
+    assert 'wheel-watch: src?foobar?__init__.py changed' in output.replace(os.sep, '?')
+    assert output.count('py-a wheel-native: writing foobar 1.0 (1 files)') == 2
+    # every round shares the wheel it built
+    assert output.count('py-b wheel-share: reusing foobar-1.0-py3-none-any.whl built in py-a') == 2
+    assert 'wheel-watch: stopped' in output
+    assert 'run-test' not in output
+    assert process.returncode == 0
+
+    result = testdir.run('tox', '-c', project, '-e', 'py-a', '--wheel-cache')
+    result.stdout.fnmatch_lines([
+        'py-a wheel-cache: reusing *foobar-1.0-py3-none-any.whl',
+        'value 2',
+    ])
+    assert 'wheel-native' not in result.stdout.str()
+    assert result.ret == 0
+
+
+def test_wheel_watch_hooks(testdir_pep517_hooks):
+    # the build writes a version file into the source tree, that must not start another round
+    testdir_pep517_hooks.tmpdir.join('setup.py').write("""
+import time
+from setuptools import setup
+
+with open('foobar/_version.py', 'w') as fh:
+    fh.write('built = %r' % time.time())
+setup(name='foobar', packages=['foobar'])
+""")
+    testdir_pep517_hooks.tmpdir.join('foobar', '__init__.py').write('value = 1', ensure=True)
+    # tox writes the log, it needs to be outside of the watched sources
+    log = testdir_pep517_hooks.tmpdir.join('.tox', 'watch.log').ensure()
+
+    def wait_for(text, count):
+        deadline = time.time() + 120
+        while log.read().count(text) < count:
+            assert time.time() < deadline, log.read()
+            time.sleep(0.1)
+
+    with log.open('w') as fh:
+        process = testdir_pep517_hooks.popen(
+            ['tox', '-e', 'py-a', '--wheel-watch'], stdin=subprocess.DEVNULL, stdout=fh, stderr=subprocess.STDOUT
+        )
+        try:
+            wait_for('wheel-watch: waiting for changes', 1)
+            testdir_pep517_hooks.tmpdir.join('foobar', '__init__.py').write('value = 2')
+            wait_for('wheel-watch: waiting for changes', 2)
+            time.sleep(3)
+        finally:
+            process.send_signal(signal.SIGINT)
+            process.wait()
+    output = log.read()
+    # the backend is restarted after the build directory is emptied (the first one remembers the directories it made)
+    assert output.count('wheel-watch: py-a built foobar-0.0.0-py3-none-any.whl') == 2
+    ignored = [line for line in output.splitlines() if line.startswith('wheel-watch: ignoring')]
+    assert 'foobar{}_version.py'.format(os.sep) in ignored[0]
+    assert 'wheel-watch: foobar?__init__.py changed' in output.replace(os.sep, '?')
+    assert 'failed' not in output
+    assert output.count('py-a create:') == 1
+    # the build requirements are installed once, the rebuild finds them in the build env
+    assert 'installing build requirements' in output.split('wheel-watch: waiting for changes')[0]
+    assert 'installing build requirements' not in output.split('wheel-watch: waiting for changes')[1]
+    assert process.returncode == 0
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs SIGINT')
+def test_wheel_watch_edit_while_building(testdir_pep517_hooks):
+    testdir_pep517_hooks.tmpdir.join('setup.py').write("""
+import time
+from setuptools import setup
+
+time.sleep(2)
+setup(name='foobar', packages=['foobar'])
+""")
+    source = testdir_pep517_hooks.tmpdir.join('foobar', '__init__.py')
+    source.write('value = 1', ensure=True)
+    # tox writes the log, it needs to be outside of the watched sources
+    log = testdir_pep517_hooks.tmpdir.join('.tox', 'watch.log').ensure()
+
+    def wait_for(text, count):
+        deadline = time.time() + 120
+        while log.read().count(text) < count:
+            assert time.time() < deadline, log.read()
+            time.sleep(0.1)
+
+    with log.open('w') as fh:
+        process = testdir_pep517_hooks.popen(
+            ['tox', '-e', 'py-a', '--wheel-watch'], stdin=subprocess.DEVNULL, stdout=fh, stderr=subprocess.STDOUT
+        )
+        try:
+            wait_for('wheel-watch: waiting for changes', 1)
+            source.write('value = 2')
+            wait_for('foobar{}__init__.py changed'.format(os.sep), 1)
+            time.sleep(1)
+            source.write('value = 3')
+            wait_for('wheel-watch: waiting for changes', 2)
+            # saved while building, thus taken as written by the build, but only for that round
+            source.write('value = 4')
+            wait_for('wheel-watch: waiting for changes', 3)
+        finally:
+            process.send_signal(signal.SIGINT)
+            process.wait()
+    output = log.read()
+    assert 'wheel-watch: ignoring foobar{}__init__.py (written by the build)'.format(os.sep) in output
+    assert output.count('foobar{}__init__.py changed'.format(os.sep)) == 2
+    assert output.count('wheel-watch: py-a built foobar-0.0.0-py3-none-any.whl') == 3
+    assert process.returncode == 0
+
+
+def test_keep_sdist(testdir_legacy, options):
+    testdir_legacy.tmpdir.join('tox.ini').write("""
+[testenv]
+wheel =
+    a: false
+    b: true
+""", mode='a')
+    result = testdir_legacy.run('tox', *options)
+    result.stdout.fnmatch_lines([
+        'GLOB sdist-make: *',
+        'py-b wheel-make: *',
+    ])
+    assert result.ret == 0
+    # the wheel build must not remove the sdist or leave staging dirs around
+    dists = testdir_legacy.tmpdir.join('.tox', 'dist').listdir(sort=True)
+    assert [dist.ext for dist in dists] == ['.whl', '.zip']
+
+
+def test_build_parallel(testdir_legacy, options):
+    testdir_legacy.tmpdir.join('setup.py').write("""
+from setuptools import setup
+
+setup(name='foobar', py_modules=['foobar'])
+""")
+    testdir_legacy.tmpdir.join('foobar.py').write('')
+    testdir_legacy.tmpdir.join('tox.ini').write("""
+[testenv]
+setenv = b: FOO = 1
+""", mode='a')
+    result = testdir_legacy.run('tox', '--wheel', '--wheel-build-parallel', '2', *options)
+    assert result.stdout.str().count('running bdist_wheel') == 2
+    assert result.ret == 0
+    # concurrent builds use private build dirs, the project's build dir and egg-info are left alone
+    assert testdir_legacy.tmpdir.join('build').listdir() == []
+    assert not testdir_legacy.tmpdir.listdir('*.egg-info')
+    for env in ['py-a', 'py-b']:
+        assert testdir_legacy.tmpdir.join('.tox', '.wheel-build', env, 'lib', 'foobar.py').check()
+
+
+def test_build_parallel_old_setuptools(testdir_legacy):
+    testdir_legacy.tmpdir.join('setup.py').write("""
+from setuptools import setup
+
+setup(name='foobar', py_modules=['foobar'])
+""")
+    testdir_legacy.tmpdir.join('foobar.py').write('')
+    testdir_legacy.tmpdir.join('tox.ini').write("""
+[testenv]
+setenv = b: FOO = 1
+deps = setuptools < 65.4
+""", mode='a')
+    result = testdir_legacy.run('tox', '--wheel', '--wheel-build-parallel', '2', '-e', 'py-a,py-b', '--notest')
+    # setuptools ignores DIST_EXTRA_CONFIG, the builds are done again one at a time in the project's build dir
+    assert result.stdout.str().count('did not build in its private build directory') == 2
+    assert result.stdout.str().count('running bdist_wheel') == 4
+    assert result.ret == 0
+    assert testdir_legacy.tmpdir.join('build', 'lib', 'foobar.py').check()
+
+
+def test_build_parallel_share(testdir_legacy, options):
+    result = testdir_legacy.run('tox', '--wheel', '--wheel-build-parallel', '2', *options)
+    # the build envs with the same settings wait for the first build and reuse its wheel
+    result.stdout.fnmatch_lines([
+        'py-b wheel-share: reusing foobar-0.0.0-py3-none-any.whl built in py-a',
+    ])
+    assert result.stdout.str().count('running bdist_wheel') == 1
+    assert result.ret == 0
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs a shell script')
+def test_compiler_cache(testdir_legacy, options):
+    ccache = testdir_legacy.tmpdir.join('bin', 'ccache')
+    ccache.write("""#!/bin/sh
+calls="$(dirname "$0")/calls"
+if [ "$1" = "--print-stats" ]; then
+    printf 'direct_cache_hit\\t0\\ncache_miss\\t%s\\n' "$(cat "$calls" 2>/dev/null | wc -l)"
+    exit 0
+fi
+case " $* " in *" -c "*) echo "$*" >> "$calls";; esac
+exec "$@"
+""", ensure=True)
+    ccache.chmod(0o755)
+    testdir_legacy.tmpdir.join('tox.ini').write("""
+[testenv]
+wheel = true
+wheel_build_jobs = 2
+wheel_compiler_cache = {}
+""".format(ccache), mode='a')
+    testdir_legacy.tmpdir.join('setup.py').write("""
+from setuptools import Extension
+from setuptools import setup
+
+setup(name='foobar', ext_modules=[Extension('foo', ['foo.c']), Extension('bar', ['bar.c'])])
+""")
+    for name in ['foo', 'bar']:
+        testdir_legacy.tmpdir.join('{}.c'.format(name)).write('int {}(void) {{ return 0; }}\n'.format(name))
+    result = testdir_legacy.run('tox', *options)
+    result.stdout.fnmatch_lines([
+        'py-a wheel-ccache: 0 hits, 2 misses',
+        'py-b wheel-ccache: 0 hits, 2 misses',
+    ])
+    assert result.ret == 0
+    # legacy builds pass the jobs on the command line, older setuptools versions ignore DIST_EXTRA_CONFIG
+    assert result.stdout.str().count('setup.py build_ext --parallel 2 bdist_wheel') == 2
+
+    testdir_legacy.tmpdir.join('pyproject.toml').write("""
+[build-system]
+requires = ["setuptools"]
+build-backend = "setuptools.build_meta"
+""")
+    testdir_legacy.tmpdir.join('tox.ini').write("""
+wheel_pep517 = hooks
+deps = setuptools < 65.4
+""", mode='a')
+    result = testdir_legacy.run('tox', '-e', 'py-a')
+    result.stdout.fnmatch_lines([
+        'WARNING: wheel_build_jobs is ignored by setuptools * in py-a (DIST_EXTRA_CONFIG needs setuptools >= 65.4), *',
+    ])
+    assert result.ret == 0
+    assert 'parallel = 2' in testdir_legacy.tmpdir.join('.tox', '.wheel-build', 'py-a.cfg').read()
+    testdir_legacy.tmpdir.join('pyproject.toml').remove()
+
+    testdir_legacy.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py-{a,b}
+
+[testenv]
+wheel = true
+wheel_compiler_cache = missing-ccache
+""")
+    result = testdir_legacy.run('tox', '-e', 'py-a')
+    result.stdout.fnmatch_lines([
+        "ERROR: Compiler cache 'missing-ccache' not found (wheel_compiler_cache in py-a)",
+    ])
+    assert result.ret != 0
+
+
+def test_native(testdir_pep517, options):
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py-{a,b}
+
+[testenv]
+wheel = true
+wheel_pep517 = native
+commands = python -c "import foobar; print(foobar.__file__)"
+""")
+    testdir_pep517.tmpdir.join('setup.py').remove()
+    testdir_pep517.tmpdir.join('pyproject.toml').write("""
+[build-system]
+requires = ["setuptools>=61"]
+build-backend = "setuptools.build_meta"
+
+[project]
+name = "foobar"
+version = "1.0"
+dependencies = []
+""")
+    testdir_pep517.tmpdir.join('src', 'foobar', '__init__.py').write('', ensure=True)
+    result = testdir_pep517.run('tox', *options)
+    result.stdout.fnmatch_lines([
+        'py-a wheel-native: writing foobar 1.0 (1 files)',
+        'py-b wheel-share: reusing foobar-1.0-py3-none-any.whl built in py-a',
+    ])
+    assert 'wheel-make' not in result.stdout.str()
+    assert result.ret == 0
+
+    testdir_pep517.tmpdir.join('pyproject.toml').write("""
+[build-system]
+requires = ["setuptools>=61"]
+build-backend = "setuptools.build_meta"
+
+[project]
+name = "foobar"
+dynamic = ["version"]
+""")
+    result = testdir_pep517.run('tox', *options)
+    result.stdout.fnmatch_lines([
+        'py-a wheel-native: using the build backend instead: dynamic metadata (version)',
+        'py-a wheel-make: *',
+    ])
+    assert result.ret == 0
+
+
+def test_native_setup_cfg(tmpdir):
+    tmpdir.join('setup.py').write('from setuptools import setup\nsetup()\n')
+    tmpdir.join('setup.cfg').write("""
+[metadata]
+name = foo-bar
+version = 01.0
+
+[options]
+packages = find:
+install_requires =
+    six
+
+[bdist_wheel]
+universal = 1
+""")
+    tmpdir.join('foo', '__init__.py').write('', ensure=True)
+    tmpdir.join('tests', '__init__.py').write('', ensure=True)
+    project = tox_wheel.native.get_native_project(tmpdir)
+    assert [path for path, _ in project['files']] == ['foo/__init__.py', 'tests/__init__.py']
+    wheel = tox_wheel.native.write_native_wheel(project, tmpdir)
+    assert wheel.basename == 'foo_bar-1.0-py2.py3-none-any.whl'
+    tox_wheel.verify.verify_wheel(wheel)
+
+    tmpdir.join('setup.py').write('\"\"\"Docstring.\"\"\"\nfrom setuptools import setup\nsetup()\n')
+    assert tox_wheel.native.get_native_project(tmpdir)['name'] == 'foo-bar'
+    tmpdir.join('setup.py').write('from setuptools import setup\nsetup(name="foo-bar")\n')
+    with pytest.raises(tox_wheel.native.UnsupportedProject):
+        tox_wheel.native.get_native_project(tmpdir)
+
+    # setuptools plugins can add files or metadata
+    tmpdir.join('setup.py').remove()
+    tmpdir.join('pyproject.toml').write("""
+[build-system]
+requires = ["setuptools>=40.8", "wheel", "setuptools_scm"]
+build-backend = "setuptools.build_meta"
+""")
+    with pytest.raises(tox_wheel.native.UnsupportedProject, match='build requirement setuptools_scm'):
+        tox_wheel.native.get_native_project(tmpdir)
+    tmpdir.join('pyproject.toml').write(tmpdir.join('pyproject.toml').read().replace(', "setuptools_scm"', ''))
+    assert tox_wheel.native.get_native_project(tmpdir)['name'] == 'foo-bar'
+
+
+def test_native_metadata(tmpdir):
+    tmpdir.join('pyproject.toml').write_text(u"""
+[project]
+name = "foo"
+version = "1.0"
+description = "Café tool"
+authors = [{name = "Jürgen", email = "j@example.com"}]
+""", 'utf-8')
+    tmpdir.join('foo', '__init__.py').write('', ensure=True)
+    tmpdir.join('LICENSE').write('license')
+    tmpdir.join('LICENSE~').write('backup')
+    project = tox_wheel.native.get_native_project(tmpdir)
+    wheel = tox_wheel.native.write_native_wheel(project, tmpdir)
+    tox_wheel.verify.verify_wheel(wheel)
+    with zipfile.ZipFile(str(wheel)) as archive:
+        metadata = archive.read('foo-1.0.dist-info/METADATA').decode('utf-8')
+        # plain UTF-8 as setuptools writes it, not RFC 2047 encoded words
+        assert u'Summary: Café tool\n' in metadata
+        assert u'Author-email: Jürgen <j@example.com>\n' in metadata
+        assert 'License-File: LICENSE\n' in metadata
+        assert archive.read('foo-1.0.dist-info/LICENSE') == b'license'
+        assert 'foo-1.0.dist-info/LICENSE~' not in archive.namelist()
+
+    tmpdir.join('pyproject.toml').remove()
+    tmpdir.join('setup.cfg').write("""
+[metadata]
+name = foo
+version = 1.0
+license_files = docs/COPYING*
+""")
+    tmpdir.join('docs', 'COPYING.txt').write('copying', ensure=True)
+    project = tox_wheel.native.get_native_project(tmpdir)
+    wheel = tox_wheel.native.write_native_wheel(project, tmpdir)
+    with zipfile.ZipFile(str(wheel)) as archive:
+        assert 'License-File: docs/COPYING.txt\n' in archive.read('foo-1.0.dist-info/METADATA').decode('utf-8')
+        assert archive.read('foo-1.0.dist-info/COPYING.txt') == b'copying'
+        assert 'foo-1.0.dist-info/LICENSE' not in archive.namelist()
+
+
+def test_native_timestamps(tmpdir, monkeypatch):
+    tmpdir.join('pyproject.toml').write("""
+[project]
+name = "foo"
+version = "1.0"
+""")
+    tmpdir.join('foo', '__init__.py').write('', ensure=True)
+    project = tox_wheel.native.get_native_project(tmpdir)
+    # only wheel_reproducible validates and uses the variable
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', 'yesterday')
+    wheel = tox_wheel.native.write_native_wheel(project, tmpdir)
+    with zipfile.ZipFile(str(wheel)) as archive:
+        assert archive.getinfo('foo/__init__.py').date_time[0] >= 2020
+    wheel = tox_wheel.native.write_native_wheel(project, tmpdir, source_date_epoch=0)
+    with zipfile.ZipFile(str(wheel)) as archive:
+        assert {info.date_time for info in archive.infolist()} == {(1980, 1, 1, 0, 0, 0)}
+
+
+def test_native_top_level():
+    assert tox_wheel.native.get_top_level('foo/__init__.py') == 'foo'
+    assert tox_wheel.native.get_top_level('bar.py') == 'bar'
+    assert tox_wheel.native.get_top_level('foo.pyx_helpers/__init__.py') == 'foo.pyx_helpers'
+    assert tox_wheel.native.get_top_level('baz.pyi') == 'baz.pyi'
+
+
+def test_native_namespace_packages(tmpdir):
+    tmpdir.join('pyproject.toml').write("""
+[project]
+name = "foo"
+version = "1.0"
+""")
+    tmpdir.join('src', 'foo', '__init__.py').write('', ensure=True)
+    tmpdir.join('src', 'foo', 'sub', 'mod.py').write('', ensure=True)
+    # setuptools' discovery includes foo.sub, the native writer falls back to the backend
+    with pytest.raises(tox_wheel.native.UnsupportedProject, match='implicit namespace package foo.sub'):
+        tox_wheel.native.get_native_project(tmpdir)
+    tmpdir.join('src', 'foo', 'sub', '__init__.py').write('')
+    project = tox_wheel.native.get_native_project(tmpdir)
+    assert [path for path, _ in project['files']] == ['foo/__init__.py', 'foo/sub/__init__.py', 'foo/sub/mod.py']
+
+    tmpdir.join('src', 'ns', 'bar', '__init__.py').write('', ensure=True)
+    with pytest.raises(tox_wheel.native.UnsupportedProject, match='implicit namespace package ns'):
+        tox_wheel.native.get_native_project(tmpdir)
+    tmpdir.join('pyproject.toml').write("""
+[project]
+name = "foo"
+version = "1.0"
+
+[tool.setuptools.packages.find]
+where = ["src"]
+namespaces = false
+""")
+    project = tox_wheel.native.get_native_project(tmpdir)
+    assert project['packages'] == ['foo', 'foo.sub']
+
+    # flat layouts ignore the usual non-package directories
+    flat = tmpdir.join('flat')
+    flat.join('pyproject.toml').write(tmpdir.join('pyproject.toml').read().split('[tool')[0], ensure=True)
+    flat.join('foo', '__init__.py').write('', ensure=True)
+    flat.join('tests', 'test_foo.py').write('', ensure=True)
+    assert tox_wheel.native.get_native_project(flat)['packages'] == ['foo']
+    flat.join('foo', 'data', 'helper.py').write('', ensure=True)
+    with pytest.raises(tox_wheel.native.UnsupportedProject, match='implicit namespace package foo.data'):
+        tox_wheel.native.get_native_project(flat)
+
+
+def test_repack_wheel(tmpdir):
+    wheel = tmpdir.join('foobar-1.0-py3-none-any.whl')
+    with zipfile.ZipFile(str(wheel), 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('foobar.py', 'x = 1\n' * 1000)
+        archive.writestr('foobar-1.0.dist-info/RECORD', '')
+    assert tox_wheel.compression.repack_wheel(wheel, tox_wheel.compression.get_compression('stored'))
+    with zipfile.ZipFile(str(wheel)) as archive:
+        assert [member.compress_type for member in archive.infolist()] == [zipfile.ZIP_STORED] * 2
+        assert archive.read('foobar.py') == b'x = 1\n' * 1000
+    assert not tox_wheel.compression.repack_wheel(wheel, tox_wheel.compression.get_compression('stored'))
+    assert tox_wheel.compression.repack_wheel(wheel, tox_wheel.compression.get_compression('fast'))
+    with zipfile.ZipFile(str(wheel)) as archive:
+        assert [member.compress_type for member in archive.infolist()] == [zipfile.ZIP_DEFLATED] * 2
+    # already deflated
+    assert not tox_wheel.compression.repack_wheel(wheel, tox_wheel.compression.get_compression('fast'))
+    assert tox_wheel.compression.get_compression('') is None
+    with pytest.raises(ValueError):
+        tox_wheel.compression.get_compression('bzip2')
+
+
+def test_repack_wheel_normalize(tmpdir):
+    date_time = tox_wheel.compression.get_date_time(1700000001)
+    assert date_time == (2023, 11, 14, 22, 13, 20)
+    wheels = []
+    for index, order in enumerate([['foobar.py', 'bin/foobar', 'foobar-1.0.dist-info/RECORD'],
+                                   ['foobar-1.0.dist-info/RECORD', 'foobar.py', 'bin/foobar']]):
+        wheel = tmpdir.join(str(index), 'foobar-1.0-py3-none-any.whl')
+        wheel.dirpath().ensure(dir=1)
+        with zipfile.ZipFile(str(wheel), 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name in order:
+                info = zipfile.ZipInfo(name, date_time=(2000 + index, 1, 1, 0, 0, 0))
+                info.external_attr = (0o775 if name == 'bin/foobar' else 0o600 + 0o40 * index) << 16
+                if name.endswith('RECORD'):
+                    content = 'foobar.py,sha256=x,1\nfoobar-1.0.dist-info/RECORD,,\nbin/foobar,sha256=y,1\n'
+                else:
+                    content = name
+                archive.writestr(info, content)
+        assert tox_wheel.compression.repack_wheel(wheel, date_time=date_time)
+        assert not tox_wheel.compression.repack_wheel(wheel, date_time=date_time)
+        wheels.append(wheel)
+    assert wheels[0].read_binary() == wheels[1].read_binary()
+    with zipfile.ZipFile(str(wheels[0])) as archive:
+        assert [(member.filename, member.date_time, oct(member.external_attr >> 16)) for member in archive.infolist()] == [
+            ('bin/foobar', date_time, '0o100755'),
+            ('foobar.py', date_time, '0o100644'),
+            ('foobar-1.0.dist-info/RECORD', date_time, '0o100644'),
+        ]
+        assert archive.read('foobar-1.0.dist-info/RECORD') == (
+            b'bin/foobar,sha256=y,1\nfoobar.py,sha256=x,1\nfoobar-1.0.dist-info/RECORD,,\n'
+        )
+
+
+def test_source_date_epoch(tmpdir, monkeypatch):
+    monkeypatch.delenv('SOURCE_DATE_EPOCH', raising=False)
+    assert tox_wheel.reproducible.get_source_date_epoch(tmpdir.join('plain')) == tox_wheel.compression.ZIP_EPOCH
+    repo = tmpdir.join('repo')
+    repo.join('project', 'foobar.py').write('', ensure=True)
+    env = dict(os.environ, GIT_COMMITTER_DATE='1700000000 +0000', GIT_AUTHOR_DATE='1700000000 +0000',
+               GIT_AUTHOR_NAME='a', GIT_AUTHOR_EMAIL='a@b', GIT_COMMITTER_NAME='a', GIT_COMMITTER_EMAIL='a@b')
+    subprocess.check_call(['git', 'init', '-q', str(repo)], env=env)
+    subprocess.check_call(['git', 'add', '.'], cwd=str(repo), env=env)
+    subprocess.check_call(['git', 'commit', '-q', '-m', 'init'], cwd=str(repo), env=env)
+    assert tox_wheel.reproducible.get_source_date_epoch(repo.join('project')) == 1700000000
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1234567890')
+    assert tox_wheel.reproducible.get_source_date_epoch(repo.join('project')) == 1234567890
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '2024-01-01')
+    with pytest.raises(ValueError, match="SOURCE_DATE_EPOCH '2024-01-01' is not a Unix timestamp"):
+        tox_wheel.reproducible.get_source_date_epoch(repo.join('project'))
+
+
+@pytest.mark.parametrize('mode', ['legacy', 'native', 'hooks'])
+def test_reproducible(testdir_pep517, mode):
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py
+
+[testenv]
+wheel = true
+wheel_pep517 = %s
+wheel_reproducible = true
+""" % ('' if mode == 'legacy' else mode))
+    testdir_pep517.tmpdir.join('setup.py').write('from setuptools import setup\nsetup()\n')
+    testdir_pep517.tmpdir.join('setup.cfg').write('[metadata]\nname = foobar\nversion = 0.0.0\n[options]\npackages = foobar\n')
+    testdir_pep517.tmpdir.join('foobar', '__init__.py').write('', ensure=True)
+    testdir_pep517.tmpdir.join('foobar', 'a.py').write('')
+    wheel = testdir_pep517.tmpdir.join('.tox', 'dist', 'foobar-0.0.0-py3-none-any.whl')
+    digests = []
+    for mtime, permissions in [(1600000000, 0o644), (1700000000, 0o600)]:
+        for path in testdir_pep517.tmpdir.join('foobar').listdir():
+            path.setmtime(mtime)
+            path.chmod(permissions)
+        result = testdir_pep517.run('tox', '--notest')
+        assert result.ret == 0
+        digests.append(hashlib.sha256(wheel.read_binary()).hexdigest())
+    assert digests[0] == digests[1]
+    with zipfile.ZipFile(str(wheel)) as archive:
+        assert {member.date_time for member in archive.infolist()} == {(1980, 1, 1, 0, 0, 0)}
+
+
+@pytest.mark.parametrize('mode', ['legacy', 'true', 'build', 'hooks', 'warm'])
+def test_reproducible_source_date_epoch(testdir_pep517, monkeypatch, mode):
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1600000000')
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py
+
+[testenv]
+wheel = true
+wheel_pep517 = %s
+wheel_warm_build_env = %s
+wheel_reproducible = true
+""" % ({'legacy': '', 'warm': 'true'}.get(mode, mode), mode == 'warm'))
+    testdir_pep517.tmpdir.join('setup.py').write("""
+import os
+from setuptools import setup
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'epoch.txt'), 'w') as fh:
+    fh.write(os.environ.get('SOURCE_DATE_EPOCH', 'missing'))
+setup(name='foobar', version='0.0.0', py_modules=['foobar'])
+""")
+    testdir_pep517.tmpdir.join('foobar.py').write('')
+    result = testdir_pep517.run('tox', '--notest')
+    assert result.ret == 0
+    assert testdir_pep517.tmpdir.join('epoch.txt').read() == '1600000000'
+
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', 'yesterday')
+    result = testdir_pep517.run('tox', '--notest', '-r')
+    result.stdout.fnmatch_lines([
+        "ERROR: Invalid SOURCE_DATE_EPOCH for py (wheel_reproducible): SOURCE_DATE_EPOCH 'yesterday' is not a Unix timestamp",
+    ])
+    assert result.ret != 0
+
+
+@pytest.mark.parametrize('mode', ['legacy', 'native', 'hooks'])
+def test_compression(testdir_pep517, mode):
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py
+
+[testenv]
+wheel = true
+wheel_pep517 = %s
+wheel_compression = stored
+""" % ('' if mode == 'legacy' else mode))
+    if mode == 'native':
+        testdir_pep517.tmpdir.join('setup.py').write('from setuptools import setup\nsetup()\n')
+        testdir_pep517.tmpdir.join('setup.cfg').write('[metadata]\nname = foobar\nversion = 0.0.0\n[options]\npy_modules = foobar\n')
+    testdir_pep517.tmpdir.join('foobar.py').write('')
+    result = testdir_pep517.run('tox')
+    assert result.ret == 0
+    if mode == 'legacy':
+        assert '--compression=stored' in result.stdout.str()
+    with zipfile.ZipFile(str(testdir_pep517.tmpdir.join('.tox', 'dist', 'foobar-0.0.0-py3-none-any.whl'))) as archive:
+        assert {member.compress_type for member in archive.infolist()} == {zipfile.ZIP_STORED}
+
+
+@pytest.mark.parametrize('mode', ['legacy', 'warm', 'hooks', 'native'])
+def test_profile(testdir_pep517, mode):
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py
+
+[testenv]
+wheel = true
+wheel_pep517 = %s
+wheel_warm_build_env = %s
+wheel_cache = true
+""" % ({'legacy': '', 'warm': 'true'}.get(mode, mode), mode == 'warm'))
+    testdir_pep517.tmpdir.join('setup.py').write('from setuptools import setup\nsetup()\n')
+    testdir_pep517.tmpdir.join('setup.cfg').write('[metadata]\nname = foobar\nversion = 0.0.0\n[options]\npy_modules = foobar\n')
+    testdir_pep517.tmpdir.join('foobar.py').write('')
+    for _ in range(2):  # not from the wheel cache
+        result = testdir_pep517.run('tox', '--wheel-profile=3', '--notest')
+        result.stdout.fnmatch_lines([
+            'py wheel-profile: *.wheel-profile*py.prof: *s in * function calls',
+            '*tottime*cumtime*calls*function',
+            '*',
+            '*',
+            '*',
+        ])
+        assert result.ret == 0
+    stats = pstats.Stats(str(testdir_pep517.tmpdir.join('.tox', '.wheel-profile', 'py.prof')))
+    functions = {name for _, _, name in stats.stats}
+    if mode == 'native':
+        assert 'write_native_wheel' in functions
+    else:
+        assert ('setup' if mode == 'legacy' else 'build_wheel') in functions
+
+
+@pytest.mark.parametrize('mode', ['true', 'build'])
+def test_profile_isolated(testdir_pep517, mode):
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py
+
+[testenv]
+wheel = true
+wheel_pep517 = %s
+""" % mode)
+    result = testdir_pep517.run('tox', '--wheel-profile', '--notest')
+    result.stdout.fnmatch_lines([
+        "ERROR: --wheel-profile can't profile the build backend of isolated builds in py *",
+    ])
+    assert 'wheel-make: commands' not in result.stdout.str()
+    assert result.ret != 0
+
+
+def test_install_wheel(tmpdir):
+    project = tmpdir.join('project')
+    project.join('pyproject.toml').write("""
+[project]
+name = "foo-bar"
+version = "1.0"
+dependencies = ["six", "colorama; sys_platform == 'win32'", "pytest; extra == 'test'"]
+optional-dependencies = {test = ["pytest"]}
+scripts = {foo = "foo:main"}
+""", ensure=True)
+    project.join('src', 'foo', '__init__.py').write('def main():\n    print("foo")\n', ensure=True)
+    project.join('src', 'foo', 'old.py').write('', ensure=True)
+    tmpdir.join('dist').ensure(dir=1)
+    wheel = tox_wheel.native.write_native_wheel(tox_wheel.native.get_native_project(project), tmpdir.join('dist'))
+    scheme = dict(tox_wheel.install.get_install_scheme(sys.executable))
+    for name in 'purelib', 'platlib', 'scripts', 'data', 'headers':
+        scheme[name] = str(tmpdir.join('env', name))
+    environment = dict(scheme['environment'], sys_platform='linux')
+    assert tox_wheel.install.get_requirements(wheel, [], environment) == ['six']
+    assert tox_wheel.install.get_requirements(wheel, ['Test'], environment) == ['six', 'pytest']
+
+    installed = tox_wheel.install.install_wheel(wheel, scheme)
+    lib = tmpdir.join('env', 'purelib')
+    assert lib.join('foo', 'old.py') in map(type(lib), installed)
+    assert lib.join('foo_bar-1.0.dist-info', 'INSTALLER').read() == 'tox-wheel\n'
+    assert lib.join('foo', '__pycache__').listdir('__init__.*.pyc')
+    record = lib.join('foo_bar-1.0.dist-info', 'RECORD').read()
+    assert '../scripts/foo,sha256=' in record
+    assert 'foo/__pycache__/old.' in record
+    script = tmpdir.join('env', 'scripts', 'foo')
+    assert script.read().startswith('#!{}'.format(sys.executable))
+    output = subprocess.check_output([str(script)], env=dict(os.environ, PYTHONPATH=str(lib)), universal_newlines=True)
+    assert output == 'foo\n'
+
+    project.join('src', 'foo', 'old.py').remove()
+    project.join('pyproject.toml').write(project.join('pyproject.toml').read().replace('1.0', '2.0'))
+    wheel = tox_wheel.native.write_native_wheel(tox_wheel.native.get_native_project(project), tmpdir.join('dist'))
+    tox_wheel.install.install_wheel(wheel, scheme)
+    assert not lib.join('foo', 'old.py').check()
+    assert not lib.join('foo', '__pycache__').listdir('old.*')
+    assert sorted(path.basename for path in lib.listdir()) == ['foo', 'foo_bar-2.0.dist-info']
+    assert script.check()
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="the fake interpreter is a shell script")
+def test_install_helper_errors(tmpdir):
+    python = tmpdir.join('python')
+    python.write('#!/bin/sh\necho "broken interpreter: $1"\necho "Traceback: nope" >&2\nexit 3\n')
+    python.chmod(0o755)
+    with pytest.raises(tox_wheel.install.WheelInstallError) as exc:
+        tox_wheel.install.get_install_scheme(python)
+    assert 'install_scheme.py failed with exit code 3' in str(exc.value)
+    assert 'broken interpreter: {}'.format(tox_wheel.install.SCHEME_SCRIPT) in str(exc.value)
+    assert 'Traceback: nope' in str(exc.value)
+    assert str(python) not in tox_wheel.install.install_schemes
+    with pytest.raises(tox_wheel.install.WheelInstallError) as exc:
+        tox_wheel.install.compile_files(str(python), [str(tmpdir.join('foo.py'))])
+    assert 'compile_files.py failed with exit code 3' in str(exc.value)
+    assert 'Traceback: nope' in str(exc.value)
+
+
+def test_link_tree(tmpdir):
+    project = tmpdir.join('project')
+    project.join('pyproject.toml').write("""
+[project]
+name = "foobar"
+version = "1.0"
+scripts = {foobar = "foobar:main"}
+""", ensure=True)
+    project.join('src', 'foobar', '__init__.py').write('def main():\n    print("foobar")\n', ensure=True)
+    tmpdir.join('dist').ensure(dir=1)
+    wheel = tox_wheel.native.write_native_wheel(tox_wheel.native.get_native_project(project), tmpdir.join('dist'))
+    trees = tmpdir.join('trees')
+    installs = []
+    for env in 'a', 'b':
+        scheme = dict(tox_wheel.install.get_install_scheme(sys.executable), prefix=str(tmpdir.join(env)))
+        for name in 'purelib', 'platlib', 'scripts', 'data', 'headers':
+            scheme[name] = str(tmpdir.join(env, name))
+        tree = tox_wheel.trees.get_tree(trees, wheel, scheme)
+        assert tox_wheel.trees.stage_wheel(wheel, scheme, tree) == (env == 'a')
+        installed, method = tox_wheel.trees.link_tree(tree, scheme)
+        assert method == 'hardlink'
+        installs.append(installed)
+    assert len(trees.listdir()) == 1
+    module_a, module_b = (tmpdir.join(env, 'purelib', 'foobar', '__init__.py') for env in ('a', 'b'))
+    assert module_a.stat().ino == module_b.stat().ino
+    assert tmpdir.join('b', 'purelib', 'foobar', '__pycache__').listdir('__init__.*.pyc')
+    script = tmpdir.join('b', 'scripts', 'foobar')
+    assert script.read().startswith('#!{}\n'.format(sys.executable))
+    assert script.stat().ino != tmpdir.join('a', 'scripts', 'foobar').stat().ino
+    record = tmpdir.join('b', 'purelib', 'foobar-1.0.dist-info', 'RECORD').read()
+    assert '../scripts/foobar,{},{}'.format(*tox_wheel.install.get_record_hash(str(script))) in record
+    assert [path.replace(os.sep + 'a' + os.sep, os.sep + 'b' + os.sep) for path in installs[0]] == installs[1]
+
+    methods = ['clone', 'copy']
+    tox_wheel.trees.link_file(str(module_a), str(tmpdir.join('copy.py')), methods)
+    assert tmpdir.join('copy.py').read() == module_a.read()
+    assert tmpdir.join('copy.py').mtime() == module_a.mtime()
+
+    project.join('src', 'foobar', 'new.py').write('')
+    wheel = tox_wheel.native.write_native_wheel(tox_wheel.native.get_native_project(project), tmpdir.join('dist'))
+    tree = tox_wheel.trees.get_tree(trees, wheel, scheme)
+    assert tox_wheel.trees.stage_wheel(wheel, scheme, tree)
+    assert len(trees.listdir()) == 2  # the old tree was just linked
+    for old in trees.listdir():
+        old.join('tree.json').setmtime(time.time() - tox_wheel.trees.STALE_AGE)
+    tree.remove()
+    assert tox_wheel.trees.stage_wheel(wheel, scheme, tree)
+    assert trees.listdir() == [tree]
+    tox_wheel.trees.link_tree(tree, scheme)
+    assert tmpdir.join('b', 'purelib', 'foobar', 'new.py').check()
+
+
+@pytest.mark.parametrize('mode', ['unpack', 'link'])
+def test_wheel_install_unpack(testdir_pep517, options, mode):
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py-{a,b}
+
+[testenv]
+wheel = true
+wheel_pep517 = native
+wheel_install = %s
+commands = foobar
+""" % mode)
+    testdir_pep517.tmpdir.join('setup.py').remove()
+    testdir_pep517.tmpdir.join('pyproject.toml').write("""
+[build-system]
+requires = ["setuptools>=61"]
+build-backend = "setuptools.build_meta"
+
+[project]
+name = "foobar"
+version = "1.0"
+dependencies = ["pytest; python_version < '3'"]
+scripts = {foobar = "foobar:main"}
+""")
+    testdir_pep517.tmpdir.join('src', 'foobar', '__init__.py').write(
+        'def main():\n    print("installed by " + open(__file__[:-12] + "-1.0.dist-info/INSTALLER").read())\n',
+        ensure=True,
+    )
+    for run in range(2):
+        result = testdir_pep517.run('tox', *options)
+        if mode == 'unpack':
+            result.stdout.fnmatch_lines([
+                'py-a wheel-install: unpacking foobar-1.0-py3-none-any.whl',
+                'installed by tox-wheel',
+                'py-b wheel-install: unpacking foobar-1.0-py3-none-any.whl',
+            ])
+        else:
+            result.stdout.fnmatch_lines([
+                'py-a wheel-install: linking foobar-1.0-py3-none-any.whl',
+                'installed by tox-wheel',
+                'py-b wheel-install: linking foobar-1.0-py3-none-any.whl',
+            ])
+            # one tree per build of the wheel (and interpreter version)
+            assert len(testdir_pep517.tmpdir.join('.tox', '.wheel-trees').listdir()) == run + 1
+        assert 'installing dependencies' not in result.stdout.str()
+        assert result.ret == 0
+
+    testdir_pep517.tmpdir.join('tox.ini').write("""
+[tox]
+envlist = py-{a,b}
+
+[testenv]
+wheel = true
+wheel_install = bogus
+""")
+    result = testdir_pep517.run('tox', *options)
+    result.stdout.fnmatch_lines([
+        "ERROR: Invalid wheel_install 'bogus' for py-a, expected pip, unpack or link",
+    ])
+    assert result.ret != 0
+
+
+def test_background(testdir_legacy):
+    testdir_legacy.tmpdir.join('tox.ini').write("""
+[testenv]
+wheel = true
+wheel_background = true
+wheel_build_env = build
+
+[testenv:build]
+""", mode='a')
+    result = testdir_legacy.run('tox', '-e', 'py-a,py-b')
+    result.stdout.fnmatch_lines([
+        'build wheel-make: *',
+        'py-a inst: *foobar-0.0.0-py3-none-any.whl',
+        'py-b inst: *foobar-0.0.0-py3-none-any.whl',
+    ])
+    assert result.stdout.str().count('running bdist_wheel') == 1
+    assert 'wheel-pending' not in result.stdout.str()
+    assert result.ret == 0
+
+    testdir_legacy.tmpdir.join('setup.py').write('raise SystemExit("broken")')
+    result = testdir_legacy.run('tox', '-e', 'py-a,py-b')
+    result.stdout.fnmatch_lines([
+        'ERROR: No distributions found in the dist directory found. *',
+        '*py-a: could not package project',
+    ])
+    assert result.ret != 0
+
+
+@pytest.mark.parametrize('recreate', [[], ['--recreate']], ids=['reuse', 'recreate'])
+def test_background_default_build_env(testdir_legacy, recreate):
+    testdir_legacy.tmpdir.join('tox.ini').write("""
+[testenv]
+wheel = true
+wheel_background = true
+""", mode='a')
+    result = testdir_legacy.run('tox', '-e', 'py-a', *recreate)
+    # the build env is the test env, tox sets it up while the wheel is built and mustn't recreate it
+    assert result.stdout.str().count('py-a create:') + result.stdout.str().count('py-a recreate:') == 1
+    result.stdout.fnmatch_lines([
+        'py-a inst: *foobar-0.0.0-py3-none-any.whl',
+    ])
+    assert result.ret == 0
+
+
+def test_background_cache(testdir_legacy):
+    project = testdir_legacy.tmpdir.join('project')
+    project.join('tox.ini').write(testdir_legacy.tmpdir.join('tox.ini').read() + """
+[testenv]
+wheel = true
+wheel_cache = true
+setenv =
+    b: FOO = 1
+""", ensure=True)
+    testdir_legacy.tmpdir.join('setup.py').copy(project.join('setup.py'))
+    result = testdir_legacy.run('tox', '-c', project, '-e', 'py-a,py-b', '--wheel-background')
+    assert result.stdout.str().count('running bdist_wheel') == 2
+    assert result.ret == 0
+    # tox sets TOX_PACKAGE while the background builds compute their cache keys, the keys don't depend on it
+    for env in ['py-a', 'py-b']:
+        result = testdir_legacy.run('tox', '-c', project, '-e', env)
+        result.stdout.fnmatch_lines([
+            '{} wheel-cache: reusing *.whl'.format(env),
+        ])
+        assert 'running bdist_wheel' not in result.stdout.str()
+        assert result.ret == 0
+
+
+def test_recreate_sequential(testdir_legacy):
+    result = testdir_legacy.run('tox', '--wheel', '-e', 'py-a', '--recreate')
+    # without background builds tox's own update is used: the build recreates the env and tox recreates it again
+    assert result.stdout.str().count('py-a create:') == 2
+    result.stdout.fnmatch_lines([
+        'py-a create: *',
+        'py-a wheel-make: *',
+        'py-a create: *',
+        'py-a inst: *foobar-0.0.0-py3-none-any.whl',
+    ])
+    assert result.ret == 0
+
+
+def test_find_prebuilt_wheel(tmpdir):
+    for name in [
+        'foobar-1.0-py2.py3-none-any.whl',
+        'foobar-1.0-cp27-cp27m-win32.whl',
+        'foobar-1.0-cp39-cp39-manylinux1_x86_64.whl',
+        'foobar-2.0-py3-none-any.whl',
+        'other-1.0-py3-none-any.whl',
+    ]:
+        tmpdir.join(name).write('')
+    supported_tags = ['cp39-cp39-manylinux1_x86_64', 'cp39-abi3-manylinux1_x86_64', 'py3-none-any']
+
+    wheel, rejected = tox_wheel.prebuilt.find_prebuilt_wheel(tmpdir, 'foobar', '1.0', supported_tags)
+    assert wheel == tmpdir.join('foobar-1.0-cp39-cp39-manylinux1_x86_64.whl')
+    assert [(os.path.basename(path).split('-', 1)[1], reason.split()[0]) for path, reason in rejected] == [
+        ('1.0-cp27-cp27m-win32.whl', 'tags'),
+        ('2.0-py3-none-any.whl', 'version'),
+        ('1.0-py3-none-any.whl', 'name'),
+    ]
+
+    wheel, _ = tox_wheel.prebuilt.find_prebuilt_wheel(tmpdir.join('*-py*.whl'), 'Foo_Bar', '1.0.0', supported_tags)
+    assert wheel is None
+    wheel, _ = tox_wheel.prebuilt.find_prebuilt_wheel(tmpdir.join('*-py*.whl'), 'FooBar', '1.0.0', supported_tags)
+    assert wheel == tmpdir.join('foobar-1.0-py2.py3-none-any.whl')
+
+
+def test_prebuilt_interpreter(tmpdir):
+    python = tmpdir.join('python')
+    python.write("#!/bin/sh\nexit 1\n")
+    python.chmod(0o755)
+    with pytest.raises(InterpreterNotFound, match='could not get its supported wheel tags'):
+        tox_wheel.prebuilt.get_supported_tags(python)
+    with pytest.raises(InterpreterNotFound):
+        tox_wheel.prebuilt.get_supported_tags(tmpdir.join('missing'))
+
+    # setup.py runs with the interpreter of the env
+    project = tmpdir.join('project').ensure(dir=True)
+    project.join('setup.py').write('raise SystemExit("not tox\'s interpreter")\n')
+    python.write('#!/bin/sh\necho foobar\necho 1.0\n')
+    assert tox_wheel.prebuilt.get_project_metadata(project, python) == ('foobar', '1.0')
+    assert tox_wheel.prebuilt.get_project_metadata(project, sys.executable) == (None, None)
+
+
+def test_wheel_from(testdir_legacy, options):
+    testdir_legacy.run(sys.executable, 'setup.py', 'bdist_wheel', '--dist-dir', 'prebuilt')
+    testdir_legacy.tmpdir.join('prebuilt', 'foobar-0.0.0-cp27-cp27m-win32.whl').write('')
+    result = testdir_legacy.run('tox', '--wheel-from', 'prebuilt', *options)
+    result.stdout.fnmatch_lines([
+        'py* wheel-from: using *prebuilt?foobar-0.0.0-py3-none-any.whl',
+    ])
+    assert 'wheel-make' not in result.stdout.str()
+    assert 'bdist_wheel' not in result.stdout.str()
+    assert result.ret == 0
+
+    result = testdir_legacy.run('tox', '--wheel-from', 'prebuilt/*win32.whl', *options)
+    result.stdout.fnmatch_lines([
+        'ERROR: No prebuilt wheel for foobar 0.0.0 found in *prebuilt?[*]win32.whl:',
+        '  *foobar-0.0.0-cp27-cp27m-win32.whl: tags cp27-cp27m-win32 are not supported by the interpreter',
+    ])
+    assert result.ret != 0